@@ -1,7 +1,12 @@
 import streamlit as st
 import datetime
-import re
-from app.database import get_dashboard_stats, get_latest_news_preview, get_latest_academic_preview
+import sqlite3
+from app.database import (
+    get_dashboard_stats, get_latest_news_preview, get_latest_academic_preview,
+    get_llm_usage_summary, get_llm_usage_by_prompt
+)
+from app.llm_budget import LLM_DAILY_REQUESTS, LLM_DAILY_TOKENS
+from app.shards import import_shards
 
 # 1. PAGE CONFIG
 st.set_page_config(
@@ -10,22 +15,23 @@ st.set_page_config(
     layout="wide"
 )
 
-# 2. HELPER: Clean AI Headlines
 
+# Catch the database up with any delta shards a deploy brought in (once per
+# process per hour, not on every rerun). Retention runs in the scheduled
+# runners, never here on the database being served.
+@st.cache_resource(ttl=3600, show_spinner="Syncing new data...")
+def sync_database():
+    try:
+        return import_shards()
+    except (sqlite3.Error, ValueError, OSError) as e:
+        return {"error": str(e)}
 
-def parse_headline(summary_text):
-    """Extracts the English headline if the AI formatted it that way."""
-    if not summary_text:
-        return "No Summary Available"
-    # Look for "**Headline:**" pattern often used by the AI
-    match = re.search(r"\**Headline:?\**\s*(.*?)\n",
-                      summary_text, re.IGNORECASE)
-    if match:
-        return match.group(1).strip()
-    return summary_text[:80] + "..."  # Fallback to first 80 chars
 
+sync = sync_database()
+if sync.get("error"):
+    st.warning(f"Could not apply the latest data shards: {sync['error']}")
 
-# 3. HEADER
+# 2. HEADER
 with st.container(border=True):
     c_brand, c_spacer, c_date = st.columns([3, 3, 2])
 
@@ -39,7 +45,7 @@ with st.container(border=True):
             "Date", datetime.date.today(), label_visibility="collapsed")
         date_str = selected_date.strftime("%Y-%m-%d")
 
-# 4. FETCH REAL DATA
+# 3. FETCH REAL DATA
 try:
     stats = get_dashboard_stats(date_str)
     latest_news = get_latest_news_preview()
@@ -52,7 +58,7 @@ except Exception as e:
     latest_paper = None
     # st.error(f"Database Connection Error: {e}") # Uncomment to debug
 
-# 5. METRICS
+# 4. METRICS
 st.write("")
 c1, c2, c3 = st.columns(3)
 
@@ -82,7 +88,7 @@ with c3:
 
 st.divider()
 
-# 6. MAIN FEED PREVIEWS
+# 5. MAIN FEED PREVIEWS
 col_left, col_right = st.columns(2)
 
 # --- LEFT COLUMN: GLOBAL NEWS ---
@@ -90,8 +96,8 @@ with col_left:
     st.markdown("### 🌍 Global News")
     with st.container(border=True):
         if latest_news:
-            # Parse the AI summary to get a clean headline
-            display_title = parse_headline(latest_news['summary'])
+            # The translated headline is stored at ingest; fall back to the original
+            display_title = latest_news['headline'] or latest_news['title']
 
             st.markdown(f"**{display_title}**")
             st.caption(
@@ -126,3 +132,34 @@ with col_right:
         # This button could link to your pages/02_🎓_Academic_Feed.py
         if st.button("View Academic Feed", width='stretch', key="btn_academic"):
             st.switch_page("pages/02_🎓_Academic_Feed.py")
+
+# 6. LLM USAGE
+# What the runners spent on Gemini, from the llm_usage ledger (UTC days)
+st.divider()
+with st.expander("🤖 LLM Usage (last 7 days)"):
+    try:
+        week_ago = (datetime.datetime.now(datetime.timezone.utc)
+                    - datetime.timedelta(days=6)).strftime("%Y-%m-%d")
+        usage = get_llm_usage_summary(week_ago)
+    except Exception:
+        usage = []
+
+    if not usage:
+        st.info("No LLM calls recorded yet.")
+    else:
+        latest = usage[0]
+        tokens = latest['prompt_tokens'] + latest['response_tokens']
+        u1, u2, u3 = st.columns(3)
+        u1.metric(f"Requests ({latest['day']})", f"{latest['requests']}",
+                  f"of {LLM_DAILY_REQUESTS} budget" if LLM_DAILY_REQUESTS else None,
+                  delta_color="off")
+        u2.metric("Tokens", f"{tokens:,}",
+                  f"of {LLM_DAILY_TOKENS:,} budget" if LLM_DAILY_TOKENS else None,
+                  delta_color="off")
+        u3.metric("Failures", f"{latest['errors']}",
+                  f"{latest['rate_limited']} rate-limited", delta_color="off")
+
+        st.dataframe([dict(row) for row in usage], hide_index=True, width='stretch')
+        st.caption(f"By prompt on {latest['day']}")
+        st.dataframe([dict(row) for row in get_llm_usage_by_prompt(latest['day'])],
+                     hide_index=True, width='stretch')
@@ -1,24 +1,66 @@
 import requests
 import datetime
 import os
-import time
 import random
-from google import genai
+import threading
+from requests.adapters import HTTPAdapter
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
+from app.ratelimit import (
+    gemini_limiter, semantic_scholar_limiter, call_with_backoff, map_concurrently,
+    GEMINI_MAX_IN_FLIGHT
+)
+from app.llm_cache import cached_llm_call, get_cached, put_cached
+from app.database import get_topic_watermark
+from app.backends import semantic_scholar_url
+from app.llm_budget import generate_json, BudgetExhausted
+from app import metrics
 
 load_dotenv()
 
 # --- CONFIGURATION ---
 DEV_MODE = False
+S2_FETCH_WORKERS = 4    # Topic searches in flight at once
+S2_TIMEOUT = 30         # Seconds per Semantic Scholar request
+S2_BATCH_SIZE = 500     # Ids per /paper/batch request, the API's limit
 # ---------------------
 
-client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
+MODEL_NAME = 'gemini-flash-latest'
+# Bump whenever the review prompt or schema changes, so cached scores are not reused.
+REVIEW_PROMPT_VERSION = 1
+REVIEW_BATCH_PROMPT_VERSION = "batch-1"
+# Papers per generate_content call in batch mode
+REVIEW_BATCH_SIZE = 8
 
-VIP_VENUES = [
-    "Nature", "Science", "Cell", "The Lancet", "New England Journal of Medicine",
-    "JAMA", "IEEE", "NeurIPS", "ICML", "CVPR", "ArXiv"
-]
+
+# Shared by the single and batch review prompts
+REVIEW_RUBRIC = """
+    You are a ruthless Scientific Editor for "Peripheral News."
+    Your Goal: Prioritize the reader's time by filtering out insignificant research.
+
+    ### THE GOLDEN RULE OF SIGNIFICANCE
+    To determine if a paper is worth reading, you must ask this specific question:
+    "Does this impact affect the population OUTSIDE of this specific domain, or does it help experts in this domain DIRECTLY impact the outside population?"
+
+    ### SCORING RUBRIC (1-10)
+    
+    **SCORES 1-5: INSIGNIFICANT (REJECT)**
+    - Criteria: The impact is trapped inside the domain.
+    - Examples: Incremental tweaks to algorithms, pure simulations with no real-world tether, theoretical proofs without application, or student-level reviews.
+    - Action: If it doesn't pass the Golden Rule, give it a low score so it is filtered out.
+
+    **SCORE 6: DOMAIN RELEVANT (BORDERLINE)**
+    - Criteria: Solid science, but the downstream impact on humanity is vague or too distant.
+    
+    **SCORE 7: IMPACTFUL (PUBLISH)**
+    - Criteria: Clear potential to affect the outside world.
+    - Example: A new material that *could* make batteries 20% cheaper, or a drug target that *might* cure a rare disease.
+
+    **SCORES 8-10: TRANSFORMATIVE (MAJOR INNOVATION)**
+    - Criteria: A breakthrough that will undeniably change safety, health, energy, or understanding of the universe for the general public.
+    - Example: Research on Earth's core (like the Nature s41586-024-08322-y paper) that enables better earthquake prediction. This saves lives.
+    - Example: A fusion reactor achieving net gain. This changes energy forever.
+"""
 
 
 class QuickPaperReview(BaseModel):
@@ -31,71 +73,162 @@ class QuickPaperReview(BaseModel):
     category: str = Field(description="The specific sub-field.")
 
 
-def fetch_with_retry(url, params, retries=5, backoff_factor=2):
+class BatchPaperReview(QuickPaperReview):
+    id: int = Field(description="The [ID] of the paper this review belongs to.")
+
+
+# One keep-alive session per worker thread (requests.Session is not thread-safe)
+_sessions = threading.local()
+
+
+def _get_session():
+    session = getattr(_sessions, "session", None)
+    if session is None:
+        session = requests.Session()
+        session.mount("https://", HTTPAdapter(pool_maxsize=S2_FETCH_WORKERS))
+        if os.getenv("S2_API_KEY"):
+            session.headers["x-api-key"] = os.getenv("S2_API_KEY")
+        _sessions.session = session
+    return session
+
+
+def _fetch_json(url, params, retries=5, backoff_factor=2, json_body=None):
+    """
+    GETs a Semantic Scholar endpoint (POSTs json_body when given); returns the
+    decoded JSON body or None.
+    """
     for attempt in range(retries):
+        # Every attempt, retries included, spends a token from the shared quota
+        semantic_scholar_limiter.acquire()
         try:
-            response = requests.get(url, params=params)
+            with metrics.timer("s2_request_seconds"):
+                if json_body is None:
+                    response = _get_session().get(url, params=params, timeout=S2_TIMEOUT)
+                else:
+                    response = _get_session().post(url, params=params, json=json_body,
+                                                   timeout=S2_TIMEOUT)
+            metrics.count("s2_requests_total", status=response.status_code)
             if response.status_code == 200:
-                return response.json().get('data', [])
+                return response.json()
             elif response.status_code == 429:
                 wait = (backoff_factor ** attempt) + random.uniform(0, 1)
                 print(f"      ⚠️ Rate limited. Waiting {wait:.1f}s...")
-                time.sleep(wait)
+                metrics.count("rate_limited_total", limiter=semantic_scholar_limiter.name)
+                # Back off every topic worker, not just this one
+                semantic_scholar_limiter.pause(wait)
             else:
-                return []
+                return None
         except Exception:
-            return []
-    return []
+            metrics.count("s2_requests_total", status="error")
+            return None
+    return None
+
+
+def fetch_with_retry(url, params, retries=5, backoff_factor=2):
+    body = _fetch_json(url, params, retries, backoff_factor)
+    return body.get('data', []) if body else []
+
 
+def _behind_watermark(paper, watermark):
+    """True if the paper is at or below the watermark we already processed."""
+    date = paper.get('publicationDate')
+    if watermark is None or not date:
+        return False  # Undated papers can't be placed; bulk dedupe catches repeats
+    newest_date, seen_ids = watermark
+    return date < newest_date or (date == newest_date and paper['paperId'] in seen_ids)
 
-def fetch_latest_papers(topic="Artificial Intelligence", limit=20):
-    url = "https://api.semanticscholar.org/graph/v1/paper/search"
+
+def fetch_latest_papers(topic="Artificial Intelligence", limit=20, watermark=None, max_pages=5):
+    """
+    Without a watermark: the newest 'limit' papers from the last two years.
+    With watermark=(newest_date, seen_ids): papers published since then, oldest
+    first, up to limit * max_pages of them.
+    Returns (papers, caught_up). When caught_up is False the rest are all newer
+    than the papers returned, so the watermark can still advance past them.
+    """
     current_year = datetime.datetime.now().year
     year_range = f"{current_year-1}-{current_year}"
+    fields = "title,abstract,url,publicationDate,venue,authors"
+
+    if watermark is None:
+        params = {
+            "query": topic,
+            "year": year_range,
+            "sort": "publicationDate:desc",
+            "fields": fields,
+            "limit": limit
+        }
+        return fetch_with_retry(semantic_scholar_url("/paper/search"), params), True
 
+    # /paper/search ranks by relevance whatever 'sort' says; the bulk search
+    # honours it and pages with a token. Oldest first, so stopping early
+    # leaves no gap behind the watermark. Its pages hold up to 1000 papers, so
+    # it only lists ids and dates; the papers we keep are fetched in full after.
+    url = semantic_scholar_url("/paper/search/bulk")
     params = {
         "query": topic,
-        "year": year_range,
-        "sort": "publicationDate:desc",
-        "fields": "title,abstract,url,publicationDate,venue,authors",
-        "limit": limit
+        "sort": "publicationDate:asc",
+        "fields": "publicationDate",
+        "publicationDateOrYear": f"{watermark[0]}:"  # Inclusive, open-ended
     }
-    return fetch_with_retry(url, params)
+    cap = limit * max_pages
+    papers = []
+    caught_up = False
+    for _ in range(max_pages):
+        body = _fetch_json(url, params)
+        if not body:
+            break
+        papers.extend(p for p in body.get('data', []) if not _behind_watermark(p, watermark))
+        if not body.get('token'):
+            caught_up = True
+            break
+        if len(papers) >= cap:
+            break
+        params["token"] = body['token']
+    if len(papers) > cap:
+        papers, caught_up = papers[:cap], False
+    if not papers:
+        return [], caught_up
+    kept = []
+    for start in range(0, len(papers), S2_BATCH_SIZE):
+        ids = [p['paperId'] for p in papers[start:start + S2_BATCH_SIZE]]
+        details = _fetch_json(semantic_scholar_url("/paper/batch"), {"fields": fields},
+                              json_body={"ids": ids})
+        if details is None:
+            return [], False  # Nothing fetched, so the watermark stays put
+        # null for papers withdrawn since they were listed
+        kept.extend(paper for paper in details if paper)
+    return kept, caught_up
 
 
-def evaluate_paper(paper):
-    if not paper.get('abstract'):
-        return None
+def sweep_topics(topics, limit=20, max_workers=S2_FETCH_WORKERS, max_pages=5):
+    """
+    Searches many topics concurrently over pooled sessions, all under the one
+    Semantic Scholar rate limiter. Each topic starts from its stored watermark.
+    Yields (topic, (papers, caught_up), error) as each topic's search completes.
+    """
+    def search(topic):
+        with metrics.timer("s2_search_seconds", topic=topic):
+            return fetch_latest_papers(topic=topic, limit=limit,
+                                       watermark=get_topic_watermark(topic),
+                                       max_pages=max_pages)
 
-    venue = paper.get('venue') or "Unknown"
+    return map_concurrently(search, topics, max_workers)
 
-    prompt = f"""
-    You are a ruthless Scientific Editor for "Peripheral News."
-    Your Goal: Prioritize the reader's time by filtering out insignificant research.
 
-    ### THE GOLDEN RULE OF SIGNIFICANCE
-    To determine if a paper is worth reading, you must ask this specific question:
-    "Does this impact affect the population OUTSIDE of this specific domain, or does it help experts in this domain DIRECTLY impact the outside population?"
+def _review_fields(paper):
+    return {"title": paper['title'],
+            "venue": paper.get('venue') or "Unknown",
+            "abstract": paper['abstract']}
 
-    ### SCORING RUBRIC (1-10)
-    
-    **SCORES 1-5: INSIGNIFICANT (REJECT)**
-    - Criteria: The impact is trapped inside the domain.
-    - Examples: Incremental tweaks to algorithms, pure simulations with no real-world tether, theoretical proofs without application, or student-level reviews.
-    - Action: If it doesn't pass the Golden Rule, give it a low score so it is filtered out.
 
-    **SCORE 6: DOMAIN RELEVANT (BORDERLINE)**
-    - Criteria: Solid science, but the downstream impact on humanity is vague or too distant.
-    
-    **SCORE 7: IMPACTFUL (PUBLISH)**
-    - Criteria: Clear potential to affect the outside world.
-    - Example: A new material that *could* make batteries 20% cheaper, or a drug target that *might* cure a rare disease.
+def evaluate_paper(paper):
+    if not paper.get('abstract'):
+        return None
 
-    **SCORES 8-10: TRANSFORMATIVE (MAJOR INNOVATION)**
-    - Criteria: A breakthrough that will undeniably change safety, health, energy, or understanding of the universe for the general public.
-    - Example: Research on Earth's core (like the Nature s41586-024-08322-y paper) that enables better earthquake prediction. This saves lives.
-    - Example: A fusion reactor achieving net gain. This changes energy forever.
+    venue = paper.get('venue') or "Unknown"
 
+    prompt = f"""{REVIEW_RUBRIC}
     ### YOUR TASK
     Analyze the paper below. If it is "Insignificant," score it low (1-5). If it passes the Golden Rule, score it high (7+).
     
@@ -107,16 +240,111 @@ def evaluate_paper(paper):
     Output JSON.
     """
 
-    try:
-        response = client.models.generate_content(
-            model='gemini-flash-latest',
-            contents=prompt,
-            config={
-                'response_mime_type': 'application/json',
-                'response_schema': QuickPaperReview,
-            }
-        )
+    def review():
+        response = call_with_backoff(
+            generate_json, MODEL_NAME, "review", prompt, QuickPaperReview,
+            limiter=gemini_limiter)
         return response.parsed.model_dump()
+
+    try:
+        # Re-runs (e.g. after a crash) reuse the score instead of paying again
+        return cached_llm_call(MODEL_NAME, REVIEW_PROMPT_VERSION, _review_fields(paper), review)
+    except BudgetExhausted:
+        raise  # Not a bad paper: the caller leaves it for tomorrow's sweep
     except Exception as e:
         print(f"Review failed: {e}")
+        metrics.count("llm_failures_total", prompt="review")
         return None
+
+
+def _evaluate_batch(papers):
+    """
+    Scores up to REVIEW_BATCH_SIZE papers in ONE generate_content call.
+    Returns {index: review_dict} for every paper the model answered.
+    """
+    paper_blocks = "\n\n".join(
+        f"[{i}] Title: {paper['title']}\n"
+        f"Venue: {paper.get('venue') or 'Unknown'}\n"
+        f"Abstract: {paper['abstract']}"
+        for i, paper in enumerate(papers)
+    )
+
+    prompt = f"""{REVIEW_RUBRIC}
+    ### YOUR TASK
+    Score each of the {len(papers)} papers below independently. If it is "Insignificant," score it low (1-5). If it passes the Golden Rule, score it high (7+).
+    Return one review per paper, tagged with its [ID].
+
+    {paper_blocks}
+
+    Output JSON.
+    """
+
+    response = call_with_backoff(
+        generate_json, MODEL_NAME, "review_batch", prompt, list[BatchPaperReview],
+        items=len(papers), limiter=gemini_limiter)
+
+    results = {}
+    for item in response.parsed or []:
+        if 0 <= item.id < len(papers) and item.id not in results:
+            results[item.id] = QuickPaperReview(
+                **item.model_dump(exclude={"id"})).model_dump()
+    return results
+
+
+def evaluate_paper_batch(papers):
+    """
+    Batch version of evaluate_paper: returns one review (or None) per paper, in order.
+    Cached papers skip the API; anything the batch call fails to return falls
+    back to a single evaluate_paper call.
+    """
+    reviews = [None] * len(papers)
+    pending = []
+    for i, paper in enumerate(papers):
+        if not paper.get('abstract'):
+            continue
+        # A score from either prompt counts: the same paper never costs a second call
+        reviews[i] = (
+            get_cached(MODEL_NAME, REVIEW_BATCH_PROMPT_VERSION, _review_fields(paper))
+            or get_cached(MODEL_NAME, REVIEW_PROMPT_VERSION, _review_fields(paper)))
+        if reviews[i] is None:
+            pending.append(i)
+
+    if pending:
+        try:
+            answered = _evaluate_batch([papers[i] for i in pending])
+        except BudgetExhausted:
+            raise
+        except Exception as e:
+            print(f"Batch review failed ({e}); retrying one by one.")
+            metrics.count("llm_failures_total", prompt="review_batch")
+            answered = {}
+
+        for position, i in enumerate(pending):
+            if position in answered:
+                reviews[i] = answered[position]
+                put_cached(MODEL_NAME, REVIEW_BATCH_PROMPT_VERSION,
+                           _review_fields(papers[i]), reviews[i])
+            else:
+                metrics.count("llm_batch_fallbacks_total", prompt="review_batch")
+                reviews[i] = evaluate_paper(papers[i])
+
+    return reviews
+
+
+def evaluate_papers(papers, max_in_flight=GEMINI_MAX_IN_FLIGHT, batch_size=1):
+    """
+    Scores many papers concurrently under the shared Gemini rate limiter.
+    With batch_size > 1, papers are grouped into multi-item prompts
+    (see evaluate_paper_batch).
+    Yields (paper, review, error) as each review completes; review may be None.
+    """
+    if batch_size <= 1:
+        yield from map_concurrently(evaluate_paper, papers, max_in_flight)
+        return
+
+    batches = [papers[i:i + batch_size]
+               for i in range(0, len(papers), batch_size)]
+    for batch, reviews, error in map_concurrently(
+            evaluate_paper_batch, batches, max_in_flight):
+        for i, paper in enumerate(batch):
+            yield paper, (reviews[i] if reviews else None), error
@@ -1,20 +1,62 @@
-import os
-from google import genai
+from pydantic import BaseModel, Field
 from dotenv import load_dotenv
+from app.ratelimit import (
+    gemini_limiter, call_with_backoff, map_concurrently, GEMINI_MAX_IN_FLIGHT
+)
+from app.llm_cache import cached_llm_call, get_cached, put_cached
+from app.llm_budget import generate_json, BudgetExhausted
+from app import metrics
 
 # 1. LOAD ENV VARS
 load_dotenv()
 
-# 2. DEFINE CLIENT (Global Scope)
-# This line must be all the way to the left!
-client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
+# 2. CLIENT
+# Every Gemini call goes through app.llm_budget.generate_json, which checks the
+# daily budget and records the call in the usage ledger. The client itself comes
+# from app.backends, so a load test can swap in a local fake.
+
+MODEL_NAME = 'gemini-flash-latest'
+# Bump whenever the prompt below changes, so cached answers are not reused.
+ANALYSIS_PROMPT_VERSION = 2
+ANALYSIS_BATCH_PROMPT_VERSION = "batch-2"
+# Articles per generate_content call in batch mode
+ANALYSIS_BATCH_SIZE = 8
+
+
+class NewsAnalysis(BaseModel):
+    headline: str = Field(
+        description="A clear English translation of the headline.")
+    summary: str = Field(
+        description="A 2-sentence summary of the core message.")
+    analyst_note: str = Field(
+        description="An 'Analyst Note' on any cultural context, bias, or hidden meaning.")
+    language: str = Field(
+        description="ISO 639-1 code of the original article's language, e.g. 'zh', 'ru', 'fr'.")
+
+
+class ArticleAnalysis(NewsAnalysis):
+    id: int = Field(description="The [ID] of the article this analysis belongs to.")
+
 
 # 3. DEFINE FUNCTION
 
 
+def _generate(prompt):
+    response = generate_json(MODEL_NAME, "analysis", prompt, NewsAnalysis)
+    return response.parsed.model_dump()
+
+
+def _article_fields(article):
+    return {key: article[key] for key in ("source", "title", "summary")}
+
+
 def analyze_article(article):
     """
     Analyzes a news article using the new Google Gen AI SDK.
+    Waits for the shared Gemini rate limiter and retries on 429.
+    Identical articles are answered from the LLM response cache.
+    Returns a {headline, summary, analyst_note, language} dict, or None on failure.
+    Raises BudgetExhausted once the daily LLM budget is spent.
     """
 
     prompt = f"""
@@ -29,18 +71,113 @@ def analyze_article(article):
     1. A clear English translation of the headline.
     2. A 2-sentence summary of the core message.
     3. An "Analyst Note" on any cultural context, bias, or hidden meaning.
+    4. The language the original is written in.
 
-    Format the output clearly.
+    Output JSON.
     """
 
     try:
-        # Since 'client' is defined globally above, the function can "see" it.
-        # In app/analysis.py
-        response = client.models.generate_content(
-            model='gemini-flash-latest',
-            contents=prompt
-        )
-        return response.text
+        return cached_llm_call(
+            MODEL_NAME, ANALYSIS_PROMPT_VERSION, _article_fields(article),
+            lambda: call_with_backoff(_generate, prompt, limiter=gemini_limiter))
 
+    except BudgetExhausted:
+        raise
     except Exception as e:
-        return f"Error analyzing article: {e}"
+        print(f"      ⚠️ Analysis failed: {e}")
+        metrics.count("llm_failures_total", prompt="analysis")
+        return None
+
+
+def _analyze_batch(articles):
+    """
+    Analyzes up to ANALYSIS_BATCH_SIZE articles in ONE generate_content call.
+    Returns {index: analysis_dict} for every item the model answered; items it
+    skipped or mangled are simply missing.
+    """
+    snippets = "\n\n".join(
+        f"[{i}] Source: {article['source']}\n"
+        f"Original Title: {article['title']}\n"
+        f"Original Content: {article['summary']}"
+        for i, article in enumerate(articles)
+    )
+
+    prompt = f"""
+    You are an expert Foreign Intelligence Analyst.
+
+    Analyze each of the following {len(articles)} news snippets independently.
+
+    {snippets}
+
+    For EVERY snippet, return one object with its [ID] and:
+    1. A clear English translation of the headline.
+    2. A 2-sentence summary of the core message.
+    3. An "Analyst Note" on any cultural context, bias, or hidden meaning.
+    4. The language the original is written in.
+
+    Output JSON.
+    """
+
+    response = call_with_backoff(
+        generate_json, MODEL_NAME, "analysis_batch", prompt, list[ArticleAnalysis],
+        items=len(articles), limiter=gemini_limiter)
+
+    results = {}
+    for item in response.parsed or []:
+        if 0 <= item.id < len(articles) and item.id not in results:
+            results[item.id] = NewsAnalysis(
+                **item.model_dump(exclude={"id"})).model_dump()
+    return results
+
+
+def analyze_article_batch(articles):
+    """
+    Batch version of analyze_article: returns one analysis (or None) per article, in order.
+    Cached articles skip the API; anything the batch call fails to return
+    falls back to a single analyze_article call.
+    """
+    # An answer from either prompt counts: the same inputs never cost a second call
+    analyses = [get_cached(MODEL_NAME, ANALYSIS_BATCH_PROMPT_VERSION, _article_fields(a))
+                or get_cached(MODEL_NAME, ANALYSIS_PROMPT_VERSION, _article_fields(a))
+                for a in articles]
+    pending = [i for i, analysis in enumerate(analyses) if analysis is None]
+
+    if pending:
+        try:
+            answered = _analyze_batch([articles[i] for i in pending])
+        except BudgetExhausted:
+            raise
+        except Exception as e:
+            print(f"      ⚠️ Batch analysis failed ({e}); retrying one by one.")
+            metrics.count("llm_failures_total", prompt="analysis_batch")
+            answered = {}
+
+        for position, i in enumerate(pending):
+            if position in answered:
+                analyses[i] = answered[position]
+                put_cached(MODEL_NAME, ANALYSIS_BATCH_PROMPT_VERSION,
+                           _article_fields(articles[i]), analyses[i])
+            else:
+                metrics.count("llm_batch_fallbacks_total", prompt="analysis_batch")
+                analyses[i] = analyze_article(articles[i])
+
+    return analyses
+
+
+def analyze_articles(articles, max_in_flight=GEMINI_MAX_IN_FLIGHT, batch_size=1):
+    """
+    Analyzes many articles concurrently. Throughput is set by the shared
+    Gemini rate limiter, not by fixed sleeps. With batch_size > 1, articles are
+    grouped into multi-item prompts (see analyze_article_batch).
+    Yields (article, analysis, error) as each analysis completes; analysis may be None.
+    """
+    if batch_size <= 1:
+        yield from map_concurrently(analyze_article, articles, max_in_flight)
+        return
+
+    batches = [articles[i:i + batch_size]
+               for i in range(0, len(articles), batch_size)]
+    for batch, analyses, error in map_concurrently(
+            analyze_article_batch, batches, max_in_flight):
+        for i, article in enumerate(batch):
+            yield article, (analyses[i] if analyses else None), error
@@ -0,0 +1,62 @@
+import os
+import threading
+from contextlib import contextmanager
+import feedparser
+from google import genai
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --- EXTERNAL SERVICES ---
+# Everything the pipeline talks to over the network goes through one of these.
+# The runners use the live services; load_harness.py swaps in the local
+# stand-ins from app/fakes.py with use_backends(...).
+SEMANTIC_SCHOLAR_URL = "https://api.semanticscholar.org/graph/v1"
+
+_backends = {
+    # feedparser.parse-compatible: parse_feed(content, response_headers=...) -> feed
+    "parse_feed": feedparser.parse,
+    # Base URL that fetch_with_retry searches under ("/paper/search")
+    "semantic_scholar_url": SEMANTIC_SCHOLAR_URL,
+    # Anything with .models.generate_content(model=, contents=, config=).
+    # None means the live genai.Client, created on first use.
+    "llm_client": None,
+}
+_lock = threading.Lock()
+# -------------------------
+
+
+def parse_feed(content, **kwargs):
+    return _backends["parse_feed"](content, **kwargs)
+
+
+def semantic_scholar_url(path):
+    return _backends["semantic_scholar_url"].rstrip("/") + path
+
+
+def llm_client():
+    with _lock:
+        if _backends["llm_client"] is None:
+            _backends["llm_client"] = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
+        return _backends["llm_client"]
+
+
+@contextmanager
+def use_backends(**overrides):
+    """
+    Swaps backends for the duration of the block, for every thread in the process
+    (sweeps fan out over worker pools), and restores the previous ones afterwards.
+        with use_backends(llm_client=FakeLLMClient(), semantic_scholar_url=server.url):
+            update_feeds()
+    """
+    unknown = set(overrides) - set(_backends)
+    if unknown:
+        raise ValueError(f"Unknown backend(s): {', '.join(sorted(unknown))}")
+    with _lock:
+        previous = {name: _backends[name] for name in overrides}
+        _backends.update(overrides)
+    try:
+        yield
+    finally:
+        with _lock:
+            _backends.update(previous)
@@ -1,14 +1,217 @@
+import os
 import sqlite3
 import datetime
+import re
+import time
+import json
+import threading
+import weakref
+import atexit
+import functools
+import hashlib
+import heapq
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from app import metrics
 
 DB_NAME = "peripheral_news.db"
 
+# --- CONNECTION TUNING ---
+# WAL lets the Streamlit pages keep reading while an ingestion run writes.
+BUSY_TIMEOUT_MS = 30000           # Wait up to 30s for a writer instead of "database is locked"
+CACHE_SIZE_KIB = 20000            # ~20MB page cache per connection
+MMAP_SIZE_BYTES = 256 * 1024 * 1024
+READ_CACHE_MAX_ENTRIES = 128      # Cached results kept per read function
+FEED_PAGE_SIZE = 20               # Cards per "Load more" page
+# -------------------------
 
-def init_db():
-    """Creates tables for BOTH Academic Papers and Global News."""
-    conn = sqlite3.connect(DB_NAME)
+# One connection per (thread, database file). Keyed on the Thread object so
+# connections belonging to finished Streamlit script threads get dropped.
+_connections = weakref.WeakKeyDictionary()
+_connections_lock = threading.Lock()
+
+
+def _configure_connection(conn):
+    """Applies the WAL journal and performance pragmas to a fresh connection."""
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    try:
+        # journal_mode is persistent, so this only does real work the first time.
+        conn.execute("PRAGMA journal_mode = WAL")
+    except sqlite3.OperationalError:
+        pass  # Read-only filesystem: fall back to whatever mode the file has
+    # NORMAL is durable in WAL mode except for the last commits on power loss.
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KIB}")
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE_BYTES}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+
+
+def get_connection(db_name=None):
+    """
+    Returns this thread's shared connection to db_name (default DB_NAME),
+    opening it on first use.
+    Connections run in autocommit mode; wrap writes in `transaction()`.
+    """
+    db_name = db_name or DB_NAME
+    thread = threading.current_thread()
+    with _connections_lock:
+        per_thread = _connections.setdefault(thread, {})
+        conn = per_thread.get(db_name)
+        if conn is None:
+            # check_same_thread=False only so close_all_connections() can run
+            # at exit; each connection is still used by a single thread.
+            conn = sqlite3.connect(
+                db_name, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            _configure_connection(conn)
+            per_thread[db_name] = conn
+    return conn
+
+
+@contextmanager
+def transaction(db_name=None):
+    """
+    Yields a cursor inside a single write transaction on this thread's connection.
+    BEGIN IMMEDIATE takes the write lock up front, so concurrent writers queue on
+    busy_timeout instead of failing halfway through.
+    """
+    conn = get_connection(db_name)
     c = conn.cursor()
+    c.execute("BEGIN IMMEDIATE")
+    try:
+        yield c
+    except BaseException:
+        conn.rollback()
+        raise
+    else:
+        conn.commit()
+
+
+def close_connection():
+    """Closes this thread's connection(s), e.g. at the end of a worker thread."""
+    with _connections_lock:
+        per_thread = _connections.pop(threading.current_thread(), {})
+    for conn in per_thread.values():
+        conn.close()
+
+
+@atexit.register
+def close_all_connections():
+    """
+    Closes every open connection. Closing the last connection checkpoints the WAL
+    back into peripheral_news.db, so the committed file is always complete.
+    """
+    with _connections_lock:
+        all_conns = [conn for per_thread in _connections.values()
+                     for conn in per_thread.values()]
+        _connections.clear()
+    with _watcher_lock:
+        if _watcher["conn"] is not None:
+            all_conns.append(_watcher["conn"])
+            _watcher["conn"] = None
+    for conn in all_conns:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+
+# ==========================
+# 🧠 READ CACHE
+# ==========================
+# Streamlit re-runs every page top to bottom on each widget interaction. The
+# read functions below are cached on their arguments and only re-query once
+# the database has actually changed.
+#
+# PRAGMA data_version changes whenever *another* connection commits, so one
+# dedicated watcher connection (which never writes) sees every commit: from
+# the runners, from other processes, and from this process's own threads.
+
+_watcher = {"db": None, "conn": None, "generation": 0}
+_watcher_lock = threading.Lock()
+_read_caches = []
+
+
+def data_version():
+    """An opaque token that changes whenever anything commits to DB_NAME."""
+    with _watcher_lock:
+        if _watcher["conn"] is None or _watcher["db"] != DB_NAME:
+            if _watcher["conn"] is not None:
+                _watcher["conn"].close()
+            _watcher["conn"] = sqlite3.connect(
+                DB_NAME, isolation_level=None, check_same_thread=False)
+            _watcher["db"] = DB_NAME
+            # A fresh connection restarts data_version, so tokens from the old
+            # one must never compare equal to the new one's.
+            _watcher["generation"] += 1
+        version = _watcher["conn"].execute("PRAGMA data_version").fetchone()[0]
+        return (_watcher["generation"], version)
+
 
+def _freeze(value):
+    """Makes list arguments (e.g. a topic list) usable as a cache key."""
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def cached_read(fn):
+    """
+    Caches a read function's result per (DB_NAME, arguments) until the next
+    commit. Results are shared between callers, so treat them as read-only.
+    """
+    cache = OrderedDict()
+    lock = threading.Lock()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        key = (DB_NAME, _freeze(args), tuple(sorted(
+            (name, _freeze(value)) for name, value in kwargs.items())))
+        # Read the version BEFORE querying: a commit landing mid-query makes the
+        # entry look stale (one extra query), never fresh when it is not.
+        version = data_version()
+        with lock:
+            hit = cache.get(key)
+            if hit is not None and hit[0] == version:
+                cache.move_to_end(key)
+                return hit[1]
+
+        result = fn(*args, **kwargs)
+        with lock:
+            cache[key] = (version, result)
+            cache.move_to_end(key)
+            while len(cache) > READ_CACHE_MAX_ENTRIES:
+                cache.popitem(last=False)
+        return result
+
+    wrapper.cache_clear = lambda: cache.clear()
+    _read_caches.append(wrapper)
+    return wrapper
+
+
+def clear_read_cache():
+    """Drops every cached read result."""
+    for fn in _read_caches:
+        fn.cache_clear()
+
+
+def _timed_query(fn):
+    """Times one of the runners' queries or writes into db_seconds{op=<function name>}."""
+    return metrics.timed("db_seconds", op=fn.__name__)(fn)
+
+
+# ==========================
+# 🧱 SCHEMA MIGRATIONS
+# ==========================
+# Each migration runs exactly once, in order, inside its own transaction, and
+# bumps schema_version. Append new migrations to the end of MIGRATIONS; never
+# edit one that has already shipped. Statements use IF NOT EXISTS so replaying
+# a migration against a database that already has the object is harmless.
+
+
+def _migration_001_base_tables(c):
+    """Creates tables for BOTH Academic Papers and Global News."""
     # 1. Academic Table (Existing)
     c.execute('''
         CREATE TABLE IF NOT EXISTS academic_papers (
@@ -37,144 +240,974 @@ def init_db():
         )
     ''')
 
-    conn.commit()
-    conn.close()
+
+def _migration_002_query_indexes(c):
+    """Indexes matched to the WHERE / ORDER BY of each read function."""
+    # get_global_news("All"), get_news_by_date, latest preview, "today" counts
+    c.execute("CREATE INDEX IF NOT EXISTS idx_news_added "
+              "ON global_news(added_date, original_date)")
+    # get_global_news(source), get_news_sources (DISTINCT source)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_news_source "
+              "ON global_news(source, added_date)")
+    # Academic "today" count and latest preview
+    c.execute("CREATE INDEX IF NOT EXISTS idx_papers_added "
+              "ON academic_papers(added_date)")
+    # get_feed only ever reads score >= 7, so partial indexes keep the
+    # rejected papers out of the index entirely.
+    c.execute("CREATE INDEX IF NOT EXISTS idx_papers_feed "
+              "ON academic_papers(published_date) WHERE score >= 7")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_papers_feed_field "
+              "ON academic_papers(field, published_date) WHERE score >= 7")
+
+
+def _migration_003_feed_cache(c):
+    """HTTP validators per RSS source for conditional GETs."""
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS feed_cache (
+            source TEXT PRIMARY KEY,
+            url TEXT,
+            etag TEXT,
+            last_modified TEXT,
+            body_hash TEXT,    -- sha256 of the last body we parsed
+            checked_date TEXT
+        )
+    ''')
+
+
+def _migration_004_llm_cache(c):
+    """Content-addressed cache of Gemini responses."""
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS llm_cache (
+            cache_key TEXT PRIMARY KEY,   -- sha256 of (model, prompt version, inputs)
+            model TEXT,
+            response TEXT,
+            created_at REAL,              -- unix timestamps
+            last_used_at REAL
+        )
+    ''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used "
+              "ON llm_cache(last_used_at)")
+
+
+def _migration_005_prescreen(c):
+    """Pre-screen bookkeeping: reject reasons, plus the inputs needed to replay it."""
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS prescreen_rejects (
+            paper_id TEXT PRIMARY KEY,
+            title TEXT,
+            field TEXT,
+            venue TEXT,
+            reason TEXT,
+            added_date TEXT
+        )
+    ''')
+    # The abstract itself is too big to keep, but venue and length are enough
+    # for evaluate_prescreen.py to replay the pre-screen offline.
+    columns = {row[1] for row in c.execute("PRAGMA table_info(academic_papers)")}
+    if "venue" not in columns:
+        c.execute("ALTER TABLE academic_papers ADD COLUMN venue TEXT")
+    if "abstract_words" not in columns:
+        c.execute("ALTER TABLE academic_papers ADD COLUMN abstract_words INTEGER")
+
+
+def _migration_006_topic_watermarks(c):
+    """Newest publication date (and the IDs seen on it) per academic topic."""
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS topic_watermarks (
+            topic TEXT PRIMARY KEY,
+            newest_date TEXT,   -- newest publicationDate fetched so far
+            seen_ids TEXT,      -- JSON list of paper IDs published on newest_date
+            updated_date TEXT
+        )
+    ''')
+
+
+def _migration_007_paper_topics(c):
+    """Many-to-many paper <-> topic tags, so one paper can appear under every hub."""
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS paper_topics (
+            paper_id TEXT,
+            topic TEXT,
+            PRIMARY KEY (paper_id, topic)
+        )
+    ''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_paper_topics_topic "
+              "ON paper_topics(topic, paper_id)")
+    # Backfill: every existing paper is tagged with the topic it was found under
+    c.execute("INSERT OR IGNORE INTO paper_topics (paper_id, topic) "
+              "SELECT paper_id, field FROM academic_papers")
+    # Keep the primary topic in sync without every writer having to remember it
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_papers_tag_primary_topic
+        AFTER INSERT ON academic_papers BEGIN
+            INSERT OR IGNORE INTO paper_topics (paper_id, topic) VALUES (new.paper_id, new.field);
+        END
+    ''')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_papers_untag_topics
+        AFTER DELETE ON academic_papers BEGIN
+            DELETE FROM paper_topics WHERE paper_id = old.paper_id;
+        END
+    ''')
+    # get_feed now filters through paper_topics instead of academic_papers.field
+    c.execute("DROP INDEX IF EXISTS idx_papers_feed_field")
+
+
+def _migration_008_story_fingerprints(c):
+    """MinHash signatures and LSH buckets for near-duplicate news detection."""
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS story_fingerprints (
+            link TEXT PRIMARY KEY,
+            source TEXT,
+            title TEXT,
+            signature BLOB,      -- packed MinHash signature (see app/fingerprint.py)
+            duplicate_of TEXT,   -- NULL for analyzed stories, else the canonical link
+            added_date TEXT
+        )
+    ''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_story_duplicate_of "
+              "ON story_fingerprints(duplicate_of)")
+    # One row per (band bucket, story). Buckets already encode their band.
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS story_bands (
+            bucket INTEGER,
+            link TEXT,
+            PRIMARY KEY (bucket, link)
+        ) WITHOUT ROWID
+    ''')
+
+
+def _migration_009_full_text_search(c):
+    """FTS5 indexes over news and papers, kept in sync by triggers."""
+    # External-content tables: the text lives once, in the base tables, and
+    # the FTS index points at their rowids.
+    for fts, table in (("news_fts", "global_news"), ("papers_fts", "academic_papers")):
+        c.execute(f'''
+            CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+                title, summary,
+                content='{table}', content_rowid='rowid',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+        ''')
+        c.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{fts}_insert AFTER INSERT ON {table} BEGIN
+                INSERT INTO {fts} (rowid, title, summary) VALUES (new.rowid, new.title, new.summary);
+            END
+        ''')
+        c.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{fts}_delete AFTER DELETE ON {table} BEGIN
+                INSERT INTO {fts} ({fts}, rowid, title, summary)
+                VALUES ('delete', old.rowid, old.title, old.summary);
+            END
+        ''')
+        c.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{fts}_update AFTER UPDATE OF title, summary ON {table} BEGIN
+                INSERT INTO {fts} ({fts}, rowid, title, summary)
+                VALUES ('delete', old.rowid, old.title, old.summary);
+                INSERT INTO {fts} (rowid, title, summary) VALUES (new.rowid, new.title, new.summary);
+            END
+        ''')
+        # Backfill everything already stored
+        c.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+
+
+def _migration_010_keyset_pagination(c):
+    """Indexes that match the keyset (cursor) order of the paged feeds."""
+    # Papers page on (published_date, paper_id). Undated papers sort as '' so
+    # they land at the end of the feed instead of dropping out of the keyset.
+    c.execute("DROP INDEX IF EXISTS idx_papers_feed")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_papers_feed_page "
+              "ON academic_papers(COALESCE(published_date, ''), paper_id) WHERE score >= 7")
+    # News pages on (added_date, link), with or without a source filter
+    c.execute("CREATE INDEX IF NOT EXISTS idx_news_page "
+              "ON global_news(added_date, link)")
+    c.execute("DROP INDEX IF EXISTS idx_news_source")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_news_source_page "
+              "ON global_news(source, added_date, link)")
+
+
+# Counters kept in row_counts: (table, dimension) -> the column each value comes from
+COUNTED_DIMENSIONS = {
+    "global_news": {"added_date": "added_date", "source": "source"},
+    "academic_papers": {"added_date": "added_date", "field": "field"},
+}
+
+
+def _count_upserts(table, row, delta):
+    """SQL that adds 'delta' to every row_counts entry of one row ('new' or 'old')."""
+    keys = [("total", "''")] + [
+        (dimension, f"COALESCE({row}.{column}, '')")
+        for dimension, column in COUNTED_DIMENSIONS[table].items()]
+    return "\n".join(
+        f"INSERT INTO row_counts (table_name, dimension, value, n) "
+        f"VALUES ('{table}', '{dimension}', {value}, {delta}) "
+        f"ON CONFLICT DO UPDATE SET n = n + {delta};"
+        for dimension, value in keys)
+
+
+def _migration_011_row_counts(c):
+    """Trigger-maintained totals and per-day / per-source / per-field counts."""
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS row_counts (
+            table_name TEXT,
+            dimension TEXT,    -- 'total', 'added_date', 'source' or 'field'
+            value TEXT,        -- '' for 'total'
+            n INTEGER NOT NULL,
+            PRIMARY KEY (table_name, dimension, value)
+        ) WITHOUT ROWID
+    ''')
+    for table, dimensions in COUNTED_DIMENSIONS.items():
+        c.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_count_insert
+            AFTER INSERT ON {table} BEGIN
+                {_count_upserts(table, "new", 1)}
+            END
+        ''')
+        c.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_count_delete
+            AFTER DELETE ON {table} BEGIN
+                {_count_upserts(table, "old", -1)}
+            END
+        ''')
+        c.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_count_update
+            AFTER UPDATE OF {", ".join(dimensions.values())} ON {table} BEGIN
+                {_count_upserts(table, "old", -1)}
+                {_count_upserts(table, "new", 1)}
+            END
+        ''')
+    _rebuild_row_counts(c)
+
+
+def _migration_012_analysis_columns(c):
+    """Structured analysis fields next to the rendered markdown in summary."""
+    columns = {row[1] for row in c.execute("PRAGMA table_info(global_news)")}
+    for column in ANALYSIS_FIELDS:
+        if column not in columns:
+            c.execute(f"ALTER TABLE global_news ADD COLUMN {column} TEXT")
+    _backfill_analysis_fields(c)
+
+
+def _migration_013_llm_usage(c):
+    """One ledger row per generate_content call: tokens, latency and outcome."""
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS llm_usage (
+            id INTEGER PRIMARY KEY,
+            called_at TEXT,        -- UTC "YYYY-MM-DD HH:MM:SS"
+            day TEXT,              -- UTC date the daily budget counts the call against
+            model TEXT,
+            prompt TEXT,           -- 'analysis', 'analysis_batch', 'review', 'review_batch'
+            items INTEGER,         -- Articles / papers in the prompt
+            prompt_tokens INTEGER,
+            response_tokens INTEGER,
+            latency_ms REAL,
+            outcome TEXT           -- 'ok', 'rate_limited' or 'error'
+        )
+    ''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_llm_usage_day ON llm_usage(day, prompt)")
+
+
+def _migration_014_delta_shards(c):
+    """Export high-water marks and the list of imported shards (see app/shards.py)."""
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS sync_state (
+            table_name TEXT PRIMARY KEY,
+            last_rowid INTEGER,    -- Highest rowid already in a shard ('append' / 'replace')
+            content_hash TEXT      -- Hash of the last exported copy ('snapshot')
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS shard_imports (
+            path TEXT PRIMARY KEY, -- Relative to SHARDS_DIR, e.g. '2026-10-18/news-120301Z.ndjson.gz'
+            sha256 TEXT,
+            rows INTEGER,
+            imported_date TEXT
+        )
+    ''')
+
+
+def _migration_015_sync_seq(c):
+    """
+    A per-row export sequence that only ever increases. Deleting a table's top
+    row (retention does) lets SQLite hand its rowid to the next insert, so
+    rowids cannot serve as the export high-water mark.
+    """
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS sync_counter (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            seq INTEGER NOT NULL
+        )
+    ''')
+    top = 0
+    for table, mode in SHARD_TABLES.items():
+        if mode == "snapshot":
+            continue
+        columns = {row[1] for row in c.execute(f"PRAGMA table_info({table})")}
+        if "sync_seq" not in columns:
+            c.execute(f"ALTER TABLE {table} ADD COLUMN sync_seq INTEGER")
+            # Existing rows take their rowid, so marks taken on rowids stay valid
+            c.execute(f"UPDATE {table} SET sync_seq = rowid")
+        c.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_sync_seq ON {table}(sync_seq)")
+        # Also fires for INSERT OR REPLACE, so overwritten rows are exported again
+        c.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_sync_seq AFTER INSERT ON {table} BEGIN
+                UPDATE sync_counter SET seq = seq + 1;
+                UPDATE {table} SET sync_seq = (SELECT seq FROM sync_counter)
+                WHERE rowid = new.rowid;
+            END
+        ''')
+        c.execute(f"SELECT COALESCE(MAX(sync_seq), 0) FROM {table}")
+        top = max(top, c.fetchone()[0])
+    c.execute("INSERT OR IGNORE INTO sync_counter (id, seq) VALUES (1, ?)", (top,))
+    columns = {row[1] for row in c.execute("PRAGMA table_info(sync_state)")}
+    if "last_rowid" in columns:
+        c.execute("ALTER TABLE sync_state RENAME COLUMN last_rowid TO last_seq")
+
+
+_LEGACY_USAGE_COLUMNS = ["called_at", "model", "prompt", "items", "prompt_tokens",
+                         "response_tokens", "latency_ms", "outcome"]
+
+
+def _legacy_usage_uid(values):
+    """The uid of a ledger row written before uids, from its _LEGACY_USAGE_COLUMNS values."""
+    return hashlib.sha256(json.dumps(list(values)).encode("utf-8")).hexdigest()[:32]
+
+
+def _migration_016_llm_usage_uid(c):
+    """
+    A key for ledger rows that means the same thing in every database. The id
+    is handed out locally, so two databases writing independently reuse ids
+    and a shard import would drop one side's calls as duplicates.
+    """
+    columns = {row[1] for row in c.execute("PRAGMA table_info(llm_usage)")}
+    if "uid" not in columns:
+        c.execute("ALTER TABLE llm_usage ADD COLUMN uid TEXT")
+    # Existing rows hash their contents, so a row already copied to another
+    # database (by a shard, or a restored checkout) gets the same uid there
+    c.execute(f"SELECT id, {', '.join(_LEGACY_USAGE_COLUMNS)} FROM llm_usage WHERE uid IS NULL")
+    c.executemany("UPDATE llm_usage SET uid = ? WHERE id = ?",
+                  [(_legacy_usage_uid(list(row)[1:]), row[0]) for row in c.fetchall()])
+    c.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_llm_usage_uid ON llm_usage(uid)")
+
+
+def _migration_017_fingerprint_mark(c):
+    """How far index_unfingerprinted_news has read global_news, by sync_seq."""
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS fingerprint_mark (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            last_seq INTEGER NOT NULL
+        )
+    ''')
+    # 0, so the first sweep after upgrading still indexes every stored article
+    c.execute("INSERT OR IGNORE INTO fingerprint_mark (id, last_seq) VALUES (1, 0)")
+
+
+MIGRATIONS = [
+    (1, "Base academic_papers and global_news tables", _migration_001_base_tables),
+    (2, "Indexes for feed, news and dashboard queries", _migration_002_query_indexes),
+    (3, "Conditional-GET cache for RSS feeds", _migration_003_feed_cache),
+    (4, "LLM response cache", _migration_004_llm_cache),
+    (5, "Pre-screen rejects and replay columns", _migration_005_prescreen),
+    (6, "Per-topic fetch watermarks", _migration_006_topic_watermarks),
+    (7, "Paper-to-topic association table", _migration_007_paper_topics),
+    (8, "Near-duplicate story fingerprints", _migration_008_story_fingerprints),
+    (9, "FTS5 full-text search", _migration_009_full_text_search),
+    (10, "Keyset pagination indexes", _migration_010_keyset_pagination),
+    (11, "Trigger-maintained row counters", _migration_011_row_counts),
+    (12, "Structured analysis columns", _migration_012_analysis_columns),
+    (13, "LLM usage ledger", _migration_013_llm_usage),
+    (14, "Delta shard bookkeeping", _migration_014_delta_shards),
+    (15, "Monotonic export sequence", _migration_015_sync_seq),
+    (16, "Portable key for the LLM usage ledger", _migration_016_llm_usage_uid),
+    (17, "Near-duplicate backfill high-water mark", _migration_017_fingerprint_mark),
+]
+
+
+def get_schema_version(db_name=None):
+    """Returns the highest migration applied to db_name (default DB_NAME; 0 for a fresh file)."""
+    c = get_connection(db_name).cursor()
+    c.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'")
+    if c.fetchone() is None:
+        return 0
+    c.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+    return c.fetchone()[0]
+
+
+def migrate(db_name=None):
+    """Applies every pending migration in order. Safe to call on every start-up."""
+    with transaction(db_name) as c:
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT,
+                applied_date TEXT
+            )
+        ''')
+
+    for version, description, apply in MIGRATIONS:
+        if version <= get_schema_version(db_name):
+            continue
+        with transaction(db_name) as c:
+            # Re-check under the write lock: another process may have just run it.
+            c.execute("SELECT 1 FROM schema_version WHERE version = ?", (version,))
+            if c.fetchone() is not None:
+                continue
+            apply(c)
+            c.execute("INSERT INTO schema_version (version, description, applied_date) VALUES (?, ?, ?)",
+                      (version, description, datetime.datetime.now().strftime("%Y-%m-%d")))
+
+
+def init_db():
+    """Brings the database up to the latest schema version."""
+    migrate()
+
+
+def explain_query_plan(query, params=()):
+    """Returns the 'detail' lines of EXPLAIN QUERY PLAN for a query."""
+    c = get_connection().cursor()
+    c.execute(f"EXPLAIN QUERY PLAN {query}", tuple(params))
+    return [row['detail'] for row in c.fetchall()]
+
+
+def find_table_scans(query, params=()):
+    """
+    Returns the plan lines that walk a whole table without an index
+    (e.g. "SCAN global_news"). An index walk ("SCAN t USING INDEX ...") is fine,
+    and so is an FTS5 MATCH ("SCAN news_fts VIRTUAL TABLE INDEX ...").
+    """
+    return [detail for detail in explain_query_plan(query, params)
+            if detail.startswith("SCAN") and "USING" not in detail
+            and "VIRTUAL TABLE INDEX" not in detail]
+
+def _chunked(items, size=500):
+    """Splits a list into slices that stay under SQLite's bound-variable limit."""
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _seen_keys_query(table, column, keys):
+    """Builds the SQL and params behind one chunk of _seen_keys()."""
+    placeholders = ','.join('?' for _ in keys)
+    return f"SELECT {column} FROM {table} WHERE {column} IN ({placeholders})", list(keys)
+
+
+def _seen_keys(c, table, column, keys):
+    seen = set()
+    for chunk in _chunked(keys):
+        c.execute(*_seen_keys_query(table, column, chunk))
+        seen.update(row[0] for row in c.fetchall())
+    return seen
+
+
+def _filter_unseen(table, column, keys):
+    """
+    Returns the keys (in input order, without repeats) that are not yet in
+    table.column, in the hot database or the archive.
+    """
+    keys = list(dict.fromkeys(keys))
+    if not keys:
+        return []
+    seen = _seen_keys(get_connection().cursor(), table, column, keys)
+    unseen = [key for key in keys if key not in seen]
+    if unseen and archive_exists():
+        seen = _seen_keys(get_connection(archive_path()).cursor(), table, column, unseen)
+        unseen = [key for key in unseen if key not in seen]
+    return unseen
+
+
+def _insert_many(query, rows):
+    """Inserts rows in one transaction with executemany; returns how many were new."""
+    if not rows:
+        return 0
+    with transaction() as c:
+        c.executemany(query, rows)
+        # rowcount, unlike total_changes, leaves out rows written by triggers
+        return c.rowcount
 
 # ==========================
 # 🎓 ACADEMIC FUNCTIONS
 # ==========================
 
+# ==========================
+# 🧠 LLM RESPONSE CACHE
+# ==========================
+
+
+@_timed_query
+def get_llm_cache(cache_key, max_age_seconds):
+    """Returns the cached response text for a key, or None if missing or expired."""
+    now = time.time()
+    c = get_connection().cursor()
+    c.execute("SELECT response FROM llm_cache WHERE cache_key = ? AND created_at >= ?",
+              (cache_key, now - max_age_seconds))
+    row = c.fetchone()
+    if row is None:
+        return None
+    with transaction() as c:
+        c.execute("UPDATE llm_cache SET last_used_at = ? WHERE cache_key = ?",
+                  (now, cache_key))
+    return row[0]
+
+
+@_timed_query
+def save_llm_cache(cache_key, model, response):
+    now = time.time()
+    with transaction() as c:
+        c.execute('''
+            INSERT OR REPLACE INTO llm_cache (cache_key, model, response, created_at, last_used_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (cache_key, model, response, now, now))
+
+
+@_timed_query
+def prune_llm_cache(max_bytes, max_age_seconds):
+    """
+    Drops expired entries, then the least recently used ones until the cached
+    responses fit in max_bytes. Returns the number of entries removed.
+    """
+    with transaction() as c:
+        c.execute("DELETE FROM llm_cache WHERE created_at < ?",
+                  (time.time() - max_age_seconds,))
+        removed = c.rowcount
+        c.execute('''
+            DELETE FROM llm_cache WHERE cache_key IN (
+                SELECT cache_key FROM (
+                    SELECT cache_key,
+                           SUM(LENGTH(response)) OVER (ORDER BY last_used_at DESC) AS running_bytes
+                    FROM llm_cache
+                ) WHERE running_bytes > ?
+            )
+        ''', (max_bytes,))
+        return removed + c.rowcount
+
+
+# ==========================
+# 🤖 LLM USAGE LEDGER
+# ==========================
+
+
+def record_llm_usage(model, prompt, items, prompt_tokens, response_tokens, latency_ms,
+                     outcome):
+    """Appends one generate_content call to the ledger."""
+    now = datetime.datetime.now(datetime.timezone.utc)
+    with transaction() as c:
+        c.execute('''
+            INSERT INTO llm_usage (uid, called_at, day, model, prompt, items, prompt_tokens,
+                                   response_tokens, latency_ms, outcome)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (uuid.uuid4().hex, now.strftime("%Y-%m-%d %H:%M:%S"), now.strftime("%Y-%m-%d"),
+              model, prompt, items, prompt_tokens, response_tokens, latency_ms, outcome))
+
+
+_LLM_USAGE_TOTALS_QUERY = '''
+    SELECT COUNT(*) AS requests,
+           COALESCE(SUM(prompt_tokens), 0) + COALESCE(SUM(response_tokens), 0) AS tokens
+    FROM llm_usage WHERE day = ? AND outcome != 'rate_limited'
+'''
+
+_LLM_USAGE_SUMMARY_QUERY = '''
+    SELECT day,
+           SUM(outcome != 'rate_limited') AS requests,
+           SUM(items) AS items,
+           COALESCE(SUM(prompt_tokens), 0) AS prompt_tokens,
+           COALESCE(SUM(response_tokens), 0) AS response_tokens,
+           SUM(outcome = 'error') AS errors,
+           SUM(outcome = 'rate_limited') AS rate_limited,
+           ROUND(AVG(latency_ms)) AS avg_latency_ms
+    FROM llm_usage WHERE day >= ?
+    GROUP BY day ORDER BY day DESC
+'''
+
+_LLM_USAGE_BY_PROMPT_QUERY = '''
+    SELECT prompt,
+           SUM(outcome != 'rate_limited') AS requests,
+           SUM(items) AS items,
+           COALESCE(SUM(prompt_tokens), 0) + COALESCE(SUM(response_tokens), 0) AS tokens,
+           SUM(outcome != 'ok') AS failures
+    FROM llm_usage WHERE day = ?
+    GROUP BY prompt ORDER BY tokens DESC
+'''
+
+
+def get_llm_usage_totals(day):
+    """
+    What a UTC day has spent so far: {"requests", "tokens"}. Calls turned away
+    with a 429 cost nothing upstream, so they are not counted. Uncached: the
+    budget controller needs the live figure.
+    """
+    c = get_connection().cursor()
+    c.execute(_LLM_USAGE_TOTALS_QUERY, (day,))
+    return dict(c.fetchone())
+
+
+@cached_read
+def get_llm_usage_summary(since_day):
+    """Per-day calls, tokens, failures and latency since 'since_day', newest first."""
+    c = get_connection().cursor()
+    c.execute(_LLM_USAGE_SUMMARY_QUERY, (since_day,))
+    return c.fetchall()
+
+
+@cached_read
+def get_llm_usage_by_prompt(day):
+    """One UTC day's calls and tokens split by prompt ('analysis', 'review_batch', ...)."""
+    c = get_connection().cursor()
+    c.execute(_LLM_USAGE_BY_PROMPT_QUERY, (day,))
+    return c.fetchall()
+
+
 # ==========================
 # 📊 DASHBOARD METRICS
 # ==========================
 
 
-def get_dashboard_stats(target_date):
+def _actual_row_counts(c):
+    """Counts every COUNTED_DIMENSIONS entry from the base tables (full scans)."""
+    counts = {}
+    for table, dimensions in COUNTED_DIMENSIONS.items():
+        c.execute(f"SELECT COUNT(*) FROM {table}")
+        counts[(table, "total", "")] = c.fetchone()[0]
+        for dimension, column in dimensions.items():
+            c.execute(f"SELECT COALESCE({column}, ''), COUNT(*) FROM {table} GROUP BY 1")
+            for value, n in c.fetchall():
+                counts[(table, dimension, value)] = n
+    return counts
+
+
+def _rebuild_row_counts(c):
+    c.execute("DELETE FROM row_counts")
+    c.executemany("INSERT INTO row_counts (table_name, dimension, value, n) VALUES (?, ?, ?, ?)",
+                  [(*key, n) for key, n in _actual_row_counts(c).items()])
+
+
+def rebuild_row_counts():
+    """Recomputes every counter from scratch (the backfill, and the fix for drift)."""
+    with transaction() as c:
+        _rebuild_row_counts(c)
+
+
+def check_row_counts():
     """
-    Returns the counts needed for the top dashboard metrics.
+    Compares the counters with real COUNT(*)s.
+    Returns a list of (table, dimension, value, counter, actual) mismatches.
     """
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
+    c = get_connection().cursor()
+    # One read transaction, so both sides see the same snapshot
+    c.execute("BEGIN")
+    try:
+        actual = _actual_row_counts(c)
+        c.execute("SELECT table_name, dimension, value, n FROM row_counts")
+        counters = {(t, d, v): n for t, d, v, n in c.fetchall()}
+    finally:
+        c.execute("COMMIT")
+    return [(*key, counters.get(key, 0), actual.get(key, 0))
+            for key in sorted(set(actual) | set(counters))
+            if counters.get(key, 0) != actual.get(key, 0)]
+
+
+_ROW_COUNT_QUERY = "SELECT n FROM row_counts WHERE table_name = ? AND dimension = ? AND value = ?"
+_ROW_COUNTS_QUERY = ("SELECT value, n FROM row_counts "
+                     "WHERE table_name = ? AND dimension = ? AND n > 0")
 
-    # 1. Global News Stats
-    c.execute("SELECT COUNT(*) FROM global_news")
-    global_total = c.fetchone()[0]
 
-    c.execute("SELECT COUNT(*) FROM global_news WHERE added_date = ?",
-              (target_date,))
-    global_today = c.fetchone()[0]
+def _row_count(c, table, dimension="total", value=""):
+    c.execute(_ROW_COUNT_QUERY, (table, dimension, value))
+    row = c.fetchone()
+    return row[0] if row else 0
 
-    # 2. Academic Stats
-    c.execute("SELECT COUNT(*) FROM academic_papers")
-    academic_total = c.fetchone()[0]
 
-    c.execute(
-        "SELECT COUNT(*) FROM academic_papers WHERE added_date = ?", (target_date,))
-    academic_today = c.fetchone()[0]
+@cached_read
+def get_row_counts(table, dimension):
+    """
+    Per-value counts of one dimension, archive included,
+    e.g. get_row_counts('global_news', 'source').
+    """
+    c = get_connection().cursor()
+    c.execute(_ROW_COUNTS_QUERY, (table, dimension))
+    counts = dict(c.fetchall())
+    for value, n in _archive_rows(_ROW_COUNTS_QUERY, (table, dimension)):
+        counts[value] = counts.get(value, 0) + n
+    return counts
 
-    conn.close()
 
+@cached_read
+def get_dashboard_stats(target_date):
+    """
+    Returns the counts needed for the top dashboard metrics, archive included.
+    Read from the trigger-maintained row_counts, so the cost is four key lookups
+    (per database) however large the tables grow.
+    """
+    c = get_connection().cursor()
     return {
-        "global_total": global_total,
-        "global_today": global_today,
-        "academic_total": academic_total,
-        "academic_today": academic_today
+        # 1. Global News Stats
+        "global_total": _row_count(c, "global_news") + _archived_count("global_news"),
+        "global_today": (_row_count(c, "global_news", "added_date", target_date)
+                         + _archived_count("global_news", "added_date", target_date)),
+        # 2. Academic Stats
+        "academic_total": _row_count(c, "academic_papers") + _archived_count("academic_papers"),
+        "academic_today": (_row_count(c, "academic_papers", "added_date", target_date)
+                           + _archived_count("academic_papers", "added_date", target_date)),
     }
 
 
+# Order by added_date so we see what the bot just found
+_LATEST_PAPER_QUERY = "SELECT * FROM academic_papers ORDER BY added_date DESC LIMIT 1"
+_LATEST_NEWS_QUERY = "SELECT * FROM global_news ORDER BY added_date DESC LIMIT 1"
+
+
+@cached_read
 def get_latest_academic_preview():
-    """Fetches the single most recent academic paper for the dashboard card."""
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
-    c = conn.cursor()
-    # Order by added_date so we see what the bot just found
-    c.execute("SELECT * FROM academic_papers ORDER BY added_date DESC LIMIT 1")
-    row = c.fetchone()
-    conn.close()
-    return row
+    """Fetches the single most recent academic paper (archive included) for the dashboard card."""
+    return _latest_row(_LATEST_PAPER_QUERY)
 
 
+@cached_read
 def get_latest_news_preview():
-    """Fetches the single most recent news article for the dashboard card."""
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
-    c = conn.cursor()
-    c.execute("SELECT * FROM global_news ORDER BY added_date DESC LIMIT 1")
-    row = c.fetchone()
-    conn.close()
-    return row
+    """Fetches the single most recent news article (archive included) for the dashboard card."""
+    return _latest_row(_LATEST_NEWS_QUERY)
+
+
+def _latest_row(query):
+    # Low-score papers are archived as soon as they are stored, so the newest
+    # row can be in either database
+    c = get_connection().cursor()
+    c.execute(query)
+    rows = _merge_archive(c.fetchall(), query, (), 1, order=lambda row: row['added_date'] or '')
+    return rows[0] if rows else None
 
 
 def paper_exists(paper_id):
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute("SELECT 1 FROM academic_papers WHERE paper_id = ?", (paper_id,))
-    exists = c.fetchone() is not None
-    conn.close()
-    return exists
+    return not _filter_unseen("academic_papers", "paper_id", [paper_id])
+
+
+@_timed_query
+def filter_new_paper_ids(paper_ids):
+    """Bulk version of paper_exists: returns the paper IDs we have not stored yet."""
+    return _filter_unseen("academic_papers", "paper_id", paper_ids)
+
+
+_INSERT_PAPER = '''
+    INSERT OR IGNORE INTO academic_papers 
+    (paper_id, title, url, field, score, is_major, summary, published_date, added_date,
+     venue, abstract_words)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+
+def _paper_row(paper_data, review_data, field):
+    return (
+        paper_data['paperId'],
+        paper_data['title'],
+        paper_data['url'],
+        field,
+        review_data['score'],
+        review_data['is_major'],
+        review_data['layman_summary'],
+        paper_data.get('publicationDate', 'Unknown'),
+        datetime.datetime.now().strftime("%Y-%m-%d"),
+        paper_data.get('venue'),
+        len((paper_data.get('abstract') or "").split()) or None
+    )
 
 
 def save_paper(paper_data, review_data, field):
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    try:
-        c.execute('''
-            INSERT INTO academic_papers 
-            (paper_id, title, url, field, score, is_major, summary, published_date, added_date)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            paper_data['paperId'],
-            paper_data['title'],
-            paper_data['url'],
-            field,
-            review_data['score'],
-            review_data['is_major'],
-            review_data['layman_summary'],
-            paper_data.get('publicationDate', 'Unknown'),
-            datetime.datetime.now().strftime("%Y-%m-%d")
-        ))
-        conn.commit()
-    except sqlite3.IntegrityError:
-        pass
-    finally:
-        conn.close()
+    save_papers_batch([(paper_data, review_data, field)])
 
 
-def get_feed(target=None, limit=50):
+@_timed_query
+def save_papers_batch(reviews):
     """
-    Fetches high-impact papers based on varying filter levels.
-    target: Can be None (All), a list (Category), or a string (Specific Topic).
+    Saves a batch of (paper_data, review_data, field) tuples in one transaction.
+    Duplicates are skipped silently. Returns the number of new rows.
     """
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
-    c = conn.cursor()
+    return _insert_many(_INSERT_PAPER, [_paper_row(*review) for review in reviews])
+
+
+@_timed_query
+def save_prescreen_rejects(rejects):
+    """
+    Records papers the local pre-screen kept away from the LLM.
+    rejects: list of (paper_data, field, reason). Returns the number of rows written.
+    """
+    today = datetime.datetime.now().strftime("%Y-%m-%d")
+    return _insert_many('''
+        INSERT OR REPLACE INTO prescreen_rejects (paper_id, title, field, venue, reason, added_date)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', [(paper['paperId'], paper.get('title'), field, paper.get('venue'), reason, today)
+          for paper, field, reason in rejects])
+
+
+def get_papers_for_replay():
+    """Every reviewed paper (archive included) with the fields the pre-screen can see, for offline replay."""
+    query = "SELECT paper_id, title, field, score, summary, venue, abstract_words FROM academic_papers"
+    c = get_connection().cursor()
+    c.execute(query)
+    return c.fetchall() + _archive_rows(query)
+
+
+@_timed_query
+def tag_paper_topics(pairs):
+    """
+    Tags stored papers with extra topics. pairs: iterable of (paper_id, topic).
+    Pairs whose paper was never saved (rejected, failed review) are ignored.
+    Returns the number of new tags.
+    """
+    return _insert_many('''
+        INSERT OR IGNORE INTO paper_topics (paper_id, topic)
+        SELECT ?1, ?2 WHERE EXISTS (SELECT 1 FROM academic_papers WHERE paper_id = ?1)
+    ''', list(pairs))
+
 
-    base_query = "SELECT * FROM academic_papers WHERE score >= 7"
+def get_topic_yield(since_date):
+    """{topic: papers scoring 7+} among papers added on or after since_date."""
+    c = get_connection().cursor()
+    c.execute('''
+        SELECT t.topic, COUNT(*) FROM academic_papers p
+        JOIN paper_topics t ON t.paper_id = p.paper_id
+        WHERE p.score >= 7 AND p.added_date >= ?
+        GROUP BY t.topic
+    ''', (since_date,))
+    return dict(c.fetchall())
+
+
+_PAPER_TOPICS_QUERY = "SELECT topic FROM paper_topics WHERE paper_id = ? ORDER BY topic"
+
+
+@cached_read
+def get_paper_topics(paper_id):
+    """Every topic a paper is tagged with."""
+    c = get_connection().cursor()
+    c.execute(_PAPER_TOPICS_QUERY, (paper_id,))
+    return [row[0] for row in c.fetchall()]
+
+
+@_timed_query
+def get_topic_watermark(topic):
+    """Returns (newest_date, set_of_seen_ids) for a topic, or None on its first sweep."""
+    c = get_connection().cursor()
+    c.execute("SELECT newest_date, seen_ids FROM topic_watermarks WHERE topic = ?", (topic,))
+    row = c.fetchone()
+    if row is None or row['newest_date'] is None:
+        return None
+    return row['newest_date'], set(json.loads(row['seen_ids'] or "[]"))
+
+
+@_timed_query
+def advance_topic_watermark(topic, papers):
+    """
+    Moves a topic's watermark up to the newest publicationDate in 'papers'.
+    Call it only once those papers are safely stored (or deliberately skipped).
+    """
+    dated = [p for p in papers if p.get('publicationDate')]
+    if not dated:
+        return
+    with transaction() as c:
+        c.execute("SELECT newest_date, seen_ids FROM topic_watermarks WHERE topic = ?", (topic,))
+        row = c.fetchone()
+        newest_date = row['newest_date'] if row else None
+        seen_ids = set(json.loads(row['seen_ids'] or "[]")) if row else set()
+
+        batch_newest = max(p['publicationDate'] for p in dated)
+        if newest_date is None or batch_newest > newest_date:
+            newest_date, seen_ids = batch_newest, set()
+        seen_ids.update(p['paperId'] for p in dated
+                        if p['publicationDate'] == newest_date)
+
+        c.execute('''
+            INSERT OR REPLACE INTO topic_watermarks (topic, newest_date, seen_ids, updated_date)
+            VALUES (?, ?, ?, ?)
+        ''', (topic, newest_date, json.dumps(sorted(seen_ids)),
+              datetime.datetime.now().strftime("%Y-%m-%d")))
+
+
+# Feed order: newest first, paper_id breaks ties so every page boundary is exact.
+# Must match the expression in idx_papers_feed_page.
+_FEED_DATE_KEY = "COALESCE(p.published_date, '')"
+
+
+def _feed_query(target=None, limit=50, after=None):
+    """
+    Builds the SQL and params behind get_feed().
+    after: the (date_key, paper_id) cursor of the last paper already shown.
+    """
     params = []
+    keyset = ""
+    if after is not None:
+        # Spelled out rather than as a row value so SQLite can seek the
+        # expression index instead of walking it from the top.
+        keyset = (f"AND {_FEED_DATE_KEY} <= ? "
+                  f"AND ({_FEED_DATE_KEY} < ? OR p.paper_id < ?)")
 
     if target is None or target == "All":
         # 1. FETCH EVERYTHING
-        query = f"{base_query} ORDER BY published_date DESC LIMIT ?"
-        params.append(limit)
+        query = f"SELECT p.* FROM academic_papers p WHERE p.score >= 7 {keyset}"
 
     elif isinstance(target, list):
         # 2. FETCH CATEGORY (List of Topics)
+        # Semi-join, so a paper tagged with two topics in the category shows once.
+        # EXISTS (not IN) keeps the walk on idx_papers_feed_page in feed order,
+        # so LIMIT stops early instead of sorting the whole category.
         # Create a string like "?, ?, ?, ?" based on list length
         placeholders = ','.join('?' for _ in target)
-        query = f"{base_query} AND field IN ({placeholders}) ORDER BY published_date DESC LIMIT ?"
-        params.extend(target)
-        params.append(limit)
+        query = f'''
+            SELECT p.* FROM academic_papers p
+            WHERE p.score >= 7 {keyset}
+              AND EXISTS (SELECT 1 FROM paper_topics t
+                          WHERE t.paper_id = p.paper_id AND t.topic IN ({placeholders}))
+        '''
 
     else:
         # 3. FETCH SPECIFIC TOPIC (String)
-        query = f"{base_query} AND field = ? ORDER BY published_date DESC LIMIT ?"
+        query = f'''
+            SELECT p.* FROM paper_topics t
+            JOIN academic_papers p ON p.paper_id = t.paper_id
+            WHERE t.topic = ? AND p.score >= 7 {keyset}
+        '''
         params.append(target)
-        params.append(limit)
 
-    c.execute(query, tuple(params))
-    rows = c.fetchall()
-    conn.close()
-    return rows
+    if after is not None:
+        date_key, paper_id = after
+        params.extend((date_key, date_key, paper_id))
+    if isinstance(target, list):
+        params.extend(target)
+    query += f" ORDER BY {_FEED_DATE_KEY} DESC, p.paper_id DESC LIMIT ?"
+    params.append(limit)
+
+    return query, tuple(params)
+
+
+def feed_cursor(paper):
+    """The keyset cursor that resumes the feed right after 'paper'."""
+    return (paper['published_date'] or '', paper['paper_id'])
+
+
+@cached_read
+def get_feed(target=None, limit=50, after=None, include_archive=False):
+    """
+    Fetches high-impact papers based on varying filter levels.
+    target: Can be None (All), a list (Category), or a string (Specific Topic).
+    after: a feed_cursor() to continue from; None starts at the newest paper.
+    include_archive: also read papers retention has moved to the archive.
+    """
+    query, params = _feed_query(target, limit, after)
+    c = get_connection().cursor()
+    c.execute(query, params)
+    papers = c.fetchall()
+    if include_archive:
+        papers = _merge_archive(papers, query, params, limit, order=feed_cursor)
+    return papers
+
+
+def get_feed_page(target=None, after=None, page_size=FEED_PAGE_SIZE, include_archive=False):
+    """
+    One page of get_feed(). Returns (papers, next_cursor); next_cursor is None
+    on the last page. Cost stays constant however deep the page is.
+    """
+    # One extra row tells us whether another page exists
+    papers = get_feed(target, page_size + 1, after, include_archive)
+    if len(papers) > page_size:
+        return papers[:page_size], feed_cursor(papers[page_size - 1])
+    return papers, None
 
 # ==========================
 # 🌍 GLOBAL NEWS FUNCTIONS
@@ -183,101 +1216,374 @@ def get_feed(target=None, limit=50):
 
 def news_exists(link):
     """Checks if we already processed this news link."""
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute("SELECT 1 FROM global_news WHERE link = ?", (link,))
-    exists = c.fetchone() is not None
-    conn.close()
-    return exists
+    return not _filter_unseen("global_news", "link", [link])
+
+
+@_timed_query
+def filter_new_links(links):
+    """Bulk version of news_exists: returns the links we have not processed yet."""
+    return _filter_unseen("global_news", "link", links)
+
+
+# Structured analysis columns on global_news ('analysis_summary', because
+# 'summary' keeps the full rendered markdown that search indexes).
+ANALYSIS_FIELDS = ("headline", "analysis_summary", "analyst_note", "language")
+
+_INSERT_NEWS = '''
+    INSERT OR IGNORE INTO global_news (link, source, title, summary, original_date, added_date, region,
+                                       headline, analysis_summary, analyst_note, language)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
 
+def format_analysis(analysis):
+    """Renders a structured analysis dict as the markdown stored in 'summary'."""
+    return (f"**Headline:** {analysis['headline']}\n\n"
+            f"**Summary:** {analysis['summary']}\n\n"
+            f"**Analyst Note:** {analysis['analyst_note']}")
 
-def save_news(article_data, analysis_text):
+
+# Analyses stored before the structured columns are free-form markdown that
+# labels its sections many ways: "### 1. English Translation of the Headline",
+# "**Headline:** ...", "| **2. Core Message Summary** | ... |", "<h3>...</h3>".
+_ANALYSIS_SECTIONS = (
+    ("analyst_note", re.compile(r"analyst\W*note", re.IGNORECASE)),
+    ("summary", re.compile(r"summary|core message", re.IGNORECASE)),
+    ("headline", re.compile(r"headline|translation", re.IGNORECASE)),
+)
+_SECTION_LABELS = (
+    re.compile(r"^\s*#{1,6}\s*(.*?)\s*#*\s*$()"),                          # ### Label
+    re.compile(r"^\s*<h[1-6]>(.*?)</h[1-6]>\s*$()", re.IGNORECASE),         # <h3>Label</h3>
+    re.compile(r"^\s*\|(.*?)\|(.*)\|\s*$"),                                 # | Label | text |
+    re.compile(r"^\s*(?:\d+[.)]\s*|[-*]\s+)?\*\*(.+?)\*\*\s*:?\s*(.*)$"),   # **Label:** text
+)
+_RULE = re.compile(r"^\s*([-*_])(\s*\1){2,}\s*$")
+
+
+def _section_label(line):
+    """Returns (section, inline_text) if the line opens an analysis section, else None."""
+    for pattern in _SECTION_LABELS:
+        match = pattern.match(line)
+        if match:
+            label, rest = match.groups()
+            for section, keywords in _ANALYSIS_SECTIONS:
+                if keywords.search(label.replace("*", "")):
+                    return section, rest.strip().strip("|").strip()
+            return None
+    return None
+
+
+def _clean_section(text):
+    text = text.strip()
+    while len(text) > 4 and text.startswith("**") and text.endswith("**"):
+        text = text[2:-2].strip()
+    return text or None
+
+
+def parse_analysis_markdown(text):
+    """
+    Recovers {headline, summary, analyst_note} from a free-form analysis.
+    Sections that cannot be found come back as None.
+    """
+    sections, current = {}, None
+    for line in (text or "").splitlines():
+        if _RULE.match(line):
+            continue
+        label = _section_label(line)
+        # Each section opens once; a repeated bare label (an "**Analyst Note:**"
+        # line under an "### Analyst Note" heading) is dropped.
+        if label and label[0] not in sections:
+            current = label[0]
+            sections[current] = [label[1]]
+        elif label and label[0] == current and not label[1]:
+            continue
+        elif current is not None:
+            sections[current].append(line)
+
+    fields = {section: _clean_section("\n".join(lines)) for section, lines in sections.items()}
+    if fields.get("headline"):
+        # Only the first paragraph is the headline; models sometimes add commentary
+        fields["headline"] = _clean_section(fields["headline"].split("\n\n")[0])
+    return {section: fields.get(section) for section in ("headline", "summary", "analyst_note")}
+
+
+def _news_row(article_data, analysis):
+    if isinstance(analysis, str):
+        # Free-form markdown: store it as-is and recover what fields we can
+        markdown = analysis
+        analysis = dict(parse_analysis_markdown(markdown), language=None)
+    else:
+        markdown = format_analysis(analysis)
+    return (
+        article_data['link'],
+        article_data['source'],
+        article_data['title'],
+        markdown,  # The AI output, rendered
+        # RSS feeds often lack clean dates, so we use today
+        datetime.datetime.now().strftime("%Y-%m-%d"),
+        datetime.datetime.now().strftime("%Y-%m-%d"),
+        "East",  # Default region for now
+        analysis['headline'],
+        analysis['summary'],
+        analysis['analyst_note'],
+        analysis.get('language'),
+    )
+
+
+def save_news(article_data, analysis):
     """Saves a translated/analyzed news article."""
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    try:
-        c.execute('''
-            INSERT INTO global_news (link, source, title, summary, original_date, added_date, region)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            article_data['link'],
-            article_data['source'],
-            article_data['title'],
-            analysis_text,  # The AI output
-            # RSS feeds often lack clean dates, so we use today
-            datetime.datetime.now().strftime("%Y-%m-%d"),
-            datetime.datetime.now().strftime("%Y-%m-%d"),
-            "East"  # Default region for now
-        ))
-        conn.commit()
-    except sqlite3.IntegrityError:
-        pass  # Skip duplicates silently
-    finally:
-        conn.close()
+    save_news_batch([(article_data, analysis)])
 
 
-def get_global_news(source_filter=None, limit=50):
+@_timed_query
+def save_news_batch(analyzed_articles):
     """
-    Fetches global news, optionally filtering by a specific source.
-    UPDATED: Now accepts 'source_filter' to support the UI pills.
+    Saves a batch of (article_data, analysis) pairs in one transaction.
+    analysis is a {headline, summary, analyst_note, language} dict; a markdown
+    string is parsed instead. Duplicates are skipped silently.
+    Returns the number of new rows.
     """
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
-    c = conn.cursor()
+    return _insert_many(_INSERT_NEWS, [_news_row(*pair) for pair in analyzed_articles])
+
+
+def _backfill_analysis_fields(c):
+    c.execute("SELECT link, summary FROM global_news WHERE headline IS NULL")
+    updates = []
+    for link, summary in c.fetchall():
+        parsed = parse_analysis_markdown(summary)
+        if parsed["headline"]:
+            updates.append((parsed["headline"], parsed["summary"], parsed["analyst_note"], link))
+    c.executemany("UPDATE global_news SET headline = ?, analysis_summary = ?, analyst_note = ? "
+                  "WHERE link = ?", updates)
+    return len(updates)
+
+
+def backfill_analysis_fields():
+    """
+    Fills the structured columns of rows stored as free-form markdown. Migration
+    12 runs it once; run it again after teaching the parser a new format.
+    Returns the number of rows filled.
+    """
+    with transaction() as c:
+        return _backfill_analysis_fields(c)
 
+
+def _global_news_query(source_filter=None, limit=50, after=None):
+    """
+    Builds the SQL and params behind get_global_news().
+    after: the (added_date, link) cursor of the last article already shown.
+    """
     # Start with the base query
     query = "SELECT * FROM global_news"
+    conditions = []
     params = []
 
     # Add the filter logic
     if source_filter and source_filter != "All":
-        query += " WHERE source = ?"
+        conditions.append("source = ?")
         params.append(source_filter)
 
-    # Add sorting and limit
-    query += " ORDER BY added_date DESC LIMIT ?"
+    # Resume after the last article of the previous page
+    if after is not None:
+        conditions.append("(added_date, link) < (?, ?)")
+        params.extend(after)
+
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+
+    # Add sorting and limit (link breaks ties so page boundaries are exact)
+    query += " ORDER BY added_date DESC, link DESC LIMIT ?"
     params.append(limit)
 
-    c.execute(query, tuple(params))
-    rows = c.fetchall()
-    conn.close()
-    return rows
+    return query, tuple(params)
+
+
+def news_cursor(article):
+    """The keyset cursor that resumes the news stream right after 'article'."""
+    return (article['added_date'], article['link'])
+
+
+@cached_read
+def get_global_news(source_filter=None, limit=50, after=None, include_archive=False):
+    """
+    Fetches global news, optionally filtering by a specific source.
+    UPDATED: Now accepts 'source_filter' to support the UI pills.
+    after: a news_cursor() to continue from; None starts at the latest article.
+    include_archive: also read articles retention has moved to the archive.
+    """
+    query, params = _global_news_query(source_filter, limit, after)
+    c = get_connection().cursor()
+    c.execute(query, params)
+    articles = c.fetchall()
+    if include_archive:
+        articles = _merge_archive(articles, query, params, limit, order=news_cursor)
+    return articles
+
 
+def get_global_news_page(source_filter=None, after=None, page_size=FEED_PAGE_SIZE,
+                         include_archive=False):
+    """
+    One page of get_global_news(). Returns (articles, next_cursor);
+    next_cursor is None on the last page.
+    """
+    articles = get_global_news(source_filter, page_size + 1, after, include_archive)
+    if len(articles) > page_size:
+        return articles[:page_size], news_cursor(articles[page_size - 1])
+    return articles, None
+
+
+def _story_candidates_query(buckets):
+    """Builds the SQL and params behind find_story_candidates()."""
+    placeholders = ','.join('?' for _ in buckets)
+    return f'''
+        SELECT f.link, f.signature, f.duplicate_of FROM story_fingerprints f
+        WHERE f.link IN (SELECT link FROM story_bands WHERE bucket IN ({placeholders}))
+    ''', list(buckets)
 
+
+@_timed_query
+def find_story_candidates(buckets):
+    """Stories sharing at least one LSH bucket with a signature (an index lookup per bucket)."""
+    if not buckets:
+        return []
+    c = get_connection().cursor()
+    c.execute(*_story_candidates_query(buckets))
+    return c.fetchall()
+
+
+@_timed_query
+def save_story_fingerprints(rows):
+    """
+    Stores fingerprints. rows: list of
+    (link, source, title, signature_blob, buckets, duplicate_of).
+    Returns the number of new stories indexed.
+    """
+    if not rows:
+        return 0
+    today = datetime.datetime.now().strftime("%Y-%m-%d")
+    with transaction() as c:
+        c.executemany('''
+            INSERT OR IGNORE INTO story_fingerprints
+            (link, source, title, signature, duplicate_of, added_date)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', [(link, source, title, signature, duplicate_of, today)
+              for link, source, title, signature, _, duplicate_of in rows])
+        added = c.rowcount
+        c.executemany("INSERT OR IGNORE INTO story_bands (bucket, link) VALUES (?, ?)",
+                      [(bucket, row[0]) for row in rows for bucket in row[4]])
+    return added
+
+
+def get_unfingerprinted_news():
+    """
+    Stored articles that are not in the near-duplicate index yet, among those
+    added since mark_news_fingerprinted. Returns (rows, seq); pass seq to
+    mark_news_fingerprinted once the rows are indexed.
+    """
+    c = get_connection().cursor()
+    c.execute("SELECT last_seq FROM fingerprint_mark WHERE id = 1")
+    since = c.fetchone()[0]
+    c.execute("SELECT COALESCE(MAX(sync_seq), ?) FROM global_news", (since,))
+    seq = c.fetchone()[0]
+    c.execute('''
+        SELECT g.link, g.source, g.title, g.summary, g.analysis_summary
+        FROM global_news g LEFT JOIN story_fingerprints f ON f.link = g.link
+        WHERE g.sync_seq > ? AND g.sync_seq <= ? AND f.link IS NULL
+    ''', (since, seq))
+    return c.fetchall(), seq
+
+
+def mark_news_fingerprinted(seq):
+    """Records that every article up to sync_seq seq is in the near-duplicate index."""
+    with transaction() as c:
+        c.execute("UPDATE fingerprint_mark SET last_seq = MAX(last_seq, ?) WHERE id = 1", (seq,))
+
+
+@cached_read
+def _related_stories_query(links):
+    """Builds the SQL and params behind one chunk of get_related_stories()."""
+    placeholders = ','.join('?' for _ in links)
+    return f'''
+        SELECT duplicate_of, link, source, title FROM story_fingerprints
+        WHERE duplicate_of IN ({placeholders})
+        ORDER BY source
+    ''', list(links)
+
+
+def get_related_stories(links):
+    """
+    "Same story, other sources": {link: [rows of (link, source, title)]} for the
+    near-duplicates we skipped in favour of each given (analyzed) story.
+    """
+    links = list(links)
+    if not links:
+        return {}
+    related = {}
+    c = get_connection().cursor()
+    for chunk in _chunked(links):
+        c.execute(*_related_stories_query(chunk))
+        for row in c.fetchall():
+            related.setdefault(row['duplicate_of'], []).append(row)
+    return related
+
+
+@_timed_query
+def get_feed_cache(source):
+    """Returns the cached ETag / Last-Modified / body hash for an RSS source, or None."""
+    c = get_connection().cursor()
+    c.execute("SELECT * FROM feed_cache WHERE source = ?", (source,))
+    return c.fetchone()
+
+
+@_timed_query
+def save_feed_cache(source, url, etag, last_modified, body_hash):
+    """Stores the validators from the latest response for an RSS source."""
+    with transaction() as c:
+        c.execute('''
+            INSERT INTO feed_cache (source, url, etag, last_modified, body_hash, checked_date)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(source) DO UPDATE SET
+                url = excluded.url,
+                etag = excluded.etag,
+                last_modified = excluded.last_modified,
+                body_hash = excluded.body_hash,
+                checked_date = excluded.checked_date
+        ''', (source, url, etag, last_modified, body_hash,
+              datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+
+
+@_timed_query
+def forget_feed_cache(sources):
+    """Drops the validators for these sources so the next sweep re-reads them in full."""
+    with transaction() as c:
+        c.executemany("DELETE FROM feed_cache WHERE source = ?", [(s,) for s in sources])
+
+
+@cached_read
 def get_news_sources():
     """
     NEW: Returns a unique list of sources (e.g. ['China_Xinhua', 'Russia_Kommersant'])
-    Used to populate the filter buttons in the UI.
+    Used to populate the filter buttons in the UI. Sources whose articles have all
+    been archived are still listed.
     """
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute("SELECT DISTINCT source FROM global_news")
-    rows = c.fetchall()
-    conn.close()
-    return [row[0] for row in rows]
+    return sorted(source for source in get_row_counts("global_news", "source") if source)
 
 
+@cached_read
 def get_news_stats():
-    """Returns counts of articles in the DB."""
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
+    """Returns counts of articles in the DB, archive included."""
+    c = get_connection().cursor()
     # Count total articles
-    c.execute("SELECT COUNT(*) FROM global_news")
-    total = c.fetchone()[0]
+    total = _row_count(c, "global_news") + _archived_count("global_news")
     # Count today's articles
     today = datetime.datetime.now().strftime("%Y-%m-%d")
-    c.execute("SELECT COUNT(*) FROM global_news WHERE added_date = ?", (today,))
-    today_count = c.fetchone()[0]
-    conn.close()
+    today_count = (_row_count(c, "global_news", "added_date", today)
+                   + _archived_count("global_news", "added_date", today))
     return total, today_count
 
 
-def get_news_by_date(date_str, region=None):
-    """Fetches news for a specific date, optionally filtered by region."""
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
-    c = conn.cursor()
-
+def _news_by_date_query(date_str, region=None):
+    """Builds the SQL and params behind get_news_by_date()."""
     query = "SELECT * FROM global_news WHERE added_date = ?"
     params = [date_str]
 
@@ -290,8 +1596,469 @@ def get_news_by_date(date_str, region=None):
             query += " AND (source LIKE '%Xinhua%' OR region = 'China')"
 
     query += " ORDER BY original_date DESC"
+    return query, tuple(params)
+
+
+@cached_read
+def get_news_by_date(date_str, region=None):
+    """Fetches news for a specific date (archive included), optionally filtered by region."""
+    query, params = _news_by_date_query(date_str, region)
+    c = get_connection().cursor()
+    c.execute(query, params)
+    articles = c.fetchall()
+    return _merge_archive(articles, query, params, None,
+                          order=lambda article: article['original_date'] or '')
+
+# ==========================
+# 🔎 FULL-TEXT SEARCH
+# ==========================
+
+
+def _fts_query(text):
+    """
+    Turns free text from a search box into a safe FTS5 query: every word must
+    match (quoted, so FTS syntax characters are literal) and the last word is a
+    prefix, so results appear while the user is still typing.
+    """
+    words = [word.replace('"', '""') for word in text.split()]
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def _search_query(fts, table, text, limit, where="", params=()):
+    """Builds the SQL and params behind search_news() / search_papers(); None for blank text."""
+    query = _fts_query(text)
+    if query is None:
+        return None
+    # ORDER BY rank (bm25 by default) lets FTS5 stop after the top 'limit' hits
+    sql = f'''
+        SELECT t.*,
+               highlight({fts}, 0, '**', '**') AS title_highlight,
+               snippet({fts}, 1, '**', '**', ' … ', 24) AS summary_snippet,
+               {fts}.rank AS search_rank
+        FROM {fts}
+        JOIN {table} t ON t.rowid = {fts}.rowid
+        WHERE {fts} MATCH ? {where}
+        ORDER BY {fts}.rank
+        LIMIT ?
+    '''
+    return sql, (query, *params, limit)
+
+
+def _search(built, limit, include_archive=False):
+    if built is None:
+        return []
+    sql, params = built
+    c = get_connection().cursor()
+    c.execute(sql, params)
+    hits = c.fetchall()
+    if include_archive:
+        # bm25 scores from two indexes are close enough to interleave
+        hits = _merge_archive(hits, sql, params, limit,
+                              order=lambda hit: hit['search_rank'], descending=False)
+    return hits
+
+
+def _search_news_query(text, limit=20, source_filter="All"):
+    """Builds the SQL and params behind search_news(); None for blank text."""
+    if source_filter == "All":
+        return _search_query("news_fts", "global_news", text, limit)
+    return _search_query("news_fts", "global_news", text, limit,
+                         "AND t.source = ?", (source_filter,))
+
+
+def _search_papers_query(text, limit=20, min_score=None):
+    """Builds the SQL and params behind search_papers(); None for blank text."""
+    if min_score is None:
+        return _search_query("papers_fts", "academic_papers", text, limit)
+    return _search_query("papers_fts", "academic_papers", text, limit,
+                         "AND t.score >= ?", (min_score,))
+
+
+@cached_read
+def search_news(text, limit=20, source_filter="All", include_archive=False):
+    """Full-text search over news titles and analyses, best match first."""
+    return _search(_search_news_query(text, limit, source_filter), limit, include_archive)
+
+
+@cached_read
+def search_papers(text, limit=20, min_score=None, include_archive=False):
+    """Full-text search over paper titles and summaries, best match first."""
+    return _search(_search_papers_query(text, limit, min_score), limit, include_archive)
+
+
+def rebuild_search_index():
+    """Rebuilds both FTS indexes from the base tables (e.g. after a full VACUUM)."""
+    with transaction() as c:
+        c.execute("INSERT INTO news_fts (news_fts) VALUES ('rebuild')")
+        c.execute("INSERT INTO papers_fts (papers_fts) VALUES ('rebuild')")
+
+
+# ==========================
+# 📦 DELTA SHARDS
+# ==========================
+# What app/shards.py ships between machines, and how each table is merged back:
+#   'append'   - rows added since the last export (by sync_seq), INSERT OR IGNORE
+#   'replace'  - the same, but the writers overwrite rows with INSERT OR REPLACE
+#                (which gives the new row a new sync_seq), so imports do too
+#   'snapshot' - small tables updated in place: shipped whole, replacing the table
+# llm_cache, row_counts, story_bands and the FTS indexes are rebuilt locally.
+SHARD_TABLES = {
+    "global_news": "append",
+    "academic_papers": "append",
+    "paper_topics": "append",
+    "story_fingerprints": "append",
+    "llm_usage": "append",
+    "prescreen_rejects": "replace",
+    "topic_watermarks": "replace",
+    "feed_cache": "snapshot",
+}
+# Surrogate ids each database hands out for itself are never shipped; those
+# tables are deduped on a natural key instead of their primary key.
+SHARD_LOCAL_COLUMNS = {"llm_usage": ("id",)}
+SHARD_NATURAL_KEYS = {"llm_usage": ["uid"]}
+
+
+def _table_columns(c, table):
+    c.execute(f"SELECT * FROM {table} LIMIT 0")
+    return [column[0] for column in c.description]
+
+
+def _shipped_columns(c, table):
+    """Every column but sync_seq and local ids, which each database numbers for itself."""
+    local = ("sync_seq",) + SHARD_LOCAL_COLUMNS.get(table.split(".")[-1], ())
+    return [column for column in _table_columns(c, table) if column not in local]
+
+
+def _snapshot_hash(columns, rows):
+    payload = json.dumps([columns, [list(row) for row in rows]], default=repr)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@_timed_query
+def read_shard_delta():
+    """
+    Everything not yet exported, read from one consistent snapshot:
+    ({table: (columns, rows)}, marks). 'append' / 'replace' tables only carry
+    rows past their high-water mark; 'snapshot' tables are only included when
+    they changed. Pass marks to mark_shard_exported() once the shard is written.
+    """
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute("BEGIN")
+    try:
+        c.execute("SELECT table_name, last_seq, content_hash FROM sync_state")
+        state = {row['table_name']: row for row in c.fetchall()}
+        tables, marks = {}, {}
+        for table, mode in SHARD_TABLES.items():
+            columns = _shipped_columns(c, table)
+            if mode == "snapshot":
+                c.execute(f"SELECT * FROM {table} ORDER BY rowid")
+                rows = [tuple(row) for row in c.fetchall()]
+                content_hash = _snapshot_hash(columns, rows)
+                previous = state.get(table)
+                if previous is None or previous['content_hash'] != content_hash:
+                    tables[table] = (columns, rows)
+                    marks[table] = (None, content_hash)
+                continue
+            last_seq = state[table]['last_seq'] if table in state else 0
+            c.execute(f"SELECT sync_seq, {', '.join(columns)} FROM {table} "
+                      f"WHERE sync_seq > ? ORDER BY sync_seq", (last_seq or 0,))
+            rows = c.fetchall()
+            if rows:
+                tables[table] = (columns, [tuple(row)[1:] for row in rows])
+                marks[table] = (rows[-1][0], None)
+    finally:
+        conn.commit()
+    return tables, marks
+
+
+def mark_shard_exported(marks, path, sha256, rows):
+    """
+    Advances the high-water marks past a written shard, and records the shard as
+    already imported here (this database is where its rows came from).
+    """
+    with transaction() as c:
+        c.executemany('''
+            INSERT INTO sync_state (table_name, last_seq, content_hash) VALUES (?, ?, ?)
+            ON CONFLICT(table_name) DO UPDATE SET
+                last_seq = COALESCE(excluded.last_seq, sync_state.last_seq),
+                content_hash = COALESCE(excluded.content_hash, sync_state.content_hash)
+        ''', [(table, last_seq, content_hash)
+              for table, (last_seq, content_hash) in marks.items()])
+        c.execute("INSERT OR REPLACE INTO shard_imports (path, sha256, rows, imported_date) "
+                  "VALUES (?, ?, ?, ?)",
+                  (path, sha256, rows, datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+
+
+def get_imported_shards():
+    """{path: sha256} for every shard already applied to (or exported from) this database."""
+    c = get_connection().cursor()
+    c.execute("SELECT path, sha256 FROM shard_imports")
+    return {row['path']: row['sha256'] for row in c.fetchall()}
+
+
+def get_shard_keys():
+    """
+    {table: [key columns]} for every 'append' / 'replace' table: its natural
+    key where it has one (SHARD_NATURAL_KEYS), otherwise its primary key.
+    """
+    c = get_connection().cursor()
+    keys = {}
+    for table, mode in SHARD_TABLES.items():
+        if mode == "snapshot":
+            continue
+        if table in SHARD_NATURAL_KEYS:
+            keys[table] = SHARD_NATURAL_KEYS[table]
+            continue
+        columns = sorted((row['pk'], row['name']) for row in c.execute(f"PRAGMA table_info({table})")
+                         if row['pk'])
+        keys[table] = [name for _, name in columns]
+    return keys
+
+
+def upgrade_shard_tables(tables):
+    """
+    Brings a decoded shard's {table: (columns, rows)} up to this schema where
+    applying it as-is would go wrong: ledger rows from before uids get the
+    uid migration 16 gave them.
+    """
+    if "llm_usage" in tables and "uid" not in tables["llm_usage"][0]:
+        columns, rows = tables["llm_usage"]
+        positions = [columns.index(column) for column in _LEGACY_USAGE_COLUMNS]
+        tables["llm_usage"] = (columns + ["uid"],
+                               [tuple(row) + (_legacy_usage_uid(row[i] for i in positions),)
+                                for row in rows])
+    return tables
+
+
+@_timed_query
+def apply_shard(path, sha256, tables, story_bands=()):
+    """
+    Merges one shard's {table: (columns, rows)} in a single transaction and
+    records it in shard_imports, so it is never applied twice. story_bands are
+    the (bucket, link) rows derived from the shard's fingerprints.
+    Returns the number of rows written.
+    """
+    written = 0
+    with transaction() as c:
+        for table, (columns, rows) in tables.items():
+            mode = SHARD_TABLES.get(table)
+            if mode is None:
+                raise ValueError(f"{path}: unknown table '{table}'")
+            # Only columns this schema has; older shards may lack newer columns
+            known = set(_shipped_columns(c, table))
+            keep = [i for i, column in enumerate(columns) if column in known]
+            names = ", ".join(columns[i] for i in keep)
+            placeholders = ", ".join("?" for _ in keep)
+            if mode == "snapshot":
+                c.execute(f"DELETE FROM {table}")
+            verb = "INSERT OR IGNORE" if mode == "append" else "INSERT OR REPLACE"
+            c.executemany(f"{verb} INTO {table} ({names}) VALUES ({placeholders})",
+                          [[row[i] for i in keep] for row in rows])
+            written += max(c.rowcount, 0)
+        c.executemany("INSERT OR IGNORE INTO story_bands (bucket, link) VALUES (?, ?)",
+                      list(story_bands))
+        c.execute("INSERT OR REPLACE INTO shard_imports (path, sha256, rows, imported_date) "
+                  "VALUES (?, ?, ?, ?)",
+                  (path, sha256, written, datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+    return written
+
+
+def mark_imported_exported(shipped):
+    """
+    Settles the high-water marks after an import. shipped is {table: set of
+    primary-key tuples} found in the imported shards: rows past a mark that a
+    shard carried are already exported. The rest were written here and still
+    need exporting, so they are renumbered past the new marks. Snapshot tables
+    a shard carried are marked at their (just replaced) contents.
+    """
+    with transaction() as c:
+        c.execute("SELECT table_name, last_seq FROM sync_state")
+        marks = {row['table_name']: row['last_seq'] or 0 for row in c.fetchall()}
+        c.execute("SELECT seq FROM sync_counter")
+        top = c.fetchone()[0]
+        keys = get_shard_keys()
+        for table, mode in SHARD_TABLES.items():
+            if mode == "snapshot":
+                if table not in shipped:
+                    continue
+                c.execute(f"SELECT * FROM {table} ORDER BY rowid")
+                rows = [tuple(row) for row in c.fetchall()]
+                c.execute('''
+                    INSERT INTO sync_state (table_name, content_hash) VALUES (?, ?)
+                    ON CONFLICT(table_name) DO UPDATE SET content_hash = excluded.content_hash
+                ''', (table, _snapshot_hash(_shipped_columns(c, table), rows)))
+                continue
+            c.execute(f"SELECT rowid, {', '.join(keys[table])} FROM {table} "
+                      f"WHERE sync_seq > ? ORDER BY sync_seq", (marks.get(table, 0),))
+            local = [row[0] for row in c.fetchall()
+                     if tuple(row)[1:] not in shipped.get(table, ())]
+            c.execute('''
+                INSERT INTO sync_state (table_name, last_seq) VALUES (?, ?)
+                ON CONFLICT(table_name) DO UPDATE SET last_seq = excluded.last_seq
+            ''', (table, top))
+            for rowid in local:
+                c.execute("UPDATE sync_counter SET seq = seq + 1")
+                c.execute(f"UPDATE {table} SET sync_seq = (SELECT seq FROM sync_counter) "
+                          f"WHERE rowid = ?", (rowid,))
+
+
+# ==========================
+# 🗄️ ARCHIVE
+# ==========================
+# Retention (app/retention.py) moves old news and papers out of DB_NAME into
+# <name>_archive.db beside it. The archive is migrated with the same MIGRATIONS,
+# so every query builder above runs against it unchanged; the read functions
+# only consult it for older history (include_archive=True, a past date) and
+# for the "have we seen this already?" checks.
+
+
+def archive_path():
+    """The archive file that belongs to DB_NAME, e.g. peripheral_news_archive.db."""
+    root, ext = os.path.splitext(DB_NAME)
+    return f"{root}_archive{ext or '.db'}"
+
+
+def archive_exists():
+    return os.path.exists(archive_path())
+
+
+def init_archive():
+    """Creates (incremental auto-vacuum from the start) and migrates the archive."""
+    path = archive_path()
+    if not os.path.exists(path):
+        # Switching auto_vacuum needs a VACUUM, which is instant on an empty file
+        conn = get_connection(path)
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+    migrate(path)
+    return path
+
 
+def _archive_rows(query, params=()):
+    """Runs a read query against the archive; [] when there is no archive yet."""
+    if not archive_exists():
+        return []
+    c = get_connection(archive_path()).cursor()
     c.execute(query, params)
-    rows = c.fetchall()
-    conn.close()
-    return rows
+    return c.fetchall()
+
+
+def _merge_archive(rows, query, params, limit, order, descending=True):
+    """
+    Runs the same query against the archive and merges both results, which
+    are each sorted on order(row), keeping the first 'limit' (None = all).
+    A row found in both (a move interrupted between the two commits) shows once.
+    """
+    archived = _archive_rows(query, params)
+    if not archived:
+        return rows
+    merged, seen = [], set()
+    for row in heapq.merge(rows, archived, key=order, reverse=descending):
+        # Every query here selects the table's primary key (link / paper_id) first
+        if row[0] in seen:
+            continue
+        seen.add(row[0])
+        merged.append(row)
+        if limit is not None and len(merged) == limit:
+            break
+    return merged
+
+
+def _archived_count(table, dimension="total", value=""):
+    if not archive_exists():
+        return 0
+    return _row_count(get_connection(archive_path()).cursor(), table, dimension, value)
+
+
+@_timed_query
+def archive_rows(news_before=None, papers_before=None, papers_below_score=None):
+    """
+    Moves into the archive the global_news rows added before 'news_before' and
+    the academic_papers rows added before 'papers_before' or scoring below
+    'papers_below_score' (with their paper_topics tags). None skips a rule.
+    Returns {"global_news": moved, "academic_papers": moved}.
+    """
+    rules = {"global_news": ([], []), "academic_papers": ([], [])}
+    if news_before:
+        rules["global_news"][0].append("added_date < ?")
+        rules["global_news"][1].append(news_before)
+    if papers_before:
+        rules["academic_papers"][0].append("added_date < ?")
+        rules["academic_papers"][1].append(papers_before)
+    if papers_below_score:
+        rules["academic_papers"][0].append("score < ?")
+        rules["academic_papers"][1].append(papers_below_score)
+
+    moved = {table: 0 for table in rules}
+    if not any(conditions for conditions, _ in rules.values()):
+        return moved
+
+    path = init_archive()
+    keys = {"global_news": "link", "academic_papers": "paper_id"}
+    conn = get_connection()
+    conn.execute("ATTACH DATABASE ? AS archive", (path,))
+    try:
+        # Copy, commit, then delete, as two transactions: in WAL mode a
+        # transaction over ATTACHed files is only atomic per file. A crash in
+        # between leaves a row in both, never in neither, and the delete only
+        # removes rows the archive already holds; the next run finishes the move.
+        with transaction() as c:
+            for table, (conditions, params) in rules.items():
+                if not conditions:
+                    continue
+                where = " OR ".join(conditions)
+                columns = ", ".join(_shipped_columns(c, f"main.{table}"))
+                if table == "academic_papers":
+                    c.execute(f'''
+                        INSERT OR IGNORE INTO archive.paper_topics (paper_id, topic)
+                        SELECT paper_id, topic FROM main.paper_topics
+                        WHERE paper_id IN (SELECT paper_id FROM main.academic_papers WHERE {where})
+                    ''', params)
+                c.execute(f"INSERT OR IGNORE INTO archive.{table} ({columns}) "
+                          f"SELECT {columns} FROM main.{table} WHERE {where}", params)
+        with transaction() as c:
+            for table, (conditions, params) in rules.items():
+                if not conditions:
+                    continue
+                key = keys[table]
+                # The delete triggers keep row_counts, the FTS index and paper_topics in step
+                c.execute(f"DELETE FROM main.{table} WHERE ({' OR '.join(conditions)}) "
+                          f"AND {key} IN (SELECT {key} FROM archive.{table})", params)
+                moved[table] = c.rowcount
+    finally:
+        conn.execute("DETACH DATABASE archive")
+    return moved
+
+
+def auto_vacuum_mode(db_name=None):
+    """0 = none, 1 = full, 2 = incremental."""
+    return get_connection(db_name).execute("PRAGMA auto_vacuum").fetchone()[0]
+
+
+def enable_incremental_vacuum():
+    """
+    Switches DB_NAME to auto_vacuum = INCREMENTAL. That takes a one-off full
+    VACUUM, which may renumber rowids, so the FTS indexes (keyed on rowid)
+    are rebuilt straight after it. Shard export counts on sync_seq, which
+    VACUUM leaves alone.
+    """
+    conn = get_connection()
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM")
+    rebuild_search_index()
+
+
+def incremental_vacuum(db_name=None):
+    """Returns every free page to the filesystem; returns how many there were."""
+    conn = get_connection(db_name)
+    free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    if free_pages:
+        # execute() would step the pragma once, freeing a single page;
+        # executescript() runs it to completion
+        conn.executescript("PRAGMA incremental_vacuum;")
+    return free_pages
@@ -0,0 +1,355 @@
+import re
+import json
+import time
+import random
+import datetime
+import threading
+from types import SimpleNamespace
+from typing import get_args, get_origin
+from urllib.parse import urlparse, parse_qs
+from xml.sax.saxutils import escape
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from app.ingestion import NEWS_SOURCES
+
+# Local stand-ins for the live services in app/backends.py, used by
+# load_harness.py to drive full sweeps without touching the network or a quota.
+
+# --- FIXTURE SHAPE ---
+SYLLABLES = ["ka", "lo", "mi", "ren", "sa", "tor", "vin", "zhe", "qu", "dan",
+             "pol", "ist", "mar", "ova", "lek", "tri", "bun", "gao", "fer", "ush"]
+POSITIVE_WORDS = ["patient", "clinical", "vaccine", "battery", "climate", "energy"]
+FIXTURE_VENUES = ["Nature", "Science", "IEEE Access", "Journal of Applied Studies",
+                  "Regional Review", "ArXiv"]
+PAPER_HISTORY_DAYS = 180  # Generation 0 papers are this old; each generation is a day newer
+# ---------------------
+
+
+def _words(rng, count):
+    return " ".join("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3)))
+                    for _ in range(count))
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of a list of numbers (None when empty)."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+# --- FAKE LLM ---
+
+class FakeRateLimitError(Exception):
+    """Looks like the GenAI SDK's quota error to ratelimit.is_rate_limit_error."""
+    code = 429
+
+
+class FakeLLMClient:
+    """
+    Drop-in for genai.Client in generate_content calls with a response_schema.
+    Answers with schema-shaped canned JSON after 'latency' (+ up to 'jitter')
+    seconds, and raises a 429 on a 'rate_limit_rate' fraction of calls.
+    Batch prompts (list[Model] schemas) get one item per "[N]" tag in the
+    prompt, minus a 'drop_rate' fraction, to exercise the single-call fallback.
+    canned: fixed values for named fields, e.g. {"score": 8, "language": "zh"}.
+    """
+
+    def __init__(self, latency=0.5, jitter=0.2, rate_limit_rate=0.0, drop_rate=0.0,
+                 canned=None, seed=0):
+        self.models = self  # client.models.generate_content(...)
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_rate = rate_limit_rate
+        self.drop_rate = drop_rate
+        self.canned = {"language": "en", **(canned or {})}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.rate_limited = 0
+        self.latencies = []  # Seconds per call, 429s included
+
+    def _draw(self):
+        with self._lock:
+            self.calls += 1
+            delay = self.latency + self._rng.uniform(0, self.jitter)
+            limited = self._rng.random() < self.rate_limit_rate
+            if limited:
+                self.rate_limited += 1
+            return delay, limited
+
+    def _fake_value(self, name, annotation, rng):
+        if name in self.canned:
+            return self.canned[name]
+        if annotation is bool:
+            return rng.random() < 0.2
+        if annotation is int:
+            return rng.randint(1, 10)
+        return f"{name.replace('_', ' ').capitalize()}: {_words(rng, 8)}."
+
+    def _instance(self, model, rng, **fixed):
+        values = {name: self._fake_value(name, field.annotation, rng)
+                  for name, field in model.model_fields.items()}
+        return model(**dict(values, **fixed))
+
+    def generate_content(self, model, contents, config=None):
+        started = time.perf_counter()
+        delay, limited = self._draw()
+        time.sleep(delay)
+        try:
+            if limited:
+                raise FakeRateLimitError("429 RESOURCE_EXHAUSTED (fake quota)")
+
+            schema = (config or {}).get("response_schema")
+            # Same prompt, same answer: reruns behave like a deterministic model
+            rng = random.Random(f"{model}:{contents}")
+            if get_origin(schema) is list:
+                item_model = get_args(schema)[0]
+                ids = [int(i) for i in re.findall(r"^\s*\[(\d+)\]", contents, re.M)]
+                parsed = [self._instance(item_model, rng, id=i) for i in ids
+                          if rng.random() >= self.drop_rate]
+                text = json.dumps([item.model_dump() for item in parsed])
+            elif schema is not None:
+                parsed = self._instance(schema, rng)
+                text = parsed.model_dump_json()
+            else:
+                parsed, text = None, _words(rng, 40)
+
+            return SimpleNamespace(
+                parsed=parsed, text=text,
+                usage_metadata=SimpleNamespace(
+                    prompt_token_count=len(contents) // 4,
+                    candidates_token_count=len(text) // 4,
+                    total_token_count=(len(contents) + len(text)) // 4))
+        finally:
+            with self._lock:
+                self.latencies.append(time.perf_counter() - started)
+
+
+# --- FIXTURE SERVER ---
+
+class _FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass  # Sweeps print enough already
+
+    def _send(self, status, body=b"", content_type="text/plain", headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        fixture = self.server.fixture
+        started = time.perf_counter()
+        url = urlparse(self.path)
+        route = "rss" if url.path.startswith("/rss/") else url.path
+        try:
+            if fixture.latency:
+                time.sleep(fixture.latency)
+            if fixture.draw_rate_limit():
+                self._send(429, b"Too Many Requests")
+                route += " 429"
+            elif url.path.startswith("/rss/") and url.path.endswith(".xml"):
+                source = url.path[len("/rss/"):-len(".xml")]
+                etag = f'"{fixture.generation}"'
+                if self.headers.get("If-None-Match") == etag:
+                    self._send(304, headers={"ETag": etag})
+                else:
+                    self._send(200, fixture.rss(source).encode("utf-8"),
+                               "application/rss+xml; charset=utf-8", {"ETag": etag})
+            elif url.path == "/graph/v1/paper/search":
+                query = {k: v[0] for k, v in parse_qs(url.query).items()}
+                self._send(200, json.dumps(fixture.paper_search(query)).encode("utf-8"),
+                           "application/json")
+            elif url.path == "/graph/v1/paper/search/bulk":
+                query = {k: v[0] for k, v in parse_qs(url.query).items()}
+                self._send(200, json.dumps(fixture.paper_search_bulk(query)).encode("utf-8"),
+                           "application/json")
+            elif url.path == "/graph/v1/paper/batch" and self.command == "POST":
+                query = {k: v[0] for k, v in parse_qs(url.query).items()}
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                self._send(200, json.dumps(fixture.paper_batch(body["ids"], query))
+                           .encode("utf-8"), "application/json")
+            else:
+                self._send(404, b"Not Found")
+        finally:
+            fixture.record(route, time.perf_counter() - started)
+
+    do_POST = do_GET  # Only /paper/batch is POSTed
+
+
+class FixtureServer:
+    """
+    Serves RSS feeds (/rss/<source>.xml, with ETag / 304) and a Semantic Scholar
+    style /graph/v1/paper/search (plus /search/bulk and /batch) on a free localhost
+    port, from a background thread.
+    Each new_generation() publishes fresh stories and papers, like a new day.
+    'latency' seconds is added to every response and a 'rate_limit_rate'
+    fraction of requests is answered 429.
+        with FixtureServer(sources=12) as server:
+            update_news_feed(sources=server.news_sources())
+    """
+
+    def __init__(self, sources=12, items_per_feed=5, papers_per_topic=10, latency=0.0,
+                 rate_limit_rate=0.0, prescreen_pass_rate=0.7, bulk_page_size=1000, seed=0):
+        self.source_count = sources
+        self.items_per_feed = items_per_feed
+        self.papers_per_topic = papers_per_topic
+        self.latency = latency
+        self.rate_limit_rate = rate_limit_rate
+        self.prescreen_pass_rate = prescreen_pass_rate
+        self.bulk_page_size = bulk_page_size  # The real bulk search returns up to 1000
+        self.seed = seed
+        self.generation = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = None
+        self.requests = {}   # route -> count
+        self._papers = {}    # paperId -> every paper served so far, for /paper/batch
+        self.latencies = []  # Seconds per response
+
+    # --- Lifecycle ---
+
+    def start(self):
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), _FixtureHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.fixture = self
+        threading.Thread(target=self._httpd.serve_forever, name="fixture-server",
+                         daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address
+        return f"http://{host}:{port}"
+
+    @property
+    def semantic_scholar_url(self):
+        return f"{self.url}/graph/v1"
+
+    def new_generation(self):
+        self.generation += 1
+
+    # --- Bookkeeping ---
+
+    def draw_rate_limit(self):
+        with self._lock:
+            return self._rng.random() < self.rate_limit_rate
+
+    def record(self, route, seconds):
+        with self._lock:
+            self.requests[route] = self.requests.get(route, 0) + 1
+            self.latencies.append(seconds)
+
+    # --- Content ---
+
+    def news_sources(self):
+        """{name: feed url}, reusing the real source names (suffixed past the first dozen)."""
+        names = list(NEWS_SOURCES)
+        sources = {}
+        for i in range(self.source_count):
+            lap = i // len(names)
+            name = names[i % len(names)] + (str(lap + 1) if lap else "")
+            sources[name] = f"{self.url}/rss/{name}.xml"
+        return sources
+
+    def rss(self, source):
+        items = []
+        for j in range(self.items_per_feed):
+            rng = random.Random(f"{self.seed}:{source}:{self.generation}:{j}")
+            items.append(
+                "<item>"
+                f"<title>{escape(_words(rng, 8).capitalize())}</title>"
+                f"<link>{self.url}/news/{source}/{self.generation}/{j}</link>"
+                f"<description>{escape(_words(rng, 40).capitalize())}.</description>"
+                "</item>")
+        return ('<?xml version="1.0" encoding="UTF-8"?>'
+                f'<rss version="2.0"><channel><title>{escape(source)}</title>'
+                f"<link>{self.url}</link><description>Fixture feed</description>"
+                + "".join(items) + "</channel></rss>")
+
+    def _paper(self, topic, generation, j):
+        rng = random.Random(f"{self.seed}:{topic}:{generation}:{j}")
+        published = (datetime.date.today()
+                     - datetime.timedelta(days=PAPER_HISTORY_DAYS - generation))
+        if rng.random() < self.prescreen_pass_rate:
+            abstract = f"{_words(rng, 70)} {rng.choice(POSITIVE_WORDS)} {_words(rng, 10)}."
+        else:
+            abstract = f"{_words(rng, 20)} simulation."  # Too short, and a negative signal
+        paper_id = f"fx{rng.getrandbits(64):016x}"
+        return {
+            "paperId": paper_id,
+            "title": _words(rng, 9).capitalize(),
+            "abstract": abstract.capitalize(),
+            "url": f"{self.url}/paper/{paper_id}",
+            "publicationDate": published.isoformat(),
+            "venue": rng.choice(FIXTURE_VENUES),
+            "authors": [{"authorId": str(rng.getrandbits(32)), "name": _words(rng, 2).title()}],
+        }
+
+    def _search(self, query):
+        topic = query.get("query", "")
+        since = query.get("publicationDateOrYear", "").rstrip(":")
+        papers = [self._paper(topic, generation, j)
+                  for generation in range(self.generation, -1, -1)
+                  for j in range(self.papers_per_topic)]
+        if since:
+            papers = [p for p in papers if p["publicationDate"] >= since]
+        with self._lock:
+            self._papers.update((p["paperId"], p) for p in papers)
+        return papers
+
+    @staticmethod
+    def _only_fields(paper, query):
+        """The paper cut down to query['fields'] (paperId always stays), like the real API."""
+        if "fields" not in query:
+            return paper
+        fields = set(query["fields"].split(",")) | {"paperId"}
+        return {k: v for k, v in paper.items() if k in fields}
+
+    def paper_search(self, query):
+        """Newest-first papers for query['query'], paged like the real API."""
+        papers = self._search(query)
+
+        offset = int(query.get("offset", 0))
+        limit = int(query.get("limit", 10))
+        body = {"total": len(papers), "offset": offset,
+                "data": papers[offset:offset + limit]}
+        if offset + limit < len(papers):
+            body["next"] = offset + limit
+        return body
+
+    def paper_search_bulk(self, query):
+        """Papers sorted as query['sort'] asks, paged with a continuation token."""
+        papers = self._search(query)
+        if query.get("sort", "").endswith(":asc"):
+            papers.reverse()
+        offset = int(query.get("token") or 0)
+        body = {"total": len(papers),
+                "data": [self._only_fields(p, query)
+                         for p in papers[offset:offset + self.bulk_page_size]]}
+        if offset + self.bulk_page_size < len(papers):
+            body["token"] = str(offset + self.bulk_page_size)
+        return body
+
+    def paper_batch(self, ids, query):
+        """Full records for ids, in order; null for ids never served."""
+        with self._lock:
+            papers = [self._papers.get(paper_id) for paper_id in ids]
+        return [self._only_fields(p, query) if p else None for p in papers]
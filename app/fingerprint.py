@@ -0,0 +1,179 @@
+import re
+import html
+import random
+import struct
+import hashlib
+from app.database import (
+    find_story_candidates, save_story_fingerprints, get_unfingerprinted_news,
+    mark_news_fingerprinted, parse_analysis_markdown
+)
+
+# --- MINHASH / LSH SETTINGS ---
+NUM_PERM = 64          # MinHash signature length
+BANDS = 16             # LSH bands; NUM_PERM / BANDS rows each
+SHINGLE_SIZE = 4       # Character n-grams work for Chinese/Japanese feeds too
+MAX_TEXT_CHARS = 2000  # Long HTML summaries add cost, not signal
+# Estimated Jaccard similarity above which two stories count as the same story
+SIMILARITY_THRESHOLD = 0.6
+# ------------------------------
+
+_ROWS = NUM_PERM // BANDS
+_PRIME = (1 << 61) - 1
+# Fixed seed: signatures are persisted, so the permutations must never change.
+_rng = random.Random(20251222)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME))
+                 for _ in range(NUM_PERM)]
+
+
+def normalize(text):
+    """Lowercases, strips HTML and punctuation, and collapses whitespace."""
+    text = html.unescape(re.sub(r"<[^>]+>", " ", text or ""))
+    text = re.sub(r"[^\w\s]", " ", text.lower())
+    return re.sub(r"\s+", " ", text).strip()[:MAX_TEXT_CHARS]
+
+
+def story_text(article):
+    return f"{article.get('title') or ''} {article.get('summary') or ''}"
+
+
+def minhash(text):
+    """Returns the MinHash signature (a tuple of NUM_PERM ints) of a text."""
+    text = normalize(text)
+    shingles = {text[i:i + SHINGLE_SIZE]
+                for i in range(max(1, len(text) - SHINGLE_SIZE + 1))}
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big")
+              for s in shingles]
+    return tuple(min((a * h + b) % _PRIME for h in hashes)
+                 for a, b in _PERMUTATIONS)
+
+
+def band_buckets(signature):
+    """One LSH bucket per band; two signatures sharing any bucket are candidates."""
+    buckets = []
+    for band in range(BANDS):
+        rows = signature[band * _ROWS:(band + 1) * _ROWS]
+        digest = hashlib.blake2b(struct.pack(f">I{_ROWS}Q", band, *rows),
+                                 digest_size=8).digest()
+        # Signed, so it fits an SQLite INTEGER
+        buckets.append(int.from_bytes(digest, "big", signed=True))
+    return buckets
+
+
+def pack_signature(signature):
+    return struct.pack(f">{NUM_PERM}Q", *signature)
+
+
+def unpack_signature(blob):
+    return struct.unpack(f">{NUM_PERM}Q", blob)
+
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity: the share of matching MinHash slots."""
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / NUM_PERM
+
+
+class StoryIndex:
+    """In-memory LSH index for the stories of the sweep in progress."""
+
+    def __init__(self):
+        self._buckets = {}
+        self._signatures = {}
+
+    def add(self, link, signature):
+        self._signatures[link] = signature
+        for bucket in band_buckets(signature):
+            self._buckets.setdefault(bucket, set()).add(link)
+
+    def query(self, signature):
+        """Returns (link, similarity) of the closest story above the threshold, or None."""
+        candidates = set()
+        for bucket in band_buckets(signature):
+            candidates |= self._buckets.get(bucket, set())
+        return _best_match(signature, ((link, self._signatures[link]) for link in candidates))
+
+
+def _best_match(signature, candidates):
+    """Picks the most similar (link, signature) candidate above SIMILARITY_THRESHOLD."""
+    best = None
+    for link, candidate_sig in candidates:
+        score = similarity(signature, candidate_sig)
+        if score >= SIMILARITY_THRESHOLD and (best is None or score > best[1]):
+            best = (link, score)
+    return best
+
+
+def find_near_duplicate(signature, batch_index=None):
+    """
+    Looks a story up in the persisted LSH index (and this sweep's batch_index).
+    Returns (canonical_link, similarity) or None. canonical_link is always the
+    story that was actually analyzed, never another duplicate.
+    """
+    best = _best_match(signature, (
+        (row['duplicate_of'] or row['link'], unpack_signature(row['signature']))
+        for row in find_story_candidates(band_buckets(signature))))
+
+    if batch_index is not None:
+        in_batch = batch_index.query(signature)
+        if in_batch and (best is None or in_batch[1] > best[1]):
+            best = in_batch
+    return best
+
+
+def split_near_duplicates(articles):
+    """
+    Separates stories worth analyzing from near-duplicates of ones we already have.
+    Returns (unique, duplicates, signatures):
+      unique: articles to analyze
+      duplicates: list of (article, canonical_link, similarity)
+      signatures: {link: signature} for every article, for record_fingerprints()
+    """
+    batch_index = StoryIndex()
+    unique, duplicates, signatures = [], [], {}
+    for article in articles:
+        signature = minhash(story_text(article))
+        signatures[article['link']] = signature
+        match = find_near_duplicate(signature, batch_index)
+        if match:
+            duplicates.append((article, match[0], match[1]))
+        else:
+            batch_index.add(article['link'], signature)
+            unique.append(article)
+    return unique, duplicates, signatures
+
+
+def record_fingerprints(saved_articles, duplicates, signatures):
+    """
+    Persists fingerprints once the sweep is saved: analyzed stories as canonical,
+    duplicates linked to theirs. Duplicates whose canonical story failed to save
+    are left out, so the next sweep analyzes them properly.
+    """
+    saved_links = {article['link'] for article in saved_articles}
+    rows = [(a['link'], a['source'], a['title'], pack_signature(signatures[a['link']]),
+             band_buckets(signatures[a['link']]), None)
+            for a in saved_articles]
+    for article, canonical, _ in duplicates:
+        # Canonicals outside this sweep came from the index, so they are stored
+        if canonical in saved_links or canonical not in signatures:
+            signature = signatures[article['link']]
+            rows.append((article['link'], article['source'], article['title'],
+                         pack_signature(signature), band_buckets(signature), canonical))
+    return save_story_fingerprints(rows)
+
+
+def index_unfingerprinted_news():
+    """
+    Fingerprints stored articles that predate the index, or whose sweep stopped
+    before record_fingerprints. The feed's own summary is not kept, so the
+    analysis summary stands in for it next to the original title.
+    """
+    news, seq = get_unfingerprinted_news()
+    rows = []
+    for row in news:
+        summary = (row['analysis_summary']
+                   or parse_analysis_markdown(row['summary'])['summary'])
+        signature = minhash(story_text({'title': row['title'], 'summary': summary}))
+        rows.append((row['link'], row['source'], row['title'],
+                     pack_signature(signature), band_buckets(signature), None))
+    added = save_story_fingerprints(rows)
+    mark_news_fingerprinted(seq)
+    return added
@@ -1,4 +1,17 @@
+import math
+import time
+import hashlib
+import requests
 import feedparser
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
+from app.database import get_feed_cache, save_feed_cache, forget_feed_cache
+from app.backends import parse_feed
+from app import metrics
+
+# --- FETCH SETTINGS ---
+FETCH_TIMEOUT = 15      # Seconds we give any single feed before giving up on it
+MAX_FETCH_WORKERS = 6   # Feeds downloaded at the same time
+# ----------------------
 
 # Dictionary of target feeds (Native Language Versions)
 # We use native feeds so your AI has real work to do (translation) later.
@@ -37,38 +50,157 @@ NEWS_SOURCES = {
 }
 
 
-def fetch_latest_news(limit=3):
+def fetch_source(source_name, url, limit=3, timeout=FETCH_TIMEOUT, use_cache=True):
+    """
+    Downloads and parses a single feed.
+    Returns (articles, validators): a list of article dictionaries (at most
+    'limit'), and the response's (url, etag, last_modified, body_hash) for
+    settle_feed_cache() once those articles are stored (None without use_cache).
+
+    With use_cache, the request carries the ETag / Last-Modified we saw last
+    time. A 304, or a body identical to the last one, returns no articles.
+    """
+    headers = {"User-Agent": feedparser.USER_AGENT}
+    cached = get_feed_cache(source_name) if use_cache else None
+    if cached and cached['url'] != url:
+        cached = None  # The source moved; its old validators mean nothing
+    if cached:
+        if cached['etag']:
+            headers["If-None-Match"] = cached['etag']
+        if cached['last_modified']:
+            headers["If-Modified-Since"] = cached['last_modified']
+
+    # feedparser.parse(url) has no timeout, so we download with requests ourselves.
+    with metrics.timer("rss_fetch_seconds", source=source_name):
+        response = requests.get(url, timeout=timeout, headers=headers)
+    if response.status_code == 304:
+        print(f"     💤 {source_name} not modified since last sweep.")
+        metrics.count("rss_unchanged_total", source=source_name)
+        return [], None
+    response.raise_for_status()
+
+    body_hash = hashlib.sha256(response.content).hexdigest()
+    # Not saved here: if the sweep dies before these articles are stored, the
+    # next one must not see the feed as unchanged
+    validators = None
+    if use_cache:
+        validators = (url, response.headers.get("ETag"),
+                      response.headers.get("Last-Modified"), body_hash)
+    if cached and cached['body_hash'] == body_hash:
+        print(f"     💤 {source_name} body unchanged since last sweep.")
+        metrics.count("rss_unchanged_total", source=source_name)
+        return [], validators
+
+    with metrics.timer("rss_parse_seconds", source=source_name):
+        feed = parse_feed(
+            response.content,
+            response_headers={k.lower(): v for k, v in response.headers.items()})
+
+    # Check if the feed actually worked
+    if feed.bozo:
+        print(
+            f"     ⚠️ Warning: Potential issue with {source_name} feed data.")
+
+    # Loop through the first few entries
+    articles = []
+    for entry in feed.entries[:limit]:
+        articles.append({
+            "source": source_name,
+            "title": entry.title,
+            "link": entry.link,
+            # Some feeds use 'summary', others 'description'. We try both.
+            "summary": entry.get('summary', entry.get('description', 'No summary available'))
+        })
+    metrics.count("rss_articles_total", len(articles), source=source_name)
+    return articles, validators
+
+
+def settle_feed_cache(validators, retry_sources=()):
+    """
+    Stores the validators from fetch_latest_news() once the sweep has saved
+    their articles. Sources in retry_sources (articles that failed or were
+    deferred) lose their validators instead, so the next sweep re-reads them.
+    """
+    retry_sources = set(retry_sources)
+    for source_name, (url, etag, last_modified, body_hash) in validators.items():
+        if source_name not in retry_sources:
+            save_feed_cache(source_name, url, etag, last_modified, body_hash)
+    if retry_sources:
+        forget_feed_cache(retry_sources)
+
+
+def _timed_fetch(source_name, url, limit, timeout, use_cache):
+    start = time.perf_counter()
+    articles, validators = fetch_source(source_name, url, limit=limit,
+                                        timeout=timeout, use_cache=use_cache)
+    return articles, validators, time.perf_counter() - start
+
+
+def iter_latest_news(limit=3, max_workers=MAX_FETCH_WORKERS, timeout=FETCH_TIMEOUT, sources=None,
+                     use_cache=True):
+    """
+    Fetches every source concurrently and yields (source_name, articles, validators)
+    as each feed completes. Failed or timed-out sources are reported and skipped.
+    sources: optional {name: url} dict, defaults to NEWS_SOURCES.
+    use_cache: send conditional requests and skip feeds unchanged since last time.
+    """
+    sources = NEWS_SOURCES if sources is None else sources
+    max_workers = max(1, min(max_workers, len(sources) or 1))
+    # Slow feeds hold a worker, so the sweep can take one timeout per "wave" of workers.
+    sweep_timeout = timeout * math.ceil(len(sources) / max_workers) + timeout
+
+    executor = ThreadPoolExecutor(max_workers=max_workers,
+                                  thread_name_prefix="rss")
+    futures = {
+        executor.submit(metrics.profiled(_timed_fetch), name, url, limit, timeout,
+                        use_cache): name
+        for name, url in sources.items()
+    }
+    try:
+        for future in as_completed(futures, timeout=sweep_timeout):
+            source_name = futures[future]
+            try:
+                articles, validators, latency = future.result()
+            except Exception as e:
+                print(f"     ❌ Error fetching {source_name}: {e}")
+                metrics.count("rss_errors_total", source=source_name)
+                continue
+            print(
+                f"   - Scanned {source_name} in {latency:.1f}s ({len(articles)} articles)")
+            yield source_name, articles, validators
+    except FuturesTimeoutError:
+        for future, source_name in futures.items():
+            if not future.done():
+                print(f"     ❌ Error fetching {source_name}: timed out")
+                metrics.count("rss_errors_total", source=source_name)
+    finally:
+        # Don't wait on hung sockets; they are bounded by the requests timeout.
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def fetch_latest_news(limit=3, max_workers=MAX_FETCH_WORKERS, timeout=FETCH_TIMEOUT, sources=None,
+                      use_cache=True):
     """
     Fetches the top 'limit' articles from each defined source.
-    Returns a list of dictionaries containing title, link, and summary.
+    Returns (articles, validators): a list of dictionaries containing title,
+    link, and summary, and {source: validators} for settle_feed_cache().
+    Sources are fetched concurrently (max_workers=1 scans them one at a time).
+    With use_cache, feeds unchanged since the last sweep contribute nothing;
+    pass use_cache=False to always get the current top entries.
     """
     collected_articles = []
+    collected_validators = {}
+    sources = NEWS_SOURCES if sources is None else sources
+
+    print(f"📡 Contacting {len(sources)} Global RSS Feeds...")
+
+    start = time.perf_counter()
+    for source_name, articles, validators in iter_latest_news(limit, max_workers, timeout,
+                                                              sources, use_cache):
+        collected_articles.extend(articles)
+        if validators:
+            collected_validators[source_name] = validators
 
-    print(f"📡 Contacting {len(NEWS_SOURCES)} Global RSS Feeds...")
-
-    for source_name, url in NEWS_SOURCES.items():
-        try:
-            print(f"   - Scanning {source_name}...")
-            feed = feedparser.parse(url)
-
-            # Check if the feed actually worked
-            if feed.bozo:
-                print(
-                    f"     ⚠️ Warning: Potential issue with {source_name} feed data.")
-
-            # Loop through the first few entries
-            for entry in feed.entries[:limit]:
-                article = {
-                    "source": source_name,
-                    "title": entry.title,
-                    "link": entry.link,
-                    # Some feeds use 'summary', others 'description'. We try both.
-                    "summary": entry.get('summary', entry.get('description', 'No summary available'))
-                }
-                collected_articles.append(article)
-
-        except Exception as e:
-            print(f"     ❌ Error fetching {source_name}: {e}")
-
-    print(f"✅ Ingestion complete. Found {len(collected_articles)} articles.")
-    return collected_articles
+    print(
+        f"✅ Ingestion complete. Found {len(collected_articles)} articles in {time.perf_counter() - start:.1f}s.")
+    return collected_articles, collected_validators
@@ -0,0 +1,183 @@
+import os
+import time
+import datetime
+import threading
+from dotenv import load_dotenv
+from app import metrics
+from app.backends import llm_client
+from app.database import record_llm_usage, get_llm_usage_totals, get_topic_yield
+from app.ingestion import NEWS_SOURCES
+from app.ratelimit import is_rate_limit_error
+
+load_dotenv()
+
+# --- DAILY LLM BUDGET ---
+# Counted per UTC day across every run, from the llm_usage ledger. 0 = no limit.
+LLM_DAILY_REQUESTS = int(os.getenv("LLM_DAILY_REQUESTS", "0"))
+LLM_DAILY_TOKENS = int(os.getenv("LLM_DAILY_TOKENS", "0"))
+# This many 429s in a row, each after backoff, means the upstream quota is gone for today
+LLM_MAX_CONSECUTIVE_429 = int(os.getenv("LLM_MAX_CONSECUTIVE_429", "8"))
+# --------------------------
+
+# --- PRIORITIES ---
+# When the budget is tight these go first; everything else follows in NEWS_SOURCES order.
+PRIORITY_SOURCES = ["China_Xinhua", "Russia_Kommersant"]
+# Topics are ranked by how many 7+ papers they produced over this many days
+TOPIC_YIELD_DAYS = 30
+# ------------------
+
+
+class BudgetExhausted(Exception):
+    """Raised instead of calling the LLM once the day's budget is spent."""
+    code = "budget_exhausted"  # Never mistaken for a 429 by call_with_backoff
+
+
+def _today():
+    return datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%d")
+
+
+class LLMBudget:
+    """
+    Daily request / token budget shared by every thread in the process.
+    Starts from what the ledger says today already spent, then counts each call
+    as it is charged. Calls already in flight when the limit is reached still
+    finish, so a day can overshoot by up to GEMINI_MAX_IN_FLIGHT calls.
+    """
+
+    def __init__(self, max_requests=0, max_tokens=0, max_consecutive_429=LLM_MAX_CONSECUTIVE_429):
+        self.max_requests = max_requests
+        self.max_tokens = max_tokens
+        self.max_consecutive_429 = max_consecutive_429
+        self._lock = threading.Lock()
+        self._day = None
+        self.requests = 0
+        self.tokens = 0
+        self._consecutive_429 = 0
+        self._upstream_exhausted = False
+
+    def _sync(self):
+        """Loads today's spend from the ledger on first use and after midnight (UTC)."""
+        today = _today()
+        if today == self._day:
+            return
+        totals = get_llm_usage_totals(today)
+        self._day = today
+        self.requests, self.tokens = totals["requests"], totals["tokens"]
+        self._consecutive_429 = 0
+        self._upstream_exhausted = False
+
+    def _reason(self):
+        if self._upstream_exhausted:
+            return f"Gemini answered 429 {self.max_consecutive_429} times in a row"
+        if self.max_requests and self.requests >= self.max_requests:
+            return f"{self.requests} of {self.max_requests} daily requests used"
+        if self.max_tokens and self.tokens >= self.max_tokens:
+            return f"{self.tokens} of {self.max_tokens} daily tokens used"
+        return None
+
+    @property
+    def exhausted_reason(self):
+        """Why no more calls are allowed today, or None while budget remains."""
+        with self._lock:
+            self._sync()
+            return self._reason()
+
+    @property
+    def exhausted(self):
+        return self.exhausted_reason is not None
+
+    def check(self):
+        """Raises BudgetExhausted if there is no budget left for another call."""
+        reason = self.exhausted_reason
+        if reason:
+            metrics.count("llm_budget_refusals_total")
+            raise BudgetExhausted(f"daily LLM budget exhausted: {reason}")
+
+    def charge(self, outcome, tokens):
+        """Counts one finished call against today's budget."""
+        with self._lock:
+            self._sync()
+            if outcome == "rate_limited":
+                self._consecutive_429 += 1
+                if self.max_consecutive_429 and self._consecutive_429 >= self.max_consecutive_429:
+                    self._upstream_exhausted = True
+                return
+            self._consecutive_429 = 0
+            self.requests += 1
+            self.tokens += tokens
+
+    def remaining(self):
+        """{"requests", "tokens"} left today (None where there is no limit)."""
+        with self._lock:
+            self._sync()
+            return {
+                "requests": max(0, self.max_requests - self.requests) if self.max_requests else None,
+                "tokens": max(0, self.max_tokens - self.tokens) if self.max_tokens else None,
+            }
+
+
+# Shared by generate_json() on every thread; built from LLM_DAILY_REQUESTS / LLM_DAILY_TOKENS.
+llm_budget = LLMBudget(LLM_DAILY_REQUESTS, LLM_DAILY_TOKENS)
+
+
+def generate_json(model, prompt, contents, schema, items=1):
+    """
+    The one way the pipeline calls Gemini. Refuses once the budget is spent,
+    then records the call (tokens, latency, outcome) in the llm_usage ledger
+    and charges it to the budget, whether it succeeded or not.
+    prompt names the prompt for the ledger ('analysis', 'review_batch', ...).
+    """
+    llm_budget.check()
+    metrics.observe("llm_batch_size", items, buckets=metrics.SIZE_BUCKETS, prompt=prompt)
+
+    started = time.perf_counter()
+    outcome, usage = "error", None
+    try:
+        response = llm_client().models.generate_content(
+            model=model,
+            contents=contents,
+            config={
+                'response_mime_type': 'application/json',
+                'response_schema': schema,
+            }
+        )
+        outcome, usage = "ok", getattr(response, "usage_metadata", None)
+        return response
+    except Exception as e:
+        if is_rate_limit_error(e):
+            outcome = "rate_limited"
+        raise
+    finally:
+        latency = time.perf_counter() - started
+        prompt_tokens = getattr(usage, "prompt_token_count", None) or 0
+        response_tokens = getattr(usage, "candidates_token_count", None) or 0
+        metrics.observe("llm_call_seconds", latency, prompt=prompt)
+        metrics.count("llm_calls_total", prompt=prompt, outcome=outcome)
+        metrics.count("llm_tokens_total", prompt_tokens, prompt=prompt, kind="prompt")
+        metrics.count("llm_tokens_total", response_tokens, prompt=prompt, kind="response")
+        llm_budget.charge(outcome, prompt_tokens + response_tokens)
+        record_llm_usage(model, prompt, items, prompt_tokens, response_tokens,
+                         round(latency * 1000, 1), outcome)
+
+
+# --- PRIORITISATION ---
+
+def _source_rank(source):
+    order = PRIORITY_SOURCES + [name for name in NEWS_SOURCES if name not in PRIORITY_SOURCES]
+    return order.index(source) if source in order else len(order)
+
+
+def prioritise_articles(articles):
+    """Priority sources first, then the rest in NEWS_SOURCES order (stable within a source)."""
+    return sorted(articles, key=lambda article: _source_rank(article['source']))
+
+
+def prioritise_topics(topics, days=TOPIC_YIELD_DAYS):
+    """
+    Topics that produced the most 7+ papers over the last 'days' first, so a
+    budget that runs out mid-sweep leaves only the least productive ones unscored.
+    Ties keep their given order.
+    """
+    since = (datetime.date.today() - datetime.timedelta(days=days)).strftime("%Y-%m-%d")
+    yields = get_topic_yield(since)
+    return sorted(topics, key=lambda topic: -yields.get(topic, 0))
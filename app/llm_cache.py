@@ -0,0 +1,54 @@
+import json
+import hashlib
+from app.database import get_llm_cache, save_llm_cache, prune_llm_cache
+from app import metrics
+
+# --- CACHE LIMITS ---
+# The cache lives in peripheral_news.db, which is committed daily, so keep it small.
+LLM_CACHE_MAX_AGE_DAYS = 30
+LLM_CACHE_MAX_BYTES = 5 * 1024 * 1024
+# --------------------
+
+
+def cache_key(model, prompt_version, fields):
+    """Hashes (model, prompt template version, input fields) into a stable key."""
+    payload = json.dumps([model, prompt_version, fields],
+                         sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def get_cached(model, prompt_version, fields):
+    """Returns the cached result for these inputs, or None."""
+    hit = get_llm_cache(cache_key(model, prompt_version, fields),
+                        LLM_CACHE_MAX_AGE_DAYS * 86400)
+    metrics.count("llm_cache_hits_total" if hit is not None else "llm_cache_misses_total",
+                  prompt=str(prompt_version))
+    return json.loads(hit) if hit is not None else None
+
+
+def put_cached(model, prompt_version, fields, result):
+    """Caches a JSON-serialisable result; None is never cached."""
+    if result is None:
+        return
+    save_llm_cache(cache_key(model, prompt_version, fields), model,
+                   json.dumps(result, ensure_ascii=False))
+
+
+def cached_llm_call(model, prompt_version, fields, compute):
+    """
+    Returns the cached result for these inputs, or calls compute() and caches
+    what it returns. Results must be JSON-serialisable; None is never cached,
+    and errors raised by compute() propagate without touching the cache.
+    """
+    hit = get_cached(model, prompt_version, fields)
+    if hit is not None:
+        return hit
+
+    result = compute()
+    put_cached(model, prompt_version, fields, result)
+    return result
+
+
+def prune_llm_cache_to_limits():
+    """Applies the age and size limits; the runners call this once per sweep."""
+    return prune_llm_cache(LLM_CACHE_MAX_BYTES, LLM_CACHE_MAX_AGE_DAYS * 86400)
@@ -0,0 +1,269 @@
+import os
+import json
+import time
+import pstats
+import cProfile
+import datetime
+import functools
+import threading
+from contextlib import contextmanager
+
+# --- RUN REPORTS ---
+# Every runner writes <name>-<timestamp>.json and <name>.prom (latest run, in
+# Prometheus text format for a node_exporter textfile collector) here.
+METRICS_DIR = os.getenv("METRICS_DIR", "run_reports")
+# Set RUN_PROFILE=1 to also dump a cProfile of the run (<name>-<timestamp>.pstats)
+RUN_PROFILE = os.getenv("RUN_PROFILE", "") not in ("", "0")
+METRIC_PREFIX = "peripheral"
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+# Labels the run report breaks out into their own sections
+BREAKDOWN_LABELS = ("source", "topic")
+# -------------------
+
+# Metrics are only collected inside run(...): the dashboard shares these code
+# paths and must not accumulate samples forever.
+_lock = threading.Lock()
+_active = False
+_profiling = False
+_counters = {}    # (name, labels) -> total
+_histograms = {}  # (name, labels) -> {"buckets": (...), "samples": [...]}
+_profiles = []    # Finished cProfile.Profile objects from worker threads
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def count(name, n=1, **labels):
+    """Adds n to a counter, e.g. count("rss_articles_total", 5, source="Japan_NHK")."""
+    if not _active:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + n
+
+
+def observe(name, value, buckets=TIME_BUCKETS, **labels):
+    """Records one sample in a histogram (seconds by default; pass SIZE_BUCKETS for sizes)."""
+    if not _active:
+        return
+    key = _key(name, labels)
+    with _lock:
+        series = _histograms.setdefault(key, {"buckets": buckets, "samples": []})
+        series["samples"].append(value)
+
+
+@contextmanager
+def timer(name, **labels):
+    """Times the block into a histogram of seconds, whether or not it raises."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+
+def timed(name, **labels):
+    """Decorator form of timer()."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timer(name, **labels):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def profiled(fn):
+    """
+    Wraps a function that runs on a worker thread so a profiled run sees it too:
+    cProfile only follows the thread that enabled it.
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if not _profiling:
+            return fn(*args, **kwargs)
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profile.disable()
+            with _lock:
+                _profiles.append(profile)
+    return wrapper
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+        _profiles.clear()
+
+
+# --- REPORTING ---
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def _summary(samples):
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "sum": round(sum(ordered), 6),
+        "min": round(ordered[0], 6),
+        "p50": round(_percentile(ordered, 0.5), 6),
+        "p95": round(_percentile(ordered, 0.95), 6),
+        "p99": round(_percentile(ordered, 0.99), 6),
+        "max": round(ordered[-1], 6),
+    }
+
+
+def snapshot():
+    """
+    {"counters": {name: [{"labels", "value"}]}, "histograms": {name: [{"labels", ...summary}]}}
+    for everything recorded so far in this run.
+    """
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: list(series["samples"]) for key, series in _histograms.items()}
+
+    result = {"counters": {}, "histograms": {}}
+    for (name, labels), value in sorted(counters.items()):
+        result["counters"].setdefault(name, []).append(
+            {"labels": dict(labels), "value": value})
+    for (name, labels), samples in sorted(histograms.items()):
+        result["histograms"].setdefault(name, []).append(
+            {"labels": dict(labels), **_summary(samples)})
+    return result
+
+
+def breakdown(label):
+    """
+    Regroups every metric carrying 'label' by its value, e.g. breakdown("source") ->
+    {"Japan_NHK": {"rss_articles_total": 5, "rss_fetch_seconds": {"count": 1, "sum": 0.4}}}.
+    """
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: list(series["samples"]) for key, series in _histograms.items()}
+
+    result = {}
+    for (name, labels), value in counters.items():
+        labels = dict(labels)
+        if label in labels:
+            group = result.setdefault(labels[label], {})
+            group[name] = group.get(name, 0) + value
+    for (name, labels), samples in histograms.items():
+        labels = dict(labels)
+        if label in labels:
+            group = result.setdefault(labels[label], {})
+            totals = group.setdefault(name, {"count": 0, "sum": 0.0})
+            totals["count"] += len(samples)
+            totals["sum"] = round(totals["sum"] + sum(samples), 6)
+    return {value: result[value] for value in sorted(result)}
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _prometheus_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape_label(v)}"' for k, v in pairs) + "}"
+
+
+def prometheus_text(run_name):
+    """Everything recorded so far, in the Prometheus text exposition format."""
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: (series["buckets"], list(series["samples"]))
+                      for key, series in _histograms.items()}
+
+    run_label = (("run", run_name),)
+    lines = []
+    seen = set()
+    for (name, labels), value in sorted(counters.items()):
+        metric = f"{METRIC_PREFIX}_{name}"
+        if metric not in seen:
+            seen.add(metric)
+            lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric}{_prometheus_labels(run_label + labels)} {value}")
+
+    for (name, labels), (buckets, samples) in sorted(histograms.items()):
+        metric = f"{METRIC_PREFIX}_{name}"
+        if metric not in seen:
+            seen.add(metric)
+            lines.append(f"# TYPE {metric} histogram")
+        for bound in buckets:
+            hits = sum(1 for sample in samples if sample <= bound)
+            lines.append(f"{metric}_bucket"
+                         f"{_prometheus_labels(run_label + labels, (('le', bound),))} {hits}")
+        lines.append(f"{metric}_bucket"
+                     f"{_prometheus_labels(run_label + labels, (('le', '+Inf'),))} {len(samples)}")
+        lines.append(f"{metric}_sum{_prometheus_labels(run_label + labels)} {sum(samples)}")
+        lines.append(f"{metric}_count{_prometheus_labels(run_label + labels)} {len(samples)}")
+    return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def run(name, report_dir=None, profile=None):
+    """
+    Collects metrics for one runner invocation and, on the way out (even after an
+    error), writes the JSON run report and the Prometheus file to report_dir.
+        with metrics.run("news"):
+            update_news_feed()
+    profile: also cProfile the run (defaults to RUN_PROFILE).
+    """
+    global _active, _profiling
+    report_dir = report_dir or METRICS_DIR
+    profile = RUN_PROFILE if profile is None else profile
+
+    reset()
+    _active, _profiling = True, profile
+    started_at = datetime.datetime.now(datetime.timezone.utc)
+    started = time.perf_counter()
+    main_profile = cProfile.Profile() if profile else None
+    if main_profile:
+        main_profile.enable()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = repr(e)
+        raise
+    finally:
+        if main_profile:
+            main_profile.disable()
+        seconds = time.perf_counter() - started
+        _active = _profiling = False
+
+        os.makedirs(report_dir, exist_ok=True)
+        stamp = started_at.strftime("%Y%m%dT%H%M%SZ")
+        base = os.path.join(report_dir, f"{name}-{stamp}")
+
+        profile_path = None
+        if main_profile:
+            profile_path = base + ".pstats"
+            stats = pstats.Stats(main_profile)
+            for worker_profile in _profiles:
+                stats.add(worker_profile)
+            stats.dump_stats(profile_path)
+
+        report = {
+            "run": name,
+            "started": started_at.isoformat(timespec="seconds"),
+            "seconds": round(seconds, 3),
+            "error": error,
+            **snapshot(),
+            **{f"by_{label}": breakdown(label) for label in BREAKDOWN_LABELS},
+            "profile": profile_path,
+        }
+        with open(base + ".json", "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        with open(os.path.join(report_dir, f"{name}.prom"), "w", encoding="utf-8") as f:
+            f.write(prometheus_text(name))
+        print(f"📊 Run report written to {base}.json")
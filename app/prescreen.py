@@ -0,0 +1,78 @@
+import re
+from dataclasses import dataclass
+
+# Venues whose papers always go to the LLM, however they look locally.
+VIP_VENUES = [
+    "Nature", "Science", "Cell", "The Lancet", "New England Journal of Medicine",
+    "JAMA", "IEEE", "NeurIPS", "ICML", "CVPR", "ArXiv"
+]
+
+# Keyword signals lifted from the scoring rubric in app/academic.py:
+# impact OUTSIDE the domain scores up, impact trapped INSIDE it scores down.
+POSITIVE_SIGNALS = [
+    "patient", "clinical", "trial", "therapy", "treatment", "vaccine", "cancer",
+    "disease", "diagnos", "public health", "safety", "earthquake", "climate",
+    "emission", "energy", "battery", "fusion", "reactor", "cheaper", "low-cost",
+    "affordable", "real-world", "deployed", "in vivo", "human",
+]
+NEGATIVE_SIGNALS = [
+    "survey", "literature review", "systematic review", "tutorial", "position paper",
+    "simulation", "simulated", "theoretical", "theorem", "lemma", "proof",
+    "ablation", "benchmark", "toy", "incremental", "workshop", "student",
+]
+
+
+@dataclass
+class PrescreenConfig:
+    # Abstracts shorter than this rarely carry enough substance to score 7+
+    min_abstract_words: int = 60
+    # (positive - negative) keyword hits a non-VIP paper needs to reach the LLM
+    min_signal_score: int = 0
+    # VIP venues skip the keyword and length checks entirely
+    vip_bypass: bool = True
+
+
+DEFAULT_PRESCREEN = PrescreenConfig()
+
+
+def is_vip_venue(venue):
+    """'Nature Communications' and 'IEEE Access' count; 'Computer Science' does not."""
+    venue = (venue or "").strip().lower()
+    return any(venue == vip.lower() or venue.startswith(vip.lower() + " ")
+               for vip in VIP_VENUES)
+
+
+def _count_signals(text, signals):
+    return sum(1 for signal in signals
+               if re.search(r"\b" + re.escape(signal), text))
+
+
+def prescreen(title, venue, abstract_text, abstract_words=None, config=DEFAULT_PRESCREEN):
+    """
+    Decides locally whether a paper is worth an LLM review.
+    abstract_words is the length of the real abstract, or None when it is
+    unknown (the length check is then skipped).
+    Returns (passed, reason).
+    """
+    if config.vip_bypass and is_vip_venue(venue):
+        return True, "vip venue"
+
+    if abstract_words is not None and abstract_words < config.min_abstract_words:
+        return False, f"abstract too short ({abstract_words} words)"
+
+    text = f"{title} {abstract_text}".lower()
+    positive = _count_signals(text, POSITIVE_SIGNALS)
+    negative = _count_signals(text, NEGATIVE_SIGNALS)
+    if positive - negative < config.min_signal_score:
+        return False, f"weak impact signals (+{positive}/-{negative})"
+
+    return True, f"impact signals (+{positive}/-{negative})"
+
+
+def prescreen_paper(paper, config=DEFAULT_PRESCREEN):
+    """Pre-screens a raw Semantic Scholar paper dict. Returns (passed, reason)."""
+    abstract = paper.get('abstract')
+    if not abstract:
+        return False, "no abstract"
+    return prescreen(paper.get('title') or "", paper.get('venue'), abstract,
+                     abstract_words=len(abstract.split()), config=config)
@@ -0,0 +1,126 @@
+import os
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dotenv import load_dotenv
+from app import metrics
+
+load_dotenv()
+
+# --- GEMINI QUOTA ---
+# Free tier Flash allows 15 requests per minute; raise these on a paid key.
+GEMINI_RPM = int(os.getenv("GEMINI_RPM", "15"))
+GEMINI_MAX_IN_FLIGHT = int(os.getenv("GEMINI_MAX_IN_FLIGHT", "4"))
+# --------------------
+
+# --- SEMANTIC SCHOLAR QUOTA ---
+# The shared unauthenticated pool is roughly 100 requests / 5 min; a key allows more.
+S2_RPM = int(os.getenv("S2_RPM", "20"))
+# ------------------------------
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. Tokens refill continuously at 'rate_per_minute'
+    up to 'burst'; acquire() blocks until one is available.
+    'name' labels the bucket's wait and 429 metrics.
+    """
+
+    def __init__(self, rate_per_minute, burst=1, name="limiter"):
+        self.name = name
+        self.rate_per_second = rate_per_minute / 60.0
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        started = time.perf_counter()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.burst, self._tokens + (now - self._updated) * self.rate_per_second)
+                self._updated = now
+
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    break
+                else:
+                    wait = (1 - self._tokens) / self.rate_per_second
+            time.sleep(wait)
+        metrics.observe("rate_limit_wait_seconds", time.perf_counter() - started,
+                        limiter=self.name)
+
+    def set_rate(self, rate_per_minute):
+        """Changes the refill rate in place (e.g. a load test on a bigger quota)."""
+        with self._lock:
+            self.rate_per_second = rate_per_minute / 60.0
+
+    def pause(self, seconds):
+        """Holds back every caller for 'seconds' (used when the server says 429)."""
+        with self._lock:
+            self._paused_until = max(
+                self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+
+# One bucket for the whole process: news analysis and paper scoring share a key.
+gemini_limiter = TokenBucket(GEMINI_RPM, name="gemini")
+# Every topic search in a sweep draws from this one bucket.
+semantic_scholar_limiter = TokenBucket(S2_RPM, name="semantic_scholar")
+
+
+def is_rate_limit_error(error):
+    """True for HTTP 429 / RESOURCE_EXHAUSTED errors from the GenAI SDK or requests."""
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    if code is not None:
+        return code == 429
+    text = str(error)
+    return "429" in text or "RESOURCE_EXHAUSTED" in text
+
+
+def call_with_backoff(fn, *args, limiter=None, retries=5, backoff_factor=2, **kwargs):
+    """
+    Calls fn(*args, **kwargs) once per token from 'limiter'. On a rate-limit
+    error it pauses the limiter with exponential backoff and retries; any other
+    error (or the last 429) is raised to the caller.
+    """
+    for attempt in range(retries):
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if not is_rate_limit_error(e) or attempt == retries - 1:
+                raise
+            wait = (backoff_factor ** attempt) + random.uniform(0, 1)
+            print(f"      ⚠️ Rate limited. Waiting {wait:.1f}s...")
+            metrics.count("rate_limited_total",
+                          limiter=limiter.name if limiter is not None else "none")
+            if limiter is not None:
+                limiter.pause(wait)
+            else:
+                time.sleep(wait)
+
+
+def map_concurrently(fn, items, max_in_flight=GEMINI_MAX_IN_FLIGHT):
+    """
+    Runs fn(item) for every item on a bounded thread pool.
+    Yields (item, result, error) as each call completes; error is None on success.
+    """
+    items = list(items)
+    if not items:
+        return
+    with ThreadPoolExecutor(max_workers=max(1, min(max_in_flight, len(items))),
+                            thread_name_prefix="worker") as executor:
+        futures = {executor.submit(metrics.profiled(fn), item): item for item in items}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except Exception as e:
+                yield futures[future], None, e
@@ -0,0 +1,55 @@
+import os
+import datetime
+from app import metrics
+from app.database import (
+    archive_rows, archive_exists, archive_path, auto_vacuum_mode, enable_incremental_vacuum,
+    incremental_vacuum
+)
+
+# --- RETENTION ---
+# What stays in peripheral_news.db (the "hot" database the dashboard reads by
+# default); everything else moves to the archive next to it. 0 keeps forever.
+NEWS_RETENTION_DAYS = int(os.getenv("NEWS_RETENTION_DAYS", "90"))
+PAPER_RETENTION_DAYS = int(os.getenv("PAPER_RETENTION_DAYS", "365"))
+# Papers below the feed's cutoff (get_feed shows score >= 7) are never shown,
+# so they only need to stay findable for dedupe and evaluate_prescreen.py.
+ARCHIVE_BELOW_SCORE = int(os.getenv("ARCHIVE_BELOW_SCORE", "7"))
+# -----------------
+
+
+def _cutoff(days):
+    if not days:
+        return None
+    return (datetime.date.today() - datetime.timedelta(days=days)).strftime("%Y-%m-%d")
+
+
+def apply_retention(news_days=NEWS_RETENTION_DAYS, paper_days=PAPER_RETENTION_DAYS,
+                    below_score=ARCHIVE_BELOW_SCORE):
+    """
+    Moves expired rows to the archive, then hands the freed pages back to the
+    filesystem. The runners call this once per sweep, after exporting their shard.
+    Returns {"global_news": moved, "academic_papers": moved, "pages_freed": n}.
+    """
+    with metrics.timer("stage_seconds", stage="retention"):
+        moved = archive_rows(news_before=_cutoff(news_days),
+                             papers_before=_cutoff(paper_days),
+                             papers_below_score=below_score or None)
+        for table, n in moved.items():
+            metrics.count("rows_archived_total", n, table=table)
+
+        if auto_vacuum_mode() != 2:
+            _switch_to_incremental_vacuum()
+        moved["pages_freed"] = incremental_vacuum()
+        if archive_exists():
+            incremental_vacuum(archive_path())
+
+    if moved["global_news"] or moved["academic_papers"]:
+        print(f"🗄️ Archived {moved['global_news']} articles and {moved['academic_papers']} "
+              f"papers; freed {moved['pages_freed']} pages.")
+    return moved
+
+
+def _switch_to_incremental_vacuum():
+    """One-off conversion of an existing database (a full VACUUM)."""
+    print("   🧹 Enabling incremental vacuum (one-off full VACUUM)...")
+    enable_incremental_vacuum()
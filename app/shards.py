@@ -0,0 +1,251 @@
+import os
+import gzip
+import json
+import base64
+import hashlib
+import datetime
+from app import database, metrics
+from app.database import (
+    init_db, get_schema_version, close_all_connections, clear_read_cache,
+    read_shard_delta, mark_shard_exported, get_imported_shards, get_shard_keys,
+    upgrade_shard_tables, apply_shard, mark_imported_exported
+)
+from app.fingerprint import band_buckets, unpack_signature
+
+# --- DELTA SHARDS ---
+# Each export writes one immutable, gzipped NDJSON file of the rows added since
+# the previous export:  <SHARDS_DIR>/<UTC date>/<run>-<HHMMSS>Z.ndjson.gz
+# manifest.json lists every shard in the order it must be applied, with its
+# SHA-256, so a checkout can rebuild (or catch up) the database from the shards.
+SHARDS_DIR = os.getenv("SHARDS_DIR", "shards")
+MANIFEST_NAME = "manifest.json"
+SHARD_FORMAT = 1
+COMPRESS_LEVEL = 6     # zlib's default; 9 is several times slower for ~2% smaller shards
+# --------------------
+#
+# A shard is a header line, then per table a {"table", "columns", "rows": n}
+# line followed by n JSON arrays, one per row. BLOBs are {"$b64": "..."}.
+
+
+def _encode(value):
+    if isinstance(value, bytes):
+        return {"$b64": base64.b64encode(value).decode("ascii")}
+    return value
+
+
+def _decode(value):
+    if isinstance(value, dict):
+        return base64.b64decode(value["$b64"])
+    return value
+
+
+def _json_line(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+def encode_shard(header, tables):
+    """Gzipped NDJSON bytes for {table: (columns, rows)}. mtime=0 keeps it reproducible."""
+    lines = [_json_line(header)]
+    for table, (columns, rows) in tables.items():
+        lines.append(_json_line({"table": table, "columns": columns, "rows": len(rows)}))
+        lines.extend(_json_line([_encode(value) for value in row]) for row in rows)
+    # One compress call: gzip is far slower fed one short line at a time
+    return gzip.compress("".join(lines).encode("utf-8"), COMPRESS_LEVEL, mtime=0)
+
+
+def decode_shard(data):
+    """(header, {table: (columns, rows)}) from gzipped shard bytes."""
+    lines = gzip.decompress(data).decode("utf-8").splitlines()
+    header = json.loads(lines[0])
+    if header.get("shard") != SHARD_FORMAT:
+        raise ValueError(f"unsupported shard format {header.get('shard')!r}")
+    tables = {}
+    i = 1
+    while i < len(lines):
+        section = json.loads(lines[i])
+        rows = [tuple(_decode(value) for value in json.loads(line))
+                for line in lines[i + 1:i + 1 + section["rows"]]]
+        if len(rows) != section["rows"]:
+            raise ValueError(f"table '{section['table']}' is truncated")
+        tables[section["table"]] = (section["columns"], rows)
+        i += 1 + section["rows"]
+    return header, tables
+
+
+def sha256_of(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+# --- MANIFEST ---
+
+def load_manifest(shards_dir=None):
+    path = os.path.join(shards_dir or SHARDS_DIR, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {"format": SHARD_FORMAT, "shards": []}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_manifest(manifest, shards_dir):
+    path = os.path.join(shards_dir, MANIFEST_NAME)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+        f.write("\n")
+    os.replace(path + ".tmp", path)
+
+
+def read_shard(entry, shards_dir=None):
+    """The bytes of a manifest entry's shard, after checking them against its SHA-256."""
+    with open(os.path.join(shards_dir or SHARDS_DIR, entry["path"]), "rb") as f:
+        data = f.read()
+    digest = sha256_of(data)
+    if digest != entry["sha256"]:
+        raise ValueError(f"{entry['path']}: checksum mismatch, "
+                         f"manifest says {entry['sha256'][:12]}…, file is {digest[:12]}…")
+    return data
+
+
+# --- EXPORT ---
+
+def export_shard(run="manual", shards_dir=None):
+    """
+    Writes everything added since the last export as a new shard and appends it
+    to the manifest. Returns the manifest entry, or None when there was nothing new.
+    """
+    shards_dir = shards_dir or SHARDS_DIR
+    with metrics.timer("stage_seconds", stage="export_shard"):
+        tables, marks = read_shard_delta()
+        if not tables:
+            print("📦 Nothing new to export.")
+            return None
+
+        now = datetime.datetime.now(datetime.timezone.utc)
+        header = {"shard": SHARD_FORMAT, "run": run,
+                  "created": now.isoformat(timespec="seconds"),
+                  "schema_version": get_schema_version()}
+        data = encode_shard(header, tables)
+        relative = f"{now:%Y-%m-%d}/{run}-{now:%H%M%S}Z.ndjson.gz"
+        target = os.path.join(shards_dir, relative)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if os.path.exists(target):
+            raise FileExistsError(f"{target} already exists; shards are never overwritten")
+        with open(target, "wb") as f:
+            f.write(data)
+
+        entry = {
+            "path": relative,
+            "sha256": sha256_of(data),
+            "bytes": len(data),
+            "schema_version": header["schema_version"],
+            "rows": {table: len(rows) for table, (_, rows) in tables.items()},
+        }
+        manifest = load_manifest(shards_dir)
+        manifest["shards"].append(entry)
+        _save_manifest(manifest, shards_dir)
+        mark_shard_exported(marks, relative, entry["sha256"], sum(entry["rows"].values()))
+
+    metrics.count("shard_rows_exported_total", sum(entry["rows"].values()))
+    print(f"📦 Exported {sum(entry['rows'].values())} rows to {target} ({len(data)} bytes)")
+    return entry
+
+
+# --- IMPORT ---
+
+def _story_bands(tables):
+    """(bucket, link) rows for the shard's fingerprints; story_bands is never shipped."""
+    if "story_fingerprints" not in tables:
+        return []
+    columns, rows = tables["story_fingerprints"]
+    link, signature = columns.index("link"), columns.index("signature")
+    return [(bucket, row[link]) for row in rows if row[signature]
+            for bucket in band_buckets(unpack_signature(row[signature]))]
+
+
+def _collect_keys(shipped, tables, keys):
+    """Adds the primary keys of a shard's rows to shipped: {table: set}, None for snapshots."""
+    for table, (columns, rows) in tables.items():
+        if table not in keys:
+            shipped[table] = None
+            continue
+        positions = [columns.index(column) for column in keys[table]]
+        shipped.setdefault(table, set()).update(
+            tuple(row[i] for i in positions) for row in rows)
+
+
+def _remove_database():
+    close_all_connections()
+    clear_read_cache()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(database.DB_NAME + suffix):
+            os.remove(database.DB_NAME + suffix)
+
+
+def import_shards(shards_dir=None, rebuild=False):
+    """
+    Applies every manifest shard this database has not seen yet, in manifest
+    order, each in its own transaction after its checksum is verified.
+    rebuild=True starts from an empty database instead.
+    Returns {"shards": applied, "rows": written}.
+    """
+    shards_dir = shards_dir or SHARDS_DIR
+    manifest = load_manifest(shards_dir)
+    if rebuild:
+        _remove_database()
+    init_db()
+
+    imported = get_imported_shards()
+    for entry in manifest["shards"]:
+        if entry["path"] in imported and imported[entry["path"]] != entry["sha256"]:
+            raise ValueError(f"{entry['path']} changed after it was imported; "
+                             "shards must never be rewritten")
+    pending = [entry for entry in manifest["shards"] if entry["path"] not in imported]
+    if not pending:
+        return {"shards": 0, "rows": 0}
+
+    # Rows that arrived in a shard must not be shipped straight back out, even
+    # when this database already held them (a checkout restored without its
+    # sync_state); only rows this database wrote itself still need exporting.
+    keys = get_shard_keys()
+    shipped = {}
+    written = 0
+    for entry in pending:
+        header, tables = decode_shard(read_shard(entry, shards_dir))
+        if header["schema_version"] > get_schema_version():
+            raise ValueError(f"{entry['path']} needs schema v{header['schema_version']}; "
+                             f"this code only knows v{get_schema_version()}")
+        tables = upgrade_shard_tables(tables)
+        written += apply_shard(entry["path"], entry["sha256"], tables, _story_bands(tables))
+        _collect_keys(shipped, tables, keys)
+        print(f"   📥 {entry['path']}: {sum(len(rows) for _, rows in tables.values())} rows")
+    mark_imported_exported(shipped)
+    return {"shards": len(pending), "rows": written}
+
+
+def verify_shards(shards_dir=None):
+    """
+    Checks every shard against the manifest. Returns a list of problems
+    (missing or corrupt shards, and shard files the manifest does not list).
+    """
+    shards_dir = shards_dir or SHARDS_DIR
+    problems = []
+    listed = set()
+    for entry in load_manifest(shards_dir)["shards"]:
+        listed.add(entry["path"])
+        try:
+            data = read_shard(entry, shards_dir)
+        except FileNotFoundError:
+            problems.append(f"{entry['path']}: missing")
+            continue
+        except ValueError as e:
+            problems.append(str(e))
+            continue
+        try:
+            decode_shard(data)
+        except (ValueError, OSError, EOFError) as e:
+            problems.append(f"{entry['path']}: unreadable ({e})")
+    for root, _, files in os.walk(shards_dir):
+        for name in files:
+            relative = os.path.relpath(os.path.join(root, name), shards_dir).replace(os.sep, "/")
+            if relative.endswith(".ndjson.gz") and relative not in listed:
+                problems.append(f"{relative}: not in the manifest")
+    return problems
@@ -0,0 +1,447 @@
+import os
+import sys
+import json
+import time
+import random
+import sqlite3
+import platform
+import argparse
+import datetime
+import tempfile
+import statistics
+import subprocess
+from app import database
+from app.database import (
+    init_db, clear_read_cache, _insert_many, _INSERT_NEWS, _INSERT_PAPER
+)
+from app.fingerprint import NUM_PERM, BANDS, pack_signature
+from app.ingestion import NEWS_SOURCES
+from app.topics import TOPIC_HUBS
+from app.prescreen import VIP_VENUES
+
+# Usage: python benchmark_db.py [--sizes 10000,100000,1000000] [--output bench.json]
+#        python benchmark_db.py --baseline bench_before.json
+
+# --- SYNTHETIC DATA SHAPE ---
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+DEFAULT_SEED = 20251222
+ANCHOR_DATE = datetime.date(2025, 12, 22)  # "Today" for every generated row
+HISTORY_DAYS = 730
+SEED_CHUNK = 10_000
+# --baseline flags a scenario when its median is this much slower, and by at
+# least this many milliseconds (sub-millisecond timings are mostly noise)
+REGRESSION_RATIO = 1.5
+REGRESSION_MIN_MS = 0.5
+# Most papers land mid-scale; roughly a quarter reach the feed (7+)
+SCORE_WEIGHTS = {1: 3, 2: 6, 3: 12, 4: 18, 5: 20, 6: 16, 7: 12, 8: 8, 9: 4, 10: 1}
+OTHER_VENUES = ["Scientific Reports", "PLoS ONE", "Sensors", "Applied Sciences",
+                "Energies", "Frontiers in Neuroscience", "Physical Review B", None]
+LANGUAGES = {"China": "zh", "Russia": "ru", "Japan": "ja", "France": "fr",
+             "Germany": "de", "Poland": "pl", "Brazil": "pt", "Iran": "fa"}
+# One LLM call per this many stored rows, over the same history
+USAGE_ROWS_PER_CALL = 10
+USAGE_PROMPTS = ["analysis", "analysis_batch", "review", "review_batch"]
+USAGE_OUTCOMES = {"ok": 95, "error": 2, "rate_limited": 3}
+# global_news columns in _INSERT_NEWS order, as a shard carries them
+NEWS_COLUMNS = ["link", "source", "title", "summary", "original_date", "added_date", "region",
+                "headline", "analysis_summary", "analyst_note", "language"]
+# Real words mixed into the vocabulary so search scenarios have hits
+SEARCH_WORDS = ["battery", "tariff", "sanctions", "election", "vaccine", "reactor",
+                "semiconductor", "drought", "border", "pipeline", "satellite", "protest"]
+# ----------------------------
+
+ALL_TOPICS = [topic for topics in TOPIC_HUBS.values() for topic in topics]
+SOURCES = list(NEWS_SOURCES)
+
+
+def _zipf_weights(n):
+    """A few sources/topics dominate, like the real feeds."""
+    return [1 / (rank + 1) for rank in range(n)]
+
+
+class SyntheticData:
+    """Deterministic generator: the same seed always yields the same rows."""
+
+    def __init__(self, seed=DEFAULT_SEED):
+        self.seed = seed
+        vocab_rng = random.Random(seed)
+        syllables = ["ka", "lo", "mi", "ne", "ru", "sa", "ti", "vo", "zen", "dar",
+                     "qui", "bel", "tor", "fen", "gra", "hul"]
+        words = sorted({"".join(vocab_rng.choice(syllables) for _ in range(vocab_rng.randint(2, 4)))
+                        for _ in range(3000)})
+        # Search terms sit mid-frequency, like real topical words
+        self.vocabulary = words[:200] + SEARCH_WORDS + words[200:]
+        self._word_weights = _zipf_weights(len(self.vocabulary))
+
+    def _rng(self, table, start):
+        return random.Random(f"{self.seed}:{table}:{start}")
+
+    def _text(self, rng, low, high):
+        return " ".join(rng.choices(self.vocabulary, self._word_weights, k=rng.randint(low, high)))
+
+    @staticmethod
+    def _days_ago(rng, mean_days):
+        # Recent days are denser than old ones
+        return min(HISTORY_DAYS, int(rng.expovariate(1 / mean_days)))
+
+    @staticmethod
+    def news_link(i):
+        return f"https://bench.local/news/{i}"
+
+    @staticmethod
+    def paper_id(i):
+        return f"bench-{i:08d}"
+
+    def news_rows(self, start, count):
+        rng = self._rng("news", start)
+        rows = []
+        for i in range(start, start + count):
+            source = rng.choices(SOURCES, _zipf_weights(len(SOURCES)))[0]
+            day = (ANCHOR_DATE - datetime.timedelta(days=self._days_ago(rng, 120))).isoformat()
+            analysis = {"headline": self._text(rng, 6, 12).capitalize(),
+                        "summary": self._text(rng, 30, 50),
+                        "analyst_note": self._text(rng, 25, 40),
+                        "language": LANGUAGES.get(source.split("_")[0], "en")}
+            rows.append((self.news_link(i), source, self._text(rng, 5, 10),
+                         database.format_analysis(analysis), day, day, "East",
+                         analysis["headline"], analysis["summary"],
+                         analysis["analyst_note"], analysis["language"]))
+        return rows
+
+    def paper_rows(self, start, count):
+        rng = self._rng("papers", start)
+        scores, score_weights = list(SCORE_WEIGHTS), list(SCORE_WEIGHTS.values())
+        venues = VIP_VENUES + OTHER_VENUES
+        rows = []
+        for i in range(start, start + count):
+            published = ANCHOR_DATE - datetime.timedelta(days=self._days_ago(rng, 200))
+            added = min(ANCHOR_DATE, published + datetime.timedelta(days=rng.randint(0, 30)))
+            score = rng.choices(scores, score_weights)[0]
+            rows.append((self.paper_id(i), self._text(rng, 8, 16).capitalize(),
+                         f"https://bench.local/paper/{i}",
+                         rng.choices(ALL_TOPICS, _zipf_weights(len(ALL_TOPICS)))[0],
+                         score, score >= 8, self._text(rng, 15, 25),
+                         None if rng.random() < 0.01 else published.isoformat(),
+                         added.isoformat(), rng.choice(venues), rng.randint(40, 400)))
+        return rows
+
+    def fingerprint_rows(self, start, count):
+        """Every 5th story is fingerprinted; every 4th of those is a near-duplicate."""
+        rng = self._rng("fingerprints", start)
+        rows = []
+        for i in range(start, start + count):
+            if i % 5:
+                continue
+            signature = [rng.getrandbits(63) for _ in range(NUM_PERM)]
+            buckets = [rng.getrandbits(63) for _ in range(BANDS)]
+            duplicate_of = self.news_link(i - 5) if i % 20 == 5 else None
+            rows.append((self.news_link(i), "Bench", "", pack_signature(signature),
+                         buckets, duplicate_of))
+        return rows
+
+    def usage_rows(self, start, count):
+        """One ledger row per USAGE_ROWS_PER_CALL stored rows, as record_llm_usage writes them."""
+        rng = self._rng("usage", start)
+        outcomes, outcome_weights = list(USAGE_OUTCOMES), list(USAGE_OUTCOMES.values())
+        rows = []
+        for i in range(start, start + count):
+            if i % USAGE_ROWS_PER_CALL:
+                continue
+            day = (ANCHOR_DATE - datetime.timedelta(days=self._days_ago(rng, 120))).isoformat()
+            rows.append((f"bench-usage-{i:08d}", f"{day} 12:00:00", day, "bench",
+                         rng.choice(USAGE_PROMPTS), rng.randint(1, 10), rng.randint(500, 5000),
+                         rng.randint(50, 800), round(rng.uniform(300, 3000), 1),
+                         rng.choices(outcomes, outcome_weights)[0]))
+        return rows
+
+    def extra_topic_pairs(self, start, count):
+        """One paper in ten is also tagged under a second topic."""
+        rng = self._rng("topics", start)
+        return [(self.paper_id(i), rng.choice(ALL_TOPICS))
+                for i in range(start, start + count) if rng.random() < 0.1]
+
+
+_INSERT_USAGE = '''
+    INSERT INTO llm_usage (uid, called_at, day, model, prompt, items, prompt_tokens,
+                           response_tokens, latency_ms, outcome)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+
+def seed_database(data, rows):
+    """Fills the current DB_NAME with 'rows' news articles and 'rows' papers."""
+    init_db()
+    timings = {}
+    for name, generate, write in (
+            ("news", data.news_rows, lambda batch: _insert_many(_INSERT_NEWS, batch)),
+            ("papers", data.paper_rows, lambda batch: _insert_many(_INSERT_PAPER, batch)),
+            ("paper_topics", data.extra_topic_pairs, database.tag_paper_topics),
+            ("story_fingerprints", data.fingerprint_rows, database.save_story_fingerprints),
+            ("llm_usage", data.usage_rows, lambda batch: _insert_many(_INSERT_USAGE, batch))):
+        started = time.perf_counter()
+        for start in range(0, rows, SEED_CHUNK):
+            write(generate(start, min(SEED_CHUNK, rows - start)))
+        timings[name] = round(time.perf_counter() - started, 3)
+    # Everything seeded counts as exported, so read_shard_delta times a sweep's
+    # worth of new rows rather than the whole database
+    _, marks = database.read_shard_delta()
+    database.mark_shard_exported(marks, "bench/seed", "", 0)
+    database.get_connection().execute("ANALYZE")
+    return timings
+
+
+# Read functions the runners call directly, without the read cache
+UNCACHED_READS = {"news_exists", "paper_exists", "filter_new_links", "filter_new_paper_ids",
+                  "find_story_candidates", "get_topic_watermark", "get_feed_cache",
+                  "get_llm_cache", "get_llm_usage_totals", "read_shard_delta"}
+
+
+def scenarios(data, rows):
+    """
+    (name, kind, fn) for every public read and write function.
+    fn(rep) runs the operation once; writes use fresh keys on every rep.
+    kind is "read" for @cached_read functions, "lookup" for the uncached
+    reads the runners use, and "write". Scenarios in 'after_writes' run last,
+    over the rows the writes added.
+    """
+    today = ANCHOR_DATE.isoformat()
+    category = TOPIC_HUBS["Future Tech"]
+    sample_links = [data.news_link(i) for i in range(0, rows, max(1, rows // 1000))]
+    sample_ids = [data.paper_id(i) for i in range(0, rows, max(1, rows // 1000))]
+    unseen_links = [f"https://bench.local/unseen/{i}" for i in range(500)]
+
+    def walk_pages(fetch_page, target, pages=5):
+        cursor = None
+        for _ in range(pages):
+            _, cursor = fetch_page(target, after=cursor)
+            if cursor is None:
+                break
+
+    def new_articles(rep, n=100):
+        return [({"link": f"https://bench.local/new/{rep}/{j}", "source": SOURCES[j % len(SOURCES)],
+                  "title": f"bench {rep} {j}"},
+                 {"headline": "h", "summary": "s", "analyst_note": "n", "language": "en"})
+                for j in range(n)]
+
+    def new_papers(rep, n=100):
+        return [{"paperId": f"new-{rep}-{j}", "title": f"bench {rep} {j}", "url": "u",
+                 "publicationDate": today, "venue": "Nature", "abstract": "a b c"}
+                for j in range(n)]
+
+    reads = [
+        ("get_dashboard_stats", lambda rep: database.get_dashboard_stats(today)),
+        ("get_news_stats", lambda rep: database.get_news_stats()),
+        ("get_row_counts(source)", lambda rep: database.get_row_counts("global_news", "source")),
+        ("get_latest_news_preview", lambda rep: database.get_latest_news_preview()),
+        ("get_latest_academic_preview", lambda rep: database.get_latest_academic_preview()),
+        ("get_feed(All)", lambda rep: database.get_feed("All")),
+        ("get_feed(category list)", lambda rep: database.get_feed(category)),
+        ("get_feed(topic)", lambda rep: database.get_feed("Robotics")),
+        ("get_feed_page(All) x5", lambda rep: walk_pages(database.get_feed_page, "All")),
+        ("get_feed_page(category list) x5",
+         lambda rep: walk_pages(database.get_feed_page, category)),
+        ("get_global_news(All)", lambda rep: database.get_global_news("All")),
+        ("get_global_news(source)", lambda rep: database.get_global_news("China_Xinhua")),
+        ("get_global_news_page(All) x5",
+         lambda rep: walk_pages(database.get_global_news_page, "All")),
+        ("get_news_by_date", lambda rep: database.get_news_by_date(today)),
+        ("get_news_by_date(region)", lambda rep: database.get_news_by_date(today, "China")),
+        ("get_news_sources", lambda rep: database.get_news_sources()),
+        ("get_related_stories(50)", lambda rep: database.get_related_stories(sample_links[:50])),
+        ("get_paper_topics", lambda rep: database.get_paper_topics(sample_ids[rep % len(sample_ids)])),
+        ("search_news", lambda rep: database.search_news("tariff sanctions")),
+        ("search_papers(min_score=7)", lambda rep: database.search_papers("battery", min_score=7)),
+        ("news_exists", lambda rep: database.news_exists(sample_links[rep % len(sample_links)])),
+        ("paper_exists", lambda rep: database.paper_exists(sample_ids[rep % len(sample_ids)])),
+        ("filter_new_links(1000)", lambda rep: database.filter_new_links(sample_links[:500] + unseen_links)),
+        ("filter_new_paper_ids(1000)", lambda rep: database.filter_new_paper_ids(sample_ids[:1000])),
+        ("find_story_candidates(16)", lambda rep: database.find_story_candidates(list(range(16)))),
+        ("get_topic_watermark", lambda rep: database.get_topic_watermark("Robotics")),
+        ("get_feed_cache", lambda rep: database.get_feed_cache("China_Xinhua")),
+        ("get_llm_cache", lambda rep: database.get_llm_cache("bench-key-0", 86400)),
+        ("get_llm_usage_totals", lambda rep: database.get_llm_usage_totals(today)),
+        ("get_llm_usage_summary(7 days)", lambda rep: database.get_llm_usage_summary(
+            (ANCHOR_DATE - datetime.timedelta(days=7)).isoformat())),
+        ("get_llm_usage_by_prompt", lambda rep: database.get_llm_usage_by_prompt(today)),
+    ]
+    writes = [
+        ("save_news_batch(100)", lambda rep: database.save_news_batch(new_articles(rep))),
+        ("save_papers_batch(100)", lambda rep: database.save_papers_batch(
+            [(paper, {"score": 7, "is_major": False, "layman_summary": "s"}, "Robotics")
+             for paper in new_papers(rep)])),
+        ("save_prescreen_rejects(100)", lambda rep: database.save_prescreen_rejects(
+            [(paper, "Robotics", "bench") for paper in new_papers(rep)])),
+        ("tag_paper_topics(100)", lambda rep: database.tag_paper_topics(
+            [(paper_id, "Bionics") for paper_id in sample_ids[:100]])),
+        ("advance_topic_watermark", lambda rep: database.advance_topic_watermark(
+            "Robotics", new_papers(rep, 10))),
+        ("save_story_fingerprints(100)", lambda rep: database.save_story_fingerprints(
+            [(f"https://bench.local/new/{rep}/{j}", "Bench", "", bytes(8 * NUM_PERM),
+              [rep * 1000 + j] * BANDS, None) for j in range(100)])),
+        ("save_feed_cache", lambda rep: database.save_feed_cache(
+            "China_Xinhua", "u", f"etag-{rep}", None, "hash")),
+        ("save_llm_cache", lambda rep: database.save_llm_cache(
+            f"bench-key-{rep}", "bench", json.dumps({"score": 7}))),
+        ("prune_llm_cache", lambda rep: database.prune_llm_cache(5_000_000, 30 * 86400)),
+        ("backfill_analysis_fields", lambda rep: database.backfill_analysis_fields()),
+        ("record_llm_usage", lambda rep: database.record_llm_usage(
+            "bench", "review_batch", 5, 2000, 400, 1200.0, "ok")),
+        ("apply_shard(100 news)", lambda rep: database.apply_shard(
+            f"bench/{rep}.ndjson.gz", "", {"global_news": (NEWS_COLUMNS, [
+                (f"https://bench.local/shard/{rep}/{j}", SOURCES[j % len(SOURCES)],
+                 f"bench {rep} {j}", "s", today, today, "East", "h", "s", "n", "en")
+                for j in range(100)])})),
+        # Each rep moves the next ten days of the oldest news
+        ("archive_rows(10 days of news)", lambda rep: database.archive_rows(
+            news_before=(ANCHOR_DATE - datetime.timedelta(days=HISTORY_DAYS - 10 * rep))
+            .isoformat())),
+    ]
+    after_writes = [
+        # Unmarked, so every rep reads everything the writes above added
+        ("read_shard_delta", lambda rep: database.read_shard_delta()),
+    ]
+
+    for name, fn in reads:
+        yield name, "lookup" if name.split("(")[0] in UNCACHED_READS else "read", fn
+    for name, fn in writes:
+        yield name, "write", fn
+    for name, fn in after_writes:
+        yield name, "lookup", fn
+
+
+def _summarize(samples):
+    ms = sorted(s * 1000 for s in samples)
+    return {
+        "runs": len(ms),
+        "min_ms": round(ms[0], 4),
+        "median_ms": round(statistics.median(ms), 4),
+        "p95_ms": round(ms[min(len(ms) - 1, int(0.95 * len(ms)))], 4),
+        "mean_ms": round(statistics.fmean(ms), 4),
+    }
+
+
+def run_scenarios(data, rows, repeat):
+    results = {}
+    for name, kind, fn in scenarios(data, rows):
+        # Reads are timed with the read cache emptied first (it would otherwise
+        # answer every repeat), then again through the cache.
+        samples = []
+        for rep in range(repeat):
+            clear_read_cache()
+            started = time.perf_counter()
+            fn(rep)
+            samples.append(time.perf_counter() - started)
+        results[name] = dict(kind=kind, **_summarize(samples))
+
+        if kind == "read":
+            fn(0)  # warm
+            samples = []
+            for rep in range(repeat):
+                started = time.perf_counter()
+                fn(0)
+                samples.append(time.perf_counter() - started)
+            results[f"{name} [cached]"] = dict(kind="read-cached", **_summarize(samples))
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)),
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(sizes, repeat, seed, workdir, keep):
+    data = SyntheticData(seed)
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "seed": seed,
+            "repeat": repeat,
+        },
+        "sizes": {},
+    }
+    for rows in sizes:
+        path = os.path.join(workdir, f"bench_{rows}.db")
+        reuse = keep and os.path.exists(path)
+        database.DB_NAME = path
+        print(f"🧪 {rows:,} rows per table ({'reusing' if reuse else 'seeding'} {path})")
+        seed_seconds = {} if reuse else seed_database(data, rows)
+        init_db()
+        results = run_scenarios(data, rows, repeat)
+        report["sizes"][str(rows)] = {
+            "seed_seconds": seed_seconds,
+            "db_bytes": os.path.getsize(path),
+            "scenarios": results,
+        }
+        for name, result in results.items():
+            print(f"   {name:<40} median {result['median_ms']:>10.3f} ms   "
+                  f"p95 {result['p95_ms']:>10.3f} ms")
+        database.close_all_connections()
+        if not keep:
+            for suffix in ("", "-wal", "-shm"):
+                for target in (path, database.archive_path()):
+                    if os.path.exists(target + suffix):
+                        os.remove(target + suffix)
+    return report
+
+
+def compare(report, baseline):
+    """Prints median changes against an earlier report; returns the regressed scenarios."""
+    regressions = []
+    for rows, size in report["sizes"].items():
+        before = baseline.get("sizes", {}).get(rows)
+        if not before:
+            continue
+        print(f"\n📊 {rows} rows vs {baseline['meta'].get('commit') or 'baseline'}")
+        for name, result in size["scenarios"].items():
+            old = before["scenarios"].get(name)
+            if not old or not old["median_ms"]:
+                continue
+            ratio = result["median_ms"] / old["median_ms"]
+            regressed = (ratio > REGRESSION_RATIO
+                         and result["median_ms"] - old["median_ms"] > REGRESSION_MIN_MS)
+            if regressed:
+                regressions.append((rows, name))
+            print(f"   {'❌' if regressed else '✅'} {name:<40} {old['median_ms']:>10.3f} -> "
+                  f"{result['median_ms']:>10.3f} ms ({ratio:.2f}x)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark app/database.py against synthetic data.")
+    parser.add_argument("--sizes", default=",".join(str(n) for n in DEFAULT_SIZES),
+                        help="Comma-separated rows per table (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed runs per scenario")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--workdir", default=tempfile.gettempdir(),
+                        help="Where the synthetic databases are created")
+    parser.add_argument("--keep", action="store_true",
+                        help="Keep the synthetic databases and reuse them on the next run")
+    parser.add_argument("--output", default="benchmark_results.json",
+                        help="Where to write the JSON report")
+    parser.add_argument("--baseline", help="An earlier JSON report to compare against")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    report = run_benchmark(sizes, args.repeat, args.seed, args.workdir, args.keep)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n📄 Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f))
+        if regressions:
+            print(f"\n{len(regressions)} scenario(s) regressed.")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
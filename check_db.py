@@ -0,0 +1,121 @@
+import os
+import sys
+import sqlite3
+import tempfile
+from app import database
+from app.database import (
+    init_db, get_schema_version, find_table_scans, check_row_counts,
+    _feed_query, _global_news_query, _news_by_date_query, _seen_keys_query,
+    _story_candidates_query, _related_stories_query, _search_news_query, _search_papers_query,
+    _ROW_COUNT_QUERY, _ROW_COUNTS_QUERY, _LATEST_NEWS_QUERY, _LATEST_PAPER_QUERY,
+    _LLM_USAGE_TOTALS_QUERY, _LLM_USAGE_SUMMARY_QUERY, _LLM_USAGE_BY_PROMPT_QUERY,
+    _PAPER_TOPICS_QUERY
+)
+from app.topics import TOPIC_HUBS
+
+# Usage: python check_db.py [path/to/database.db]
+#
+# Works on a temporary copy, so the pending migrations it applies never touch
+# the database being checked.
+
+
+def query_shapes():
+    """Every query shape the dashboard and the runners issue, with sample params."""
+    today = "2025-12-22"
+    return [
+        # get_feed
+        ("get_feed(All)", *_feed_query("All")),
+        ("get_feed(category)", *_feed_query(TOPIC_HUBS["Engineering"])),
+        ("get_feed(topic)", *_feed_query("Robotics")),
+        ("get_feed_page(All)", *_feed_query("All", after=(today, "x"))),
+        ("get_feed_page(category)",
+         *_feed_query(TOPIC_HUBS["Engineering"], after=(today, "x"))),
+        ("get_feed_page(topic)", *_feed_query("Robotics", after=(today, "x"))),
+        # get_global_news
+        ("get_global_news(All)", *_global_news_query("All")),
+        ("get_global_news(source)", *_global_news_query("China_Xinhua")),
+        ("get_global_news_page(All)", *_global_news_query("All", after=(today, "x"))),
+        ("get_global_news_page(source)",
+         *_global_news_query("China_Xinhua", after=(today, "x"))),
+        # get_news_by_date
+        ("get_news_by_date", *_news_by_date_query(today)),
+        ("get_news_by_date(region)", *_news_by_date_query(today, "China")),
+        # get_dashboard_stats / get_news_stats / get_news_sources
+        ("row_counts lookup", _ROW_COUNT_QUERY, ("global_news", "added_date", today)),
+        ("get_row_counts", _ROW_COUNTS_QUERY, ("global_news", "source")),
+        # Dashboard preview cards
+        ("latest news preview", _LATEST_NEWS_QUERY, ()),
+        ("latest paper preview", _LATEST_PAPER_QUERY, ()),
+        # Dedupe lookups
+        ("news_exists", *_seen_keys_query("global_news", "link", ["x"])),
+        ("paper_exists", *_seen_keys_query("academic_papers", "paper_id", ["x"])),
+        ("find_story_candidates", *_story_candidates_query([1, 2])),
+        ("get_related_stories", *_related_stories_query(["x"])),
+        # search_news / search_papers
+        ("search_news(All)", *_search_news_query("china")),
+        ("search_news(source)", *_search_news_query("china", source_filter="China_Xinhua")),
+        ("search_papers", *_search_papers_query("battery", min_score=7)),
+        # LLM usage ledger (budget controller and dashboard)
+        ("get_llm_usage_totals", _LLM_USAGE_TOTALS_QUERY, (today,)),
+        ("get_llm_usage_summary", _LLM_USAGE_SUMMARY_QUERY, (today,)),
+        ("get_llm_usage_by_prompt", _LLM_USAGE_BY_PROMPT_QUERY, (today,)),
+        ("get_paper_topics", _PAPER_TOPICS_QUERY, ("x",)),
+    ]
+
+
+def _copy_database(source, target):
+    """A consistent copy (WAL included) through SQLite's backup API."""
+    src = sqlite3.connect(source)
+    dst = sqlite3.connect(target)
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+
+
+def main():
+    checked = sys.argv[1] if len(sys.argv) > 1 else database.DB_NAME
+    with tempfile.TemporaryDirectory() as workdir:
+        database.DB_NAME = os.path.join(workdir, os.path.basename(checked))
+        if os.path.exists(checked):
+            _copy_database(checked, database.DB_NAME)
+        try:
+            check(checked)
+        finally:
+            database.close_all_connections()
+
+
+def check(checked):
+    init_db()
+    print(f"🗄️  {checked} is at schema version {get_schema_version()} (after migrating a copy)")
+
+    failures = 0
+    for name, query, params in query_shapes():
+        scans = find_table_scans(query, params)
+        if scans:
+            failures += 1
+            print(f"   ❌ {name}: {'; '.join(scans)}")
+        else:
+            print(f"   ✅ {name}")
+
+    # The dashboard counters must agree with real COUNT(*)s
+    mismatches = check_row_counts()
+    for table, dimension, value, counter, actual in mismatches:
+        print(f"   ❌ row_counts {table}.{dimension}={value!r}: "
+              f"counter says {counter}, table has {actual}")
+    if not mismatches:
+        print("   ✅ row_counts match the tables")
+
+    if failures:
+        print(f"\n{failures} query shape(s) fall back to a full table scan.")
+    if mismatches:
+        print(f"\n{len(mismatches)} counter(s) drifted; run "
+              "database.rebuild_row_counts() to recompute them.")
+    if failures or mismatches:
+        sys.exit(1)
+    print("\nAll query shapes are served by an index.")
+
+
+if __name__ == "__main__":
+    main()
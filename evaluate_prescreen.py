@@ -0,0 +1,82 @@
+import sys
+import json
+import argparse
+from collections import Counter
+from app import database
+from app.database import init_db, get_papers_for_replay
+from app.prescreen import prescreen, PrescreenConfig
+
+# Same cutoff get_feed uses: anything below it never reaches the dashboard
+FEED_MIN_SCORE = 7
+
+
+def replay(config, accept_score=FEED_MIN_SCORE):
+    """
+    Runs the pre-screen over every paper already reviewed by Gemini.
+    Abstracts are not stored, so the keyword signals read the title plus the
+    layman summary, and the length check only applies to rows that recorded
+    abstract_words.
+    """
+    papers = get_papers_for_replay()
+    rejected = []
+    reasons = Counter()
+    for paper in papers:
+        passed, reason = prescreen(paper['title'] or "", paper['venue'], paper['summary'] or "",
+                                   abstract_words=paper['abstract_words'], config=config)
+        if not passed:
+            rejected.append(paper)
+            reasons[reason.split(" (")[0]] += 1
+
+    accepted = [p for p in papers if (p['score'] or 0) >= accept_score]
+    lost = [p for p in rejected if (p['score'] or 0) >= accept_score]
+    return {
+        "config": vars(config),
+        "papers_replayed": len(papers),
+        "llm_calls_saved": len(rejected),
+        "llm_calls_saved_pct": round(100 * len(rejected) / len(papers), 1) if papers else 0.0,
+        "accepted_papers": len(accepted),
+        "accepted_papers_lost": len(lost),
+        "accepted_lost_pct": round(100 * len(lost) / len(accepted), 1) if accepted else 0.0,
+        "reject_reasons": dict(reasons),
+        "lost_titles": [p['title'] for p in lost],
+    }
+
+
+def main():
+    defaults = PrescreenConfig()
+    parser = argparse.ArgumentParser(
+        description="Replay the paper pre-screen against academic_papers.")
+    parser.add_argument("--db", default=database.DB_NAME)
+    parser.add_argument("--min-abstract-words", type=int,
+                        default=defaults.min_abstract_words)
+    parser.add_argument("--min-signal-score", type=int,
+                        default=defaults.min_signal_score)
+    parser.add_argument("--no-vip-bypass", action="store_true")
+    parser.add_argument("--json", action="store_true",
+                        help="Print the report as JSON")
+    args = parser.parse_args()
+
+    database.DB_NAME = args.db
+    init_db()
+    config = PrescreenConfig(min_abstract_words=args.min_abstract_words,
+                             min_signal_score=args.min_signal_score,
+                             vip_bypass=not args.no_vip_bypass)
+    report = replay(config)
+
+    if args.json:
+        json.dump(report, sys.stdout, indent=2, ensure_ascii=False)
+        print()
+        return
+
+    print(f"🔬 Replayed {report['papers_replayed']} reviewed papers with {report['config']}")
+    print(f"   💰 LLM calls saved: {report['llm_calls_saved']} ({report['llm_calls_saved_pct']}%)")
+    print(f"   ⚠️ Accepted papers lost: {report['accepted_papers_lost']} of "
+          f"{report['accepted_papers']} ({report['accepted_lost_pct']}%)")
+    for reason, count in Counter(report['reject_reasons']).most_common():
+        print(f"      - {reason}: {count}")
+    for title in report['lost_titles'][:10]:
+        print(f"      ✗ {title[:70]}")
+
+
+if __name__ == "__main__":
+    main()
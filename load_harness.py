@@ -0,0 +1,188 @@
+import io
+import sys
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+import os
+from app import database
+from app.database import clear_read_cache, close_all_connections
+from app.backends import use_backends
+from app.fakes import FakeLLMClient, FixtureServer, percentile
+from app.ratelimit import gemini_limiter, semantic_scholar_limiter
+from app.topics import ALL_TOPICS
+from run_news import update_news_feed
+from run_academic import update_feeds
+
+# Usage: python load_harness.py [--sources 24 --items 10 --topics 20 --sweeps 3]
+#        python load_harness.py --llm-latency 1.5 --llm-429 0.05 --output harness.json
+#
+# Runs full news + academic sweeps against a local fixture RSS / Semantic Scholar
+# server and a fake Gemini client (app/fakes.py), on a throwaway database.
+# Nothing leaves the machine and no quota is spent.
+
+
+def harness_topics(count):
+    """The first 'count' real topics; numbered copies once ALL_TOPICS runs out."""
+    topics = []
+    for i in range(count):
+        lap = i // len(ALL_TOPICS)
+        topics.append(ALL_TOPICS[i % len(ALL_TOPICS)] + (f" {lap + 1}" if lap else ""))
+    return topics
+
+
+def _latency_summary(samples):
+    ms = [s * 1000 for s in samples]
+    return {
+        "count": len(ms),
+        **{f"p{int(q * 100)}_ms": round(percentile(ms, q), 2) if ms else None
+           for q in (0.5, 0.95, 0.99)},
+        "max_ms": round(max(ms), 2) if ms else None,
+    }
+
+
+def _rate(count, seconds):
+    return round(count / seconds, 2) if seconds else None
+
+
+def run_sweep(sources, topics, items, verbose):
+    """One news sweep then one academic sweep; returns their counts and timings."""
+    log = sys.stdout if verbose else io.StringIO()
+    with contextlib.redirect_stdout(log):
+        started = time.perf_counter()
+        articles = update_news_feed(sources=sources, limit=items)
+        news_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        papers = update_feeds(topics=topics)
+        academic_seconds = time.perf_counter() - started
+    return {
+        "articles": articles,
+        "news_seconds": round(news_seconds, 3),
+        "articles_per_second": _rate(articles, news_seconds),
+        "papers": papers,
+        "academic_seconds": round(academic_seconds, 3),
+        "papers_per_second": _rate(papers, academic_seconds),
+    }
+
+
+def run_harness(args, workdir):
+    database.DB_NAME = os.path.join(workdir, "harness.db")
+    clear_read_cache()
+    # The fakes have no real quota; the limiters still pace them at these rates
+    gemini_limiter.set_rate(args.gemini_rpm)
+    semantic_scholar_limiter.set_rate(args.s2_rpm)
+
+    llm = FakeLLMClient(latency=args.llm_latency, jitter=args.llm_jitter,
+                        rate_limit_rate=args.llm_429, drop_rate=args.llm_drop,
+                        seed=args.seed)
+    server = FixtureServer(sources=args.sources, items_per_feed=args.items,
+                           papers_per_topic=args.papers, latency=args.http_latency,
+                           rate_limit_rate=args.http_429, seed=args.seed)
+    topics = harness_topics(args.topics)
+
+    sweeps = []
+    started = time.perf_counter()
+    with server, use_backends(llm_client=llm,
+                              semantic_scholar_url=server.semantic_scholar_url):
+        sources = server.news_sources()
+        for n in range(args.sweeps):
+            if n:
+                server.new_generation()  # A new "day" of stories and papers
+            sweep = run_sweep(sources, topics, args.items, args.verbose)
+            sweeps.append(sweep)
+            print(f"   🔁 Sweep {n + 1}/{args.sweeps}: "
+                  f"{sweep['articles']} articles in {sweep['news_seconds']:.1f}s "
+                  f"({sweep['articles_per_second']}/s), "
+                  f"{sweep['papers']} papers in {sweep['academic_seconds']:.1f}s "
+                  f"({sweep['papers_per_second']}/s)")
+    total_seconds = time.perf_counter() - started
+    close_all_connections()
+
+    articles = sum(s['articles'] for s in sweeps)
+    papers = sum(s['papers'] for s in sweeps)
+    news_seconds = sum(s['news_seconds'] for s in sweeps)
+    academic_seconds = sum(s['academic_seconds'] for s in sweeps)
+    return {
+        "config": vars(args),
+        "totals": {
+            "seconds": round(total_seconds, 3),
+            "articles": articles,
+            "articles_per_second": _rate(articles, news_seconds),
+            "papers": papers,
+            "papers_per_second": _rate(papers, academic_seconds),
+            "llm_calls": llm.calls,
+            "llm_rate_limited": llm.rate_limited,
+            "http_requests": dict(server.requests),
+        },
+        "latency": {
+            "llm": _latency_summary(llm.latencies),
+            "http": _latency_summary(server.latencies),
+        },
+        "sweeps": sweeps,
+    }
+
+
+def print_summary(report):
+    totals = report['totals']
+    print(f"\n📈 {totals['articles']} articles ({totals['articles_per_second']}/s), "
+          f"{totals['papers']} papers ({totals['papers_per_second']}/s) "
+          f"in {totals['seconds']:.1f}s")
+    print(f"   🤖 {totals['llm_calls']} LLM calls, {totals['llm_rate_limited']} rate-limited")
+    for name, summary in report['latency'].items():
+        print(f"   ⏱️ {name:<4} p50 {summary['p50_ms']} ms • p95 {summary['p95_ms']} ms • "
+              f"p99 {summary['p99_ms']} ms • max {summary['max_ms']} ms "
+              f"({summary['count']} calls)")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Drive full sweeps against local fake feeds, Semantic Scholar and Gemini.")
+    scale = parser.add_argument_group("scale")
+    scale.add_argument("--sources", type=int, default=12, help="RSS feeds to serve")
+    scale.add_argument("--items", type=int, default=5, help="Stories per feed per sweep")
+    scale.add_argument("--topics", type=int, default=10, help="Topics to sweep")
+    scale.add_argument("--papers", type=int, default=10, help="New papers per topic per sweep")
+    scale.add_argument("--sweeps", type=int, default=2,
+                       help="Sweeps to run; each one sees a fresh day of content")
+    fakes = parser.add_argument_group("fake services")
+    fakes.add_argument("--llm-latency", type=float, default=0.5, help="Seconds per LLM call")
+    fakes.add_argument("--llm-jitter", type=float, default=0.2,
+                       help="Up to this many extra seconds per LLM call")
+    fakes.add_argument("--llm-429", type=float, default=0.0,
+                       help="Fraction of LLM calls answered with a 429")
+    fakes.add_argument("--llm-drop", type=float, default=0.0,
+                       help="Fraction of batch items the LLM leaves out")
+    fakes.add_argument("--http-latency", type=float, default=0.02,
+                       help="Seconds added to every fixture HTTP response")
+    fakes.add_argument("--http-429", type=float, default=0.0,
+                       help="Fraction of fixture HTTP requests answered with a 429")
+    fakes.add_argument("--gemini-rpm", type=float, default=600,
+                       help="Gemini limiter rate for the run (the live default is much lower)")
+    fakes.add_argument("--s2-rpm", type=float, default=600,
+                       help="Semantic Scholar limiter rate for the run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="Keep the harness database here (default: a temp dir)")
+    parser.add_argument("--output", help="Where to write the JSON report")
+    parser.add_argument("--verbose", action="store_true", help="Show the runners' own output")
+    args = parser.parse_args()
+
+    print(f"🧪 {args.sweeps} sweep(s): {args.sources} feeds × {args.items} stories, "
+          f"{args.topics} topics × {args.papers} papers")
+    if args.workdir:
+        os.makedirs(args.workdir, exist_ok=True)
+        report = run_harness(args, args.workdir)
+    else:
+        with tempfile.TemporaryDirectory() as workdir:
+            report = run_harness(args, workdir)
+
+    print_summary(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n📄 Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,13 @@
-import time
 from datetime import datetime
 from app.ingestion import fetch_latest_news
-from app.analysis import analyze_article
+from app.analysis import analyze_articles
+from app.database import init_db, format_analysis
+from app import metrics
 
 
 def main():
     print("--- East-West News Agent Starting ---")
+    init_db()  # Needed for the LLM response cache
 
     # 1. Generate a filename with today's date (e.g., briefing_2025-12-18.md)
     today = datetime.now().strftime('%Y-%m-%d')
@@ -18,32 +20,35 @@ def main():
         f.write(f"**Date:** {today}\n\n")
         f.write("---\n\n")
 
-        # Ingest
-        raw_articles = fetch_latest_news(limit=3)
+        # Ingest (the briefing always wants today's top stories, cached or not)
+        with metrics.timer("stage_seconds", stage="fetch"):
+            raw_articles, _ = fetch_latest_news(limit=3, use_cache=False)
         print(f"\n🧠 Analyzing {len(raw_articles)} articles...\n")
 
-        # Analyze & Write
-        for i, article in enumerate(raw_articles):
-            print(
-                f"--- Processing {article['source']} ({i+1}/{len(raw_articles)}) ---")
-
-            # Get the analysis from the Brain
-            analysis = analyze_article(article)
-
-            # Write to the file
+        # Analyze (concurrently, paced by the shared Gemini rate limiter)
+        analyses = {}
+        with metrics.timer("stage_seconds", stage="analyze"):
+            for i, (article, analysis, error) in enumerate(analyze_articles(raw_articles)):
+                print(
+                    f"--- Processed {article['source']} ({i+1}/{len(raw_articles)}) ---")
+                metrics.count("articles_analyzed_total" if analysis else "articles_failed_total",
+                              source=article['source'])
+                analyses[article['link']] = (
+                    format_analysis(analysis) if analysis
+                    else f"Error analyzing article: {error or 'no response'}")
+
+        # Write in feed order, not completion order
+        for article in raw_articles:
             f.write(f"## {article['source']}\n")
-            f.write(f"{analysis}\n\n")
+            f.write(f"{analyses[article['link']]}\n\n")
             f.write(f"[Read Original Source]({article['link']})\n")
             f.write("---\n\n")
 
-            print("✅ Added to report.")
-
-            # Rate Limit Protection
-            print("⏳ Cooling down for 4 seconds...")
-            time.sleep(4)
+        print("✅ Added all articles to report.")
 
     print(f"\n📄 Success! Briefing saved to: {filename}")
 
 
 if __name__ == "__main__":
-    main()
+    with metrics.run("briefing"):
+        main()
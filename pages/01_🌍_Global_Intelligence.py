@@ -1,7 +1,9 @@
 # pages/01_🌍_Global_Intelligence.py
 import streamlit as st
 import sqlite3
-from app.database import get_global_news, get_news_sources
+from app.database import (
+    get_global_news_page, get_news_sources, get_related_stories, search_news, archive_exists
+)
 
 st.set_page_config(page_title="Global Intelligence",
                    page_icon="🌍", layout="wide")
@@ -28,21 +30,50 @@ selected_source = st.pills(
     selection_mode="single"
 )
 
+search_text = st.text_input(
+    "🔎 Search reports", placeholder="e.g. tariffs, Taiwan, rare earths")
+
+# Reports past the retention window live in the archive; only read it on request
+include_archive = archive_exists() and st.toggle("🗄️ Include archived reports")
+
 st.divider()
 
 # --- CONTENT STREAM ---
 try:
-    # Fetch data based on selection
-    news_items = get_global_news(source_filter=selected_source)
+    # Fetch data based on selection (a search replaces the latest-first stream)
+    if search_text.strip():
+        news_items = search_news(search_text, source_filter=selected_source,
+                                 include_archive=include_archive)
+        if not news_items:
+            st.info(f"No reports match '{search_text}'.")
+    else:
+        # "Load more" keeps a page count per filter; every page loaded so far is
+        # re-read on rerun, which the read cache answers without touching SQLite.
+        pages_key = f"news_pages:{selected_source}:{include_archive}"
+        pages_loaded = st.session_state.setdefault(pages_key, 1)
+        news_items, next_cursor = [], None
+        for _ in range(pages_loaded):
+            page, next_cursor = get_global_news_page(
+                source_filter=selected_source, after=next_cursor,
+                include_archive=include_archive)
+            news_items.extend(page)
+            if next_cursor is None:
+                break
+        if not news_items:
+            st.info(
+                "No intelligence reports found. Run the ingestion script to gather data.")
 
-    if not news_items:
-        st.info(
-            "No intelligence reports found. Run the ingestion script to gather data.")
+    # "Same story, other sources" for every card, in one query
+    related_stories = get_related_stories([item['link'] for item in news_items])
 
     for item in news_items:
         with st.container(border=True):
             # Layout: Title & Metadata on top
-            st.subheader(item['title'])
+            # The translated headline leads; the original title sits beneath it
+            st.subheader(item['headline'] or item['title'])
+            if item['headline']:
+                # Search results come back with the matched words in bold
+                st.caption(item['title_highlight'] if search_text.strip() else item['title'])
 
             # Color-coded metadata badge logic (Optional visual flair)
             if "China" in item['source']:
@@ -52,15 +83,34 @@ try:
             else:
                 flag = "🏳️"
 
-            st.caption(f"{flag} **{item['source']}** • 📅 {item['added_date']}")
+            language = f" • 🗣️ {item['language']}" if item['language'] else ""
+            st.caption(f"{flag} **{item['source']}** • 📅 {item['added_date']}{language}")
+
+            if search_text.strip():
+                st.caption(f"🔎 {item['summary_snippet']}")
 
-            # The AI Analysis (Summary)
-            # This contains the Translation, Summary, and Analyst Note
+            # The AI Analysis: summary and analyst note from their own columns;
+            # rows the backfill could not parse show the raw analysis instead.
             st.markdown("### 🧠 Analyst Briefing")
-            st.markdown(item['summary'])
+            if item['analysis_summary']:
+                st.markdown(item['analysis_summary'])
+                if item['analyst_note']:
+                    st.markdown(f"**Analyst Note:** {item['analyst_note']}")
+            else:
+                st.markdown(item['summary'])
 
             # Link to original
             st.markdown(f"🔗 [Original Source Material]({item['link']})")
 
+            # Near-duplicates of this story we skipped analyzing
+            related = related_stories.get(item['link'])
+            if related:
+                st.caption("🪞 Same story, other sources: " + " • ".join(
+                    f"[{story['source']}]({story['link']})" for story in related))
+
+    if not search_text.strip() and next_cursor is not None:
+        st.button("⬇️ Load more", on_click=lambda: st.session_state.update(
+            {pages_key: pages_loaded + 1}))
+
 except Exception as e:
     st.error(f"Error loading feed: {e}")
@@ -1,39 +1,37 @@
 import streamlit as st
 import sqlite3
-import pandas as pd
-import altair as alt
-from app.database import get_feed
+import math
+from functools import lru_cache
+from app.database import get_feed_page, search_papers, archive_exists
 from app.topics import TOPIC_HUBS
 
 st.set_page_config(page_title="Academic Feed", page_icon="🎓", layout="wide")
 
 # --- HELPER: MINIATURE RING CHART ---
+# Scores only run 0-10, so each ring is built once per process and reused as
+# plain inline SVG: no DataFrames, chart specs or chart iframes per card.
+RING_RADIUS = 17.5    # Midway between the old inner (15) and outer (20) radius
+RING_WIDTH = 5
 
 
+@lru_cache(maxsize=None)
 def make_impact_ring(score):
-    source = pd.DataFrame({
-        "Category": ["Impact", "Rest"],
-        "Value": [score, 10-score]
-    })
-
-    base = alt.Chart(source).encode(theta=alt.Theta("Value", stack=True))
-
-    pie = base.mark_arc(innerRadius=15, outerRadius=20).encode(
-        color=alt.Color("Category", scale=alt.Scale(
-            domain=["Impact", "Rest"], range=["#008080", "#E5E4E2"]), legend=None),
-        order=alt.Order("Category", sort="descending")
-    )
-
-    text_score = base.mark_text(radius=0, size=12, color="#004225", fontStyle="bold").encode(
-        text=alt.value(f"{score}")
-    )
-
-    # Label is now part of the chart
-    label_df = pd.DataFrame({"label": ["Impact Score"]})
-    text_label = alt.Chart(label_df).mark_text(
-        align='center', dy=32, size=8, color="#888").encode(text='label')
-
-    return (pie + text_score + text_label).properties(width=50, height=75)
+    score = max(0, min(10, int(score)))
+    circumference = 2 * math.pi * RING_RADIUS
+    filled = circumference * score / 10
+    return f"""
+<svg width="50" height="75" viewBox="0 0 50 75" xmlns="http://www.w3.org/2000/svg">
+  <circle cx="25" cy="25" r="{RING_RADIUS}" fill="none"
+          stroke="#E5E4E2" stroke-width="{RING_WIDTH}"/>
+  <circle cx="25" cy="25" r="{RING_RADIUS}" fill="none"
+          stroke="#008080" stroke-width="{RING_WIDTH}"
+          stroke-dasharray="{filled:.2f} {circumference:.2f}"
+          transform="rotate(-90 25 25)"/>
+  <text x="25" y="29" text-anchor="middle" font-size="12"
+        font-weight="bold" fill="#004225">{score}</text>
+  <text x="25" y="60" text-anchor="middle" font-size="8"
+        fill="#888">Impact Score</text>
+</svg>"""
 
 
 # --- 1. HEADER & NAVIGATION ---
@@ -51,14 +49,25 @@ selected_category = st.pills(
     selection_mode="single"
 )
 
+search_text = st.text_input(
+    "🔎 Search papers", placeholder="e.g. solid-state battery, malaria vaccine")
+
+# Papers past the retention window live in the archive; only read it on request
+include_archive = archive_exists() and st.toggle("🗄️ Include archived papers")
+
 st.divider()
 
 # --- 2. DATA FETCHING LOGIC ---
 try:
+    # CASE 0: A search replaces the category stream
+    if search_text.strip():
+        st.subheader(f"🔎 Results for '{search_text}'")
+        papers = search_papers(search_text, min_score=7, include_archive=include_archive)
+
     # CASE A: User selected "All"
-    if selected_category == "All":
+    elif selected_category == "All":
         st.subheader("🌍 Latest Breakthroughs (All Fields)")
-        papers = get_feed(target="All")
+        feed_target = "All"
 
     # CASE B: User selected a specific Category (e.g. Engineering)
     else:
@@ -85,11 +94,25 @@ try:
 
         # The rest of the logic remains exactly the same...
         if selected_specific == "View All":
-            papers = get_feed(target=available_topics)
+            feed_target = available_topics
         else:
             # The variable 'selected_specific' still contains "Biomedical Engineering"
             # so the database query works perfectly.
-            papers = get_feed(target=selected_specific)
+            feed_target = selected_specific
+
+    # "Load more" keeps a page count per filter; every page loaded so far is
+    # re-read on rerun, which the read cache answers without touching SQLite.
+    next_cursor = None
+    if not search_text.strip():
+        pages_key = f"feed_pages:{feed_target}:{include_archive}"
+        pages_loaded = st.session_state.setdefault(pages_key, 1)
+        papers = []
+        for _ in range(pages_loaded):
+            page, next_cursor = get_feed_page(target=feed_target, after=next_cursor,
+                                              include_archive=include_archive)
+            papers.extend(page)
+            if next_cursor is None:
+                break
 
     # --- 3. RENDER CARDS ---
     if not papers:
@@ -100,7 +123,11 @@ try:
             col_text, col_chart = st.columns([0.9, 0.1])
 
             with col_text:
-                st.subheader(paper['title'])
+                # Search results come back with the matched words in bold
+                if search_text.strip():
+                    st.subheader(paper['title_highlight'])
+                else:
+                    st.subheader(paper['title'])
 
                 # Metadata Line
                 if paper['score'] >= 8:
@@ -114,8 +141,12 @@ try:
                 st.markdown(f"🔗 [Read Full Paper]({paper['url']})")
 
             with col_chart:
-                ring = make_impact_ring(paper['score'])
-                st.altair_chart(ring, width='stretch')
+                st.markdown(make_impact_ring(paper['score']),
+                            unsafe_allow_html=True)
+
+    if next_cursor is not None:
+        st.button("⬇️ Load more", on_click=lambda: st.session_state.update(
+            {pages_key: pages_loaded + 1}))
 
 except sqlite3.OperationalError:
     st.error("⚠️ Database connection failed. Ensure 'peripheral_news.db' exists.")
@@ -1,46 +1,170 @@
-import time
-from app.academic import fetch_latest_papers, evaluate_paper
-from app.database import init_db, paper_exists, save_paper
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from app.academic import sweep_topics, evaluate_papers, REVIEW_BATCH_SIZE
+from app.database import (
+    init_db, filter_new_paper_ids, save_papers_batch, save_prescreen_rejects,
+    advance_topic_watermark, tag_paper_topics
+)
+from app.llm_cache import prune_llm_cache_to_limits
+from app.prescreen import prescreen_paper
+from app.ratelimit import GEMINI_MAX_IN_FLIGHT
 from app.topics import ALL_TOPICS
+from app.llm_budget import llm_budget, prioritise_topics, BudgetExhausted
+from app.shards import export_shard
+from app.retention import apply_retention
+from app import metrics
 
+# Papers per Semantic Scholar page, and how many pages' worth a busy topic may
+# take in one sweep while catching up to its watermark.
+PAGE_SIZE = 10
+MAX_PAGES = 3
 
-def update_feeds():
-    init_db()
-    print(f"🚀 Starting Massive Academic Sweep ({len(ALL_TOPICS)} topics)...")
 
-    for i, topic in enumerate(ALL_TOPICS):
-        print(f"\n[{i+1}/{len(ALL_TOPICS)}] 🔎 Scouting Topic: {topic}...")
+def review_topic(topic, raw_papers, fetched_papers):
+    """
+    Dedupes, pre-screens, scores and saves one topic's papers, then advances the
+    topic's watermark past everything fetched for it. Returns the number of new papers.
+    """
+    with metrics.timer("topic_review_seconds", topic=topic):
+        return _review_topic(topic, raw_papers, fetched_papers)
+
 
-        # Fetch papers
-        raw_papers = fetch_latest_papers(topic=topic, limit=5)
+def _review_topic(topic, raw_papers, fetched_papers):
+    if llm_budget.exhausted:
+        # Untouched watermark: tomorrow's sweep fetches these papers again
+        print(f"   ⛔ LLM budget exhausted; leaving {topic} for the next sweep.")
+        metrics.count("topics_deferred_total", topic=topic)
+        return 0
 
-        if not raw_papers:
-            print(f"   ⚠️ No papers found. Skipping...")
+    # One dedupe query for the whole topic
+    new_ids = set(filter_new_paper_ids([p['paperId'] for p in raw_papers]))
+    metrics.count("papers_known_total", len(raw_papers) - len(new_ids), topic=topic)
+
+    new_papers = []
+    rejects = []
+    for paper in raw_papers:
+        if paper['paperId'] not in new_ids:
             continue
+        new_ids.discard(paper['paperId'])
 
-        new_count = 0
-        for paper in raw_papers:
-            if paper_exists(paper['paperId']):
-                continue
+        # Free local pre-screen before spending an LLM call
+        passed, reason = prescreen_paper(paper)
+        if not passed:
+            rejects.append((paper, topic, reason))
+            continue
 
-            # --- THE REQUESTED CHANGE ---
-            pub_date = paper.get('publicationDate') or "Unknown Date"
-            print(f"   🧪 Reviewing: {paper['title'][:40]}... ({pub_date})")
-            # -----------------------------
+        # --- THE REQUESTED CHANGE ---
+        pub_date = paper.get('publicationDate') or "Unknown Date"
+        print(f"   🧪 Reviewing: {paper['title'][:40]}... ({pub_date})")
+        # -----------------------------
+        new_papers.append(paper)
 
-            review = evaluate_paper(paper)
+    metrics.count("papers_prescreen_rejected_total", len(rejects), topic=topic)
+    if rejects:
+        save_prescreen_rejects(rejects)
+        print(f"   🚫 Pre-screen skipped {len(rejects)} low-value papers for {topic}.")
 
+    # Reviews run as batched prompts, paced by the shared Gemini rate limiter.
+    # Concurrency comes from running several topics at once, so one at a time here.
+    reviews = []
+    failed = 0
+    deferred = 0
+    try:
+        for paper, review, error in evaluate_papers(new_papers, max_in_flight=1,
+                                                    batch_size=REVIEW_BATCH_SIZE):
             if review:
-                save_paper(paper, review, topic)
-                new_count += 1
+                reviews.append((paper, review, topic))
+            elif isinstance(error, BudgetExhausted):
+                deferred += 1
+            else:
+                failed += 1
+    finally:
+        # One transaction per topic, even if the reviews were interrupted
+        new_count = save_papers_batch(reviews)
+        metrics.count("papers_reviewed_total", len(reviews), topic=topic)
+        metrics.count("papers_review_failed_total", failed, topic=topic)
+        metrics.count("papers_deferred_total", deferred, topic=topic)
+
+    # Only move past these papers once every one is stored or deliberately
+    # skipped; otherwise the next sweep fetches them again and retries.
+    if failed:
+        print(f"   ⚠️ {failed} reviews failed for {topic}; keeping its watermark.")
+    if deferred:
+        print(f"   ⛔ LLM budget exhausted; {deferred} reviews for {topic} "
+              "left for the next sweep.")
+    if not (failed or deferred):
+        advance_topic_watermark(topic, fetched_papers)
+    return new_count
+
+
+def update_feeds(topics=ALL_TOPICS):
+    """One academic sweep over 'topics'. Returns the number of new papers stored."""
+    init_db()
+    # Topics that yield the most 7+ papers go first, in case the LLM budget runs out
+    topics = prioritise_topics(topics)
+    print(f"🚀 Starting Massive Academic Sweep ({len(topics)} topics)...")
+
+    # Topic searches run concurrently under the Semantic Scholar limiter, and each
+    # topic's reviews start as soon as its search lands, while others still fetch.
+    total_new = 0
+    # Topics overlap (e.g. "Biology" / "Molecular Biology"), so the same paper can
+    # come back several times in one sweep. Only its first topic reviews it; every
+    # topic it matched is tagged once the sweep is done.
+    first_topic = {}
+    topic_tags = []
+    sweep_timer = metrics.timer("stage_seconds", stage="search_and_review")
+    with sweep_timer, ThreadPoolExecutor(max_workers=GEMINI_MAX_IN_FLIGHT,
+                                         thread_name_prefix="review") as review_pool:
+        reviews = {}
+        for i, (topic, result, error) in enumerate(
+                sweep_topics(topics, limit=PAGE_SIZE, max_pages=MAX_PAGES)):
+            print(f"\n[{i+1}/{len(topics)}] 🔎 Scouted Topic: {topic}...")
+
+            fetched, caught_up = result or ([], False)
+            if error or not fetched:
+                print(f"   💤 No new papers for {topic}. Skipping...")
+                continue
+            metrics.count("papers_fetched_total", len(fetched), topic=topic)
+            if not caught_up:
+                # Oldest first, so the watermark still only moves past what we fetched
+                print(f"   ⏳ {topic} has more new papers than one sweep takes; "
+                      "the rest follow next sweep.")
+                metrics.count("topics_behind_total", topic=topic)
+
+            topic_tags.extend((p['paperId'], topic) for p in fetched)
+            raw_papers = [p for p in fetched
+                          if first_topic.setdefault(p['paperId'], topic) == topic]
+            if len(raw_papers) < len(fetched):
+                print(f"   🔗 {len(fetched) - len(raw_papers)} papers already queued under another topic.")
+
+            reviews[review_pool.submit(metrics.profiled(review_topic),
+                                       topic, raw_papers, fetched)] = topic
+
+        for future in as_completed(reviews):
+            topic = reviews[future]
+            try:
+                new_count = future.result()
+            except Exception as e:
+                print(f"   ❌ {topic} failed: {e}")
+                continue
+            total_new += new_count
+            print(f"   ✅ Added {new_count} new papers for {topic}.")
 
-            # If in DEV_MODE, we don't need to sleep much because we aren't calling Gemini!
-            time.sleep(0.1)
+    # One batch for every (paper, topic) match, including papers stored on earlier days
+    with metrics.timer("stage_seconds", stage="tag"):
+        tagged = tag_paper_topics(topic_tags)
+    print(f"\n🏷️ Tagged {tagged} extra paper/topic matches.")
 
-        print(f"   ✅ Added {new_count} new papers for {topic}.")
-        print("   🚚 Moving to next topic...")
-        time.sleep(5)  # Still sleep here for Semantic Scholar
+    with metrics.timer("stage_seconds", stage="prune"):
+        prune_llm_cache_to_limits()
+    if llm_budget.exhausted:
+        print(f"\n⛔ Stopped early: {llm_budget.exhausted_reason}. "
+              "Unscored topics keep their watermarks and resume on the next sweep.")
+    print(f"\n✅ Sweep Complete. Added {total_new} new papers.")
+    return total_new
 
 
 if __name__ == "__main__":
-    update_feeds()
+    with metrics.run("academic"):
+        update_feeds()
+        export_shard("academic")
+        apply_retention()
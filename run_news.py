@@ -1,45 +1,102 @@
-import time
-from app.ingestion import fetch_latest_news
-from app.analysis import analyze_article
-from app.database import init_db, news_exists, save_news
+from app.ingestion import fetch_latest_news, settle_feed_cache
+from app.analysis import analyze_articles, ANALYSIS_BATCH_SIZE
+from app.database import init_db, filter_new_links, save_news_batch
+from app.llm_cache import prune_llm_cache_to_limits
+from app.fingerprint import split_near_duplicates, record_fingerprints, index_unfingerprinted_news
+from app.llm_budget import llm_budget, prioritise_articles, BudgetExhausted
+from app.shards import export_shard
+from app.retention import apply_retention
+from app import metrics
 
 
-def update_news_feed():
+def update_news_feed(sources=None, limit=5):
+    """
+    One news sweep. sources: optional {name: url} dict, defaults to NEWS_SOURCES.
+    Returns the number of new articles stored.
+    """
     # 1. Ensure DB exists
     init_db()
+    # Articles stored before near-duplicate detection existed join the index here
+    index_unfingerprinted_news()
     print("🌍 Starting Global News Sweep...")
 
     # 2. Fetch from RSS (The Eyes)
     # We fetch 5 from each source to start populating history
-    raw_articles = fetch_latest_news(limit=5)
+    with metrics.timer("stage_seconds", stage="fetch"):
+        raw_articles, validators = fetch_latest_news(limit=limit, sources=sources)
 
-    new_count = 0
+    # 3. Check DB (Memory) - one query for the whole sweep
+    with metrics.timer("stage_seconds", stage="dedupe"):
+        new_links = set(filter_new_links([a['link'] for a in raw_articles]))
+
+    to_analyze = []
     for article in raw_articles:
-        # 3. Check DB (Memory)
-        if news_exists(article['link']):
+        if article['link'] not in new_links:
             print(f"   ⏭️ Skipping known article: {article['title'][:20]}...")
+            metrics.count("articles_known_total", source=article['source'])
             continue
+        # The same link can show up in two feeds; only analyze it once.
+        new_links.discard(article['link'])
+        to_analyze.append(article)
 
+    # Syndicated wire copy shows up nearly unchanged across feeds; analyze it once
+    with metrics.timer("stage_seconds", stage="near_duplicates"):
+        to_analyze, duplicates, signatures = split_near_duplicates(to_analyze)
+    for article, canonical, score in duplicates:
+        metrics.count("articles_near_duplicate_total", source=article['source'])
         print(
-            f"   📰 Analyzing: {article['source']} - {article['title'][:30]}...")
-
-        # 4. Analyze (The Brain)
-        try:
-            analysis = analyze_article(article)
+            f"   🪞 Near-duplicate ({score:.0%}) of an analyzed story: {article['source']} - {article['title'][:30]}...")
 
-            # 5. Save (The Memory)
-            save_news(article, analysis)
-            new_count += 1
-            print("      ✅ Saved to DB.")
+    # Priority sources go first, so a tight LLM budget is spent on them
+    to_analyze = prioritise_articles(to_analyze)
+    print(f"   📰 Analyzing {len(to_analyze)} new articles...")
 
-            # Rate Limit Protection
-            time.sleep(4)
+    # 4. Analyze (The Brain) - batched prompts, paced by the shared Gemini rate limiter
+    analyzed = []
+    failed = []
+    deferred = []
+    try:
+        with metrics.timer("stage_seconds", stage="analyze"):
+            for article, analysis, error in analyze_articles(to_analyze,
+                                                             batch_size=ANALYSIS_BATCH_SIZE):
+                if isinstance(error, BudgetExhausted):
+                    deferred.append(article)
+                    metrics.count("articles_deferred_total", source=article['source'])
+                    continue
+                if error or analysis is None:
+                    print(f"      ❌ Failed: {article['source']} - {error or 'no analysis'}")
+                    metrics.count("articles_failed_total", source=article['source'])
+                    failed.append(article)
+                    continue
+                analyzed.append((article, analysis))
+                metrics.count("articles_analyzed_total", source=article['source'])
+                print(
+                    f"      ✅ Analyzed: {article['source']} - {article['title'][:30]}...")
+    finally:
+        # 5. Save (The Memory) - one transaction, even if the sweep was interrupted
+        with metrics.timer("stage_seconds", stage="save"):
+            new_count = save_news_batch(analyzed)
+            record_fingerprints([article for article, _ in analyzed], duplicates, signatures)
 
-        except Exception as e:
-            print(f"      ❌ Failed: {e}")
+    # The feeds' validators are only kept now their articles are stored. Feeds
+    # with articles still to analyze (and near-duplicates of those) are re-read
+    # in full next sweep, even if they have not changed by then.
+    retry = failed + deferred
+    retry_links = {article['link'] for article in retry}
+    retry += [article for article, canonical, _ in duplicates if canonical in retry_links]
+    settle_feed_cache(validators, {article['source'] for article in retry})
+    if deferred:
+        print(f"   ⛔ LLM budget exhausted ({llm_budget.exhausted_reason}); "
+              f"{len(deferred)} articles left for the next sweep.")
 
+    with metrics.timer("stage_seconds", stage="prune"):
+        prune_llm_cache_to_limits()
     print(f"✅ Sweep Complete. Added {new_count} new global articles.")
+    return new_count
 
 
 if __name__ == "__main__":
-    update_news_feed()
+    with metrics.run("news"):
+        update_news_feed()
+        export_shard("news")
+        apply_retention()
@@ -0,0 +1,53 @@
+import sys
+import time
+import argparse
+from app import database
+from app.database import init_db
+from app.shards import SHARDS_DIR, export_shard, import_shards, verify_shards, load_manifest
+
+# Usage: python sync_db.py export [--run news]
+#        python sync_db.py import [--rebuild]
+#        python sync_db.py verify
+#
+# Moves data between machines as append-only delta shards (see app/shards.py)
+# instead of copying the whole peripheral_news.db.
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export, import and verify the delta shards under SHARDS_DIR.")
+    parser.add_argument("--db", help="Database to use (default: peripheral_news.db)")
+    parser.add_argument("--shards", default=SHARDS_DIR, help="Shard directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="Write the rows added since the last export")
+    export.add_argument("--run", default="manual", help="Name used in the shard file name")
+    load = commands.add_parser("import", help="Apply the shards this database has not seen")
+    load.add_argument("--rebuild", action="store_true",
+                      help="Delete the database and rebuild it from every shard")
+    commands.add_parser("verify", help="Check every shard against its manifest checksum")
+    args = parser.parse_args()
+
+    if args.db:
+        database.DB_NAME = args.db
+
+    if args.command == "export":
+        init_db()
+        export_shard(args.run, args.shards)
+
+    elif args.command == "import":
+        started = time.perf_counter()
+        result = import_shards(args.shards, rebuild=args.rebuild)
+        print(f"📥 Applied {result['shards']} shard(s), {result['rows']} rows written "
+              f"to {database.DB_NAME} in {time.perf_counter() - started:.1f}s")
+
+    elif args.command == "verify":
+        problems = verify_shards(args.shards)
+        for problem in problems:
+            print(f"   ❌ {problem}")
+        if problems:
+            sys.exit(1)
+        print(f"✅ {len(load_manifest(args.shards)['shards'])} shard(s) match the manifest")
+
+
+if __name__ == "__main__":
+    main()